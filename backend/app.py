@@ -1,18 +1,476 @@
 # backend/app.py
-from flask import Flask, render_template, jsonify
-import pandas as pd
-from sqlalchemy import create_engine
-from config import DB_CONFIG
-from urllib.parse import quote_plus
+import csv
+import functools
+import hashlib
+import io
+import json
+import threading
+import zlib
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from flask import Flask, Response, render_template, jsonify, request, stream_with_context
+from sqlalchemy import bindparam, create_engine, inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+from config import (
+    DB_CONFIG, API_DATABASE_URL,
+    API_POOL_SIZE, API_POOL_MAX_OVERFLOW, API_POOL_TIMEOUT, API_POOL_RECYCLE,
+    API_CACHE_TTL, API_CACHE_MAX_ENTRIES, API_CACHE_MAX_MB, API_CACHE_GENERATION_CHECK,
+    API_DEFAULT_PAGE_ROWS, API_MAX_PAGE_ROWS, API_MAX_BATCH_TICKERS, API_STREAM_BATCH_ROWS,
+    API_STREAM_CHUNK_KB, API_STREAM_GZIP_LEVEL, API_LTTB_POINTS,
+)
+from downsample import RESOLUTIONS, RESAMPLED_TABLE, lttb_indices
+from response_cache import ResponseCache
+from urllib.parse import quote_plus, urlencode
 
-app = Flask(__name__, 
+app = Flask(__name__,
             template_folder='../frontend',
             static_folder='../frontend/assets')
 
+# One engine (and connection pool) per process, created on first use
+_engine = None
+_engine_lock = threading.Lock()
+
 def get_db_engine():
-    encoded_password = quote_plus(DB_CONFIG['password'])
-    conn_str = f"mysql+mysqlconnector://{DB_CONFIG['user']}:{encoded_password}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
-    return create_engine(conn_str)
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                conn_str = API_DATABASE_URL
+                if not conn_str:
+                    encoded_password = quote_plus(DB_CONFIG['password'])
+                    conn_str = f"mysql+mysqlconnector://{DB_CONFIG['user']}:{encoded_password}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+                _engine = create_engine(
+                    conn_str,
+                    pool_size=API_POOL_SIZE,
+                    max_overflow=API_POOL_MAX_OVERFLOW,
+                    pool_timeout=API_POOL_TIMEOUT,
+                    pool_recycle=API_POOL_RECYCLE,  # drop connections before the server times them out
+                    pool_pre_ping=True,             # and survive DB restarts
+                )
+    return _engine
+
+def _json_value(value):
+    # DECIMAL columns come back as Decimal; dates are handled by jsonify
+    return float(value) if isinstance(value, Decimal) else value
+
+def query_rows(sql, **params):
+    """Runs a parameterized query and returns the rows as JSON-ready dicts (no DataFrame)."""
+    with get_db_engine().connect() as conn:
+        result = conn.execute(text(sql), params)
+        cols = list(result.keys())
+        return [dict(zip(cols, map(_json_value, row))) for row in result]
+
+def current_generation():
+    """Latest ETL load (id, loaded_at) from etl_load_log, or None if there is none yet."""
+    try:
+        with get_db_engine().connect() as conn:
+            row = conn.execute(text(
+                "SELECT id, loaded_at FROM etl_load_log ORDER BY id DESC LIMIT 1"
+            )).first()
+    except SQLAlchemyError:
+        return None
+    if row is None:
+        return None
+    loaded_at = row.loaded_at
+    if isinstance(loaded_at, str):
+        loaded_at = datetime.fromisoformat(loaded_at)
+    if loaded_at is not None and loaded_at.tzinfo is None:
+        loaded_at = loaded_at.replace(tzinfo=timezone.utc)
+    return row.id, loaded_at
+
+response_cache = ResponseCache(
+    ttl_seconds=API_CACHE_TTL,
+    max_entries=API_CACHE_MAX_ENTRIES,
+    max_bytes=API_CACHE_MAX_MB * 1024 * 1024,
+    generation_check=API_CACHE_GENERATION_CHECK,
+    generation_fn=current_generation,
+)
+
+def cached_json(view):
+    """Serves the view's JSON from the response cache, with ETag / Last-Modified and 304s.
+
+    The view returns the data, or (data, headers) to add headers such as pagination links.
+    NDJSON / CSV requests (see stream_format) bypass the cache: the view streams them itself.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if stream_format():
+            return view(*args, **kwargs)
+        response_cache.refresh_generation()
+        key = f"{request.path}?{urlencode(sorted(request.args.items(multi=True)))}"
+        cached = response_cache.get(key)
+        if cached is None:
+            generation = response_cache.generation
+            last_modified = response_cache.loaded_at or datetime.now(timezone.utc)
+            data, headers = view(*args, **kwargs), {}
+            if isinstance(data, tuple):
+                data, headers = data
+            body = (app.json.dumps(data) + "\n").encode('utf-8')
+            cached = response_cache.put(key, body, last_modified, generation, headers)
+        body, etag, last_modified, headers = cached
+        resp = Response(body, mimetype='application/json', headers=headers)
+        resp.vary.add('Accept')
+        resp.set_etag(etag)
+        resp.last_modified = last_modified
+        resp.cache_control.no_cache = True  # clients may keep it but must revalidate
+        return resp.make_conditional(request)
+    return wrapper
+
+# ----------------------------------------------------------------------
+# Query parameters (filters, projection, keyset pagination)
+# ----------------------------------------------------------------------
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+@app.errorhandler(ApiError)
+def handle_api_error(e):
+    return jsonify({'error': e.message}), e.status
+
+_table_columns = {}
+
+def table_columns(table):
+    if table not in _table_columns:
+        _table_columns[table] = [c['name'] for c in inspect(get_db_engine()).get_columns(table)]
+    return _table_columns[table]
+
+def arg_date(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ApiError(f"'{name}' must be a date (YYYY-MM-DD)")
+
+def arg_limit(default):
+    raw = request.args.get('limit')
+    if raw is None:
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ApiError("'limit' must be an integer")
+    if not 1 <= limit <= API_MAX_PAGE_ROWS:
+        raise ApiError(f"'limit' must be between 1 and {API_MAX_PAGE_ROWS}")
+    return limit
+
+def arg_descending():
+    order = request.args.get('order', 'desc').lower()
+    if order not in ('asc', 'desc'):
+        raise ApiError("'order' must be 'asc' or 'desc'")
+    return order == 'desc'
+
+def arg_fields(table, key_cols):
+    """Returns (fields to output, columns to select); the key columns are always selected for the cursor."""
+    columns = table_columns(table)
+    raw = request.args.get('fields')
+    if not raw:
+        return columns, columns
+    fields = list(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in columns]
+    if unknown:
+        raise ApiError(f"Unknown field(s) for {table}: {', '.join(unknown)}")
+    return fields, fields + [c for c in key_cols if c not in fields]
+
+def keyset_sql(table, where, params, key_cols, select, descending, limit, cursor):
+    """
+    SELECT ordered by `key_cols`, continuing after `cursor` (the key values of the
+    previous page's last row). Served by the (ticker, date) / (ticker, report_date,
+    period) unique indexes. `limit` None means no LIMIT. Returns (sql, params).
+    """
+    where, params = list(where), dict(params)
+    op = '<' if descending else '>'
+    if cursor is not None:
+        # (k1, k2) < (c1, c2) spelled out, so it works on every backend
+        clauses = []
+        for i, col in enumerate(key_cols):
+            parts = [f"{prev} = :cursor_{j}" for j, prev in enumerate(key_cols[:i])]
+            parts.append(f"{col} {op} :cursor_{i}")
+            clauses.append('(' + ' AND '.join(parts) + ')')
+            params[f'cursor_{i}'] = cursor[i]
+        where.append('(' + ' OR '.join(clauses) + ')')
+    direction = 'DESC' if descending else 'ASC'
+    sql = (
+        f"SELECT {', '.join(select)} FROM {table} WHERE {' AND '.join(where)} "
+        f"ORDER BY {', '.join(f'{c} {direction}' for c in key_cols)}"
+    )
+    if limit is not None:
+        sql += " LIMIT :limit"
+        params['limit'] = limit
+    return sql, params
+
+def keyset_page(table, where, params, key_cols, fields, select, descending, limit, cursor):
+    """
+    One page of keyset_sql. Fetches limit + 1 rows to know whether there is a next page.
+    Returns (rows, headers) with X-Next-Cursor / Link headers when there is more.
+    """
+    sql, params = keyset_sql(table, where, params, key_cols, select, descending, limit + 1, cursor)
+    rows = query_rows(sql, **params)
+
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = ','.join(
+            v.isoformat() if isinstance(v, date) else str(v) for v in (last[c] for c in key_cols)
+        )
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        headers['X-Next-Cursor'] = next_cursor
+        headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    if fields != select:
+        rows = [{f: row[f] for f in fields} for row in rows]
+    return rows, headers
+
+def arg_cursor(parts):
+    """Parses ?cursor=<date>[,<period>] into [date, ...]."""
+    raw = request.args.get('cursor')
+    if not raw:
+        return None
+    values = raw.split(',')
+    if len(values) != parts:
+        raise ApiError("Invalid 'cursor'; use the X-Next-Cursor value of the previous page")
+    try:
+        values[0] = date.fromisoformat(values[0])
+    except ValueError:
+        raise ApiError("Invalid 'cursor'; use the X-Next-Cursor value of the previous page")
+    return values
+
+def arg_tickers():
+    """?tickers=AAPL,MSFT (repeatable); None means every ticker."""
+    raw = ','.join(request.args.getlist('tickers'))
+    tickers = list(dict.fromkeys(t.strip().upper() for t in raw.split(',') if t.strip()))
+    if len(tickers) > API_MAX_BATCH_TICKERS:
+        raise ApiError(f"At most {API_MAX_BATCH_TICKERS} tickers per request")
+    return tickers or None
+
+def arg_resolution(allowed):
+    """?resolution=daily (default) | weekly | monthly | lttb, limited to `allowed`."""
+    resolution = request.args.get('resolution', 'daily').lower()
+    if resolution not in allowed:
+        raise ApiError(f"'resolution' must be one of: {', '.join(allowed)}")
+    return resolution
+
+def arg_points():
+    raw = request.args.get('points')
+    if raw is None:
+        return API_LTTB_POINTS
+    try:
+        points = int(raw)
+    except ValueError:
+        raise ApiError("'points' must be an integer")
+    if not 3 <= points <= API_LTTB_POINTS:
+        raise ApiError(f"'points' must be between 3 and {API_LTTB_POINTS}")
+    return points
+
+def lttb_response(where, params):
+    """
+    The daily bars of the range reduced to ?points= with LTTB on close (whole rows
+    are kept, so every field is a real bar). Computed per request (the result
+    depends on the range), but cached like any other JSON response. Ranges of more
+    than API_MAX_PAGE_ROWS bars are rejected (fetches limit + 1 rows to know), so a
+    request never holds more than one page worth of rows.
+    """
+    if request.args.get('cursor') or stream_format():
+        raise ApiError("'resolution=lttb' returns one JSON response (no cursor, ndjson or csv)")
+    fields, select = arg_fields('stock_prices', ['date', 'close'])
+    sql, params = keyset_sql('stock_prices', where + ["close IS NOT NULL"], params, ['date'], select,
+                             descending=False, limit=API_MAX_PAGE_ROWS + 1, cursor=None)
+    rows = query_rows(sql, **params)
+    if len(rows) > API_MAX_PAGE_ROWS:
+        raise ApiError(f"'resolution=lttb' covers at most {API_MAX_PAGE_ROWS} daily bars: "
+                       f"narrow the range with 'start' / 'end'")
+    days = [(r['date'] if isinstance(r['date'], date) else date.fromisoformat(str(r['date'])[:10])).toordinal()
+            for r in rows]
+    kept = lttb_indices(days, [r['close'] for r in rows], arg_points())
+    rows = [rows[i] for i in kept]
+    if arg_descending():
+        rows.reverse()
+    if fields != select:
+        rows = [{f: row[f] for f in fields} for row in rows]
+    return rows
+
+# ----------------------------------------------------------------------
+# Streamed output (batch columnar JSON, NDJSON, CSV)
+# ----------------------------------------------------------------------
+STREAM_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+def stream_format():
+    """'ndjson' / 'csv' when the client asked for a streamed format, else None (plain JSON).
+
+    Negotiated from the Accept header; ?format=json|ndjson|csv overrides it (handy in a browser).
+    """
+    fmt = request.args.get('format')
+    if fmt:
+        if fmt != 'json' and fmt not in STREAM_FORMATS:
+            raise ApiError("'format' must be json, ndjson or csv")
+        return None if fmt == 'json' else fmt
+    best = request.accept_mimetypes.best_match(['application/json', *STREAM_FORMATS.values()])
+    return next((f for f, mimetype in STREAM_FORMATS.items() if mimetype == best), None)
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+def _chunked(pieces, size):
+    """Joins small text pieces into ~size-byte chunks so the server is not writing per row."""
+    buf, buffered = [], 0
+    for piece in pieces:
+        buf.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            yield ''.join(buf).encode('utf-8')
+            buf, buffered = [], 0
+    if buf:
+        yield ''.join(buf).encode('utf-8')
+
+def _gzipped(chunks):
+    # Sync-flush every chunk so the client can decode as the data arrives
+    gz = zlib.compressobj(API_STREAM_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        yield gz.compress(chunk) + gz.flush(zlib.Z_SYNC_FLUSH)
+    yield gz.flush()
+
+def streamed_response(pieces, mimetype):
+    """Chunked response from a generator of text pieces, gzip-encoded if the client accepts it."""
+    chunks = _chunked(pieces, API_STREAM_CHUNK_KB * 1024)
+    headers = {'Vary': 'Accept, Accept-Encoding'}
+    if request.accept_encodings['gzip']:
+        chunks = _gzipped(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+def iter_rows(stmt, params):
+    """Rows from a server-side cursor, fetched API_STREAM_BATCH_ROWS at a time."""
+    with get_db_engine().connect() as conn:
+        yield from conn.execution_options(yield_per=API_STREAM_BATCH_ROWS).execute(stmt, params)
+
+def stream_rows(sql, params, fields, fmt):
+    """
+    Streams the query as NDJSON (one object per line) or CSV (header + one line per row).
+    Rows are encoded as they come off the cursor, so memory does not grow with the result.
+    """
+    def ndjson():
+        for row in iter_rows(text(sql), params):
+            yield json.dumps(dict(zip(fields, row)), default=_json_default) + '\n'
+
+    def csv_lines():
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator='\n')
+        writer.writerow(fields)
+        for row in iter_rows(text(sql), params):
+            writer.writerow([v.isoformat() if isinstance(v, (date, datetime)) else v for v in row])
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+        yield out.getvalue()
+
+    return streamed_response(ndjson() if fmt == 'ndjson' else csv_lines(), STREAM_FORMATS[fmt])
+
+def stream_columnar(sql, params, fields, expanding=()):
+    """
+    Streams {"fields": [...], "tickers": {"AAPL": {"date": [...], "close": [...]}, ...}}.
+
+    `sql` must select ticker first and order by ticker. Rows come from a server-side
+    cursor in API_STREAM_BATCH_ROWS batches and only one ticker's columns are held
+    at a time, so memory does not grow with the number of tickers requested.
+    """
+    stmt = text(sql)
+    if expanding:
+        stmt = stmt.bindparams(*(bindparam(name, expanding=True) for name in expanding))
+
+    def encode(ticker, columns):
+        return json.dumps(ticker) + ': {' + ', '.join(
+            f'{json.dumps(name)}: {json.dumps(values, default=_json_default)}'
+            for name, values in zip(fields, columns)
+        ) + '}'
+
+    def generate():
+        yield '{"fields": ' + json.dumps(fields) + ', "tickers": {'
+        sep = ''
+        current, columns = None, None
+        for row in iter_rows(stmt, params):
+            if row[0] != current:
+                if current is not None:
+                    yield sep + encode(current, columns)
+                    sep = ', '
+                current, columns = row[0], [[] for _ in fields]
+            for values, value in zip(columns, row[1:]):
+                values.append(value)
+        if current is not None:
+            yield sep + encode(current, columns)
+        yield '}}\n'
+
+    return streamed_response(generate(), 'application/json')
+
+def generation_etag(variant=''):
+    """Weak ETag for streamed responses: same ETL generation + same query = same body."""
+    response_cache.refresh_generation()
+    generation = response_cache.generation
+    if generation is None:
+        return None
+    key = f"{request.path}?{urlencode(sorted(request.args.items(multi=True)))}#{variant}"
+    return f"{generation}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}"
+
+def conditional_stream(make_response, variant=''):
+    """304 if the client already has this generation's body, else make_response() with the ETag."""
+    etag = generation_etag(variant)
+    if etag and request.if_none_match.contains_weak(etag):
+        resp = Response(status=304)
+        resp.set_etag(etag, weak=True)
+        return resp
+    resp = make_response()
+    if etag:
+        resp.set_etag(etag, weak=True)
+        resp.cache_control.no_cache = True
+    return resp
+
+def batch_response(table, key_cols, extra_where=(), extra_params=None):
+    date_col = key_cols[0]
+    where, params = list(extra_where), dict(extra_params or {})
+    tickers = arg_tickers()
+    if tickers:
+        where.append("ticker IN :tickers")
+        params['tickers'] = tickers
+    start, end = arg_date('start'), arg_date('end')
+    if start:
+        where.append(f"{date_col} >= :start")
+        params['start'] = start
+    if end:
+        where.append(f"{date_col} <= :end")
+        params['end'] = end
+    fields, _ = arg_fields(table, key_cols)
+    fields = [f for f in fields if f != 'ticker']
+    sql = (
+        f"SELECT ticker, {', '.join(fields)} FROM {table}"
+        + (f" WHERE {' AND '.join(where)}" if where else '')
+        + f" ORDER BY ticker, {', '.join(key_cols)}"
+    )
+    return conditional_stream(
+        lambda: stream_columnar(sql, params, fields, expanding=('tickers',) if tickers else ())
+    )
+
+def table_response(table, where, params, key_cols, default_limit, cursor_parts):
+    """
+    Rows of one ticker: a keyset page of JSON, or, for NDJSON / CSV, the whole
+    filtered range streamed (?limit= still applies but has no default).
+    """
+    fields, select = arg_fields(table, key_cols)
+    descending, cursor = arg_descending(), arg_cursor(cursor_parts)
+    fmt = stream_format()
+    if fmt:
+        sql, params = keyset_sql(table, where, params, key_cols, fields, descending, arg_limit(None), cursor)
+        return conditional_stream(lambda: stream_rows(sql, params, fields, fmt), fmt)
+    return keyset_page(
+        table, where, params, key_cols, fields, select,
+        descending=descending, limit=arg_limit(default_limit), cursor=cursor,
+    )
 
 @app.route('/')
 def home():
@@ -35,25 +493,81 @@ def reports():
     return render_template('reports.html')
 
 # API endpoints for data
+# Plain JSON by default; Accept: application/x-ndjson or text/csv (or ?format=ndjson|csv)
+# streams the rows instead, gzipped when the client sends Accept-Encoding: gzip.
 @app.route('/api/companies')
+@cached_json
 def get_companies():
-    engine = get_db_engine()
-    df = pd.read_sql("SELECT * FROM companies", engine)
-    return jsonify(df.to_dict(orient='records'))
+    fmt = stream_format()
+    if fmt:
+        return conditional_stream(
+            lambda: stream_rows("SELECT * FROM companies", {}, table_columns('companies'), fmt), fmt
+        )
+    return query_rows("SELECT * FROM companies")
 
+# ?start=&end= (dates), ?fields=a,b, ?order=asc|desc, ?limit= and ?cursor= (keyset)
+# ?resolution=weekly|monthly pages through the precomputed OHLCV bars (dated by
+# period start); ?resolution=lttb&points=N returns the range as N daily bars.
 @app.route('/api/stock_prices/<ticker>')
+@cached_json
 def get_stock_prices(ticker):
-    engine = get_db_engine()
-    query = f"SELECT * FROM stock_prices WHERE ticker = '{ticker}' ORDER BY date DESC LIMIT 100"
-    df = pd.read_sql(query, engine)
-    return jsonify(df.to_dict(orient='records'))
+    resolution = arg_resolution(['daily', 'lttb'] + list(RESOLUTIONS))
+    where, params = ["ticker = :ticker"], {'ticker': ticker}
+    start, end = arg_date('start'), arg_date('end')
+    if start:
+        where.append("date >= :start")
+        params['start'] = start
+    if end:
+        where.append("date <= :end")
+        params['end'] = end
+    if resolution == 'lttb':
+        return lttb_response(where, params)
+    if resolution in RESOLUTIONS:
+        where.append("resolution = :resolution")
+        params['resolution'] = resolution
+        return table_response(RESAMPLED_TABLE, where, params, ['date'], API_DEFAULT_PAGE_ROWS, 1)
+    return table_response('stock_prices', where, params, ['date'], API_DEFAULT_PAGE_ROWS, 1)
 
+# Same parameters plus ?period=FY|Q; the cursor is "<report_date>,<period>"
 @app.route('/api/financials/<ticker>')
+@cached_json
 def get_financials(ticker):
-    engine = get_db_engine()
-    query = f"SELECT * FROM financial_statements WHERE ticker = '{ticker}' ORDER BY report_date DESC"
-    df = pd.read_sql(query, engine)
-    return jsonify(df.to_dict(orient='records'))
+    where, params = ["ticker = :ticker"], {'ticker': ticker}
+    start, end = arg_date('start'), arg_date('end')
+    if start:
+        where.append("report_date >= :start")
+        params['start'] = start
+    if end:
+        where.append("report_date <= :end")
+        params['end'] = end
+    period = request.args.get('period')
+    if period:
+        where.append("period = :period")
+        params['period'] = period
+    return table_response('financial_statements', where, params, ['report_date', 'period'], API_MAX_PAGE_ROWS, 2)
+
+# ?tickers=AAPL,MSFT (default: all), ?start=&end=, ?fields=a,b,
+# ?resolution=daily|weekly|monthly; ascending by date
+@app.route('/api/batch/stock_prices')
+def batch_stock_prices():
+    resolution = arg_resolution(['daily'] + list(RESOLUTIONS))
+    if resolution in RESOLUTIONS:
+        return batch_response(RESAMPLED_TABLE, ['date'],
+                              ["resolution = :resolution"], {'resolution': resolution})
+    return batch_response('stock_prices', ['date'])
+
+# Same parameters plus ?period=FY|Q
+@app.route('/api/batch/financials')
+def batch_financials():
+    period = request.args.get('period')
+    if period:
+        return batch_response('financial_statements', ['report_date', 'period'],
+                              ["period = :period"], {'period': period})
+    return batch_response('financial_statements', ['report_date', 'period'])
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    return jsonify(response_cache.stats())
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,166 @@
+# backend/etl/bench_clean_financials.py
+# Author: Hoang Son Lai
+#
+# Times clean_data.map_financials (field/ratio registries, one NumPy pass
+# over a float64 block) against the previous column-by-column pandas code,
+# kept below as legacy_financials, on a synthetic raw statement frame:
+# --companies x --periods rows, with the mapped yfinance labels among
+# --extra unrelated columns (the raw files have ~280), ~5% missing values
+# and ~2% zero denominators.
+#
+# Both outputs are written to CSV in memory; the script exits with status 1
+# if they are not byte-identical, so it also guards changes to the registries.
+#
+#   python bench_clean_financials.py --companies 10000 --periods 12
+
+import argparse
+import io
+import sys
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from clean_data import FINANCIAL_FIELDS, map_financials
+
+
+def synthetic_financials(n_companies, n_periods, n_extra, seed=0):
+    rng = np.random.default_rng(seed)
+    n = n_companies * n_periods
+    labels = [aliases[0] for name, aliases in FINANCIAL_FIELDS if name != 'accounts_receivable']
+    labels.append('Receivables')  # fallback label: 'Accounts Receivable' is absent
+    columns = {
+        'Date': np.tile(pd.date_range(end='2026-01-01', periods=n_periods, freq='QE').strftime('%Y-%m-%d'),
+                        n_companies),
+        'Ticker': np.repeat([f'T{i:05d}' for i in range(n_companies)], n_periods),
+        'Report_Period': np.tile(np.where(np.arange(n_periods) % 4 == 3, 'FY', 'Q'), n_companies),
+    }
+    for label in labels:
+        values = rng.normal(1e9, 5e8, n)
+        values[rng.random(n) < 0.05] = np.nan
+        values[rng.random(n) < 0.02] = 0.0
+        columns[label] = values
+    for i in range(n_extra):
+        columns[f'Extra Item {i}'] = rng.normal(0, 1e8, n)
+    return pd.DataFrame(columns)
+
+
+def legacy_financials(df):
+    """clean_financials before the registries (mapping + ratios + formatting); adds columns to df."""
+    def get_col(col_name):
+        return df[col_name] if col_name in df.columns else 0
+
+    df['revenue'] = get_col('Total Revenue')
+    df['cogs'] = get_col('Cost Of Revenue')
+    df['gross_profit'] = get_col('Gross Profit')
+    df['opex'] = get_col('Operating Expense') if 'Operating Expense' in df.columns else get_col('Total Operating Expenses')
+    if 'Accounts Receivable' in df.columns:
+        df['accounts_receivable'] = get_col('Accounts Receivable')
+    elif 'Net Receivables' in df.columns:
+        df['accounts_receivable'] = get_col('Net Receivables')
+    elif 'Receivables' in df.columns:
+        df['accounts_receivable'] = get_col('Receivables')
+    else:
+        df['accounts_receivable'] = 0
+    df['operating_income_ebit'] = get_col('Operating Income')
+    df['ebt'] = get_col('Pretax Income')
+    df['net_income'] = get_col('Net Income')
+    df['ebitda'] = get_col('EBITDA')
+    df['basic_eps'] = get_col('Basic EPS')
+    df['diluted_eps'] = get_col('Diluted EPS')
+    df['total_assets'] = get_col('Total Assets')
+    df['current_assets'] = get_col('Current Assets')
+    df['cash_and_equivalents'] = get_col('Cash And Cash Equivalents')
+    df['inventory'] = get_col('Inventory')
+    df['non_current_assets'] = df['total_assets'] - df['current_assets']
+    df['total_liabilities'] = get_col('Total Liabilities Net Minority Interest')
+    df['current_liabilities'] = get_col('Current Liabilities')
+    df['accounts_payable'] = get_col('Accounts Payable')
+    df['short_term_debt'] = get_col('Current Debt')
+    df['long_term_debt'] = get_col('Long Term Debt')
+    df['total_equity'] = get_col('Stockholders Equity')
+    df['common_stock'] = get_col('Common Stock')
+    df['retained_earnings'] = get_col('Retained Earnings')
+    interest_expense = get_col('Interest Expense')
+
+    df['current_ratio'] = df['current_assets'] / df['current_liabilities'].replace(0, np.nan)
+    df['quick_ratio'] = (df['current_assets'] - df['inventory']) / df['current_liabilities'].replace(0, np.nan)
+    df['cash_ratio'] = df['cash_and_equivalents'] / df['current_liabilities'].replace(0, np.nan)
+    df['debt_to_equity'] = df['total_liabilities'] / df['total_equity'].replace(0, np.nan)
+    df['debt_ratio'] = df['total_liabilities'] / df['total_assets'].replace(0, np.nan)
+    df['interest_coverage_ratio'] = df['operating_income_ebit'] / interest_expense.replace(0, np.nan)
+    df['roa'] = df['net_income'] / df['total_assets'].replace(0, np.nan)
+    df['roe'] = df['net_income'] / df['total_equity'].replace(0, np.nan)
+    df['gross_margin'] = df['gross_profit'] / df['revenue'].replace(0, np.nan)
+    df['net_margin'] = df['net_income'] / df['revenue'].replace(0, np.nan)
+    df['asset_turnover'] = df['revenue'] / df['total_assets'].replace(0, np.nan)
+    df['inventory_turnover'] = df['cogs'] / df['inventory'].replace(0, np.nan)
+    df['receivables_turnover'] = df['revenue'] / df['accounts_receivable'].replace(0, np.nan)
+
+    df['report_date'] = pd.to_datetime(df['Date'], utc=True).dt.date
+    df['period'] = df['Report_Period'] if 'Report_Period' in df.columns else 'FY'
+    df.rename(columns={'Ticker': 'ticker'}, inplace=True)
+    schema_cols = [
+        'ticker', 'report_date', 'period',
+        'revenue', 'cogs', 'gross_profit', 'opex', 'operating_income_ebit',
+        'ebt', 'net_income', 'ebitda', 'basic_eps', 'diluted_eps',
+        'total_assets', 'current_assets', 'cash_and_equivalents', 'accounts_receivable',
+        'inventory', 'non_current_assets', 'total_liabilities', 'current_liabilities',
+        'accounts_payable', 'short_term_debt', 'long_term_debt', 'total_equity',
+        'common_stock', 'retained_earnings',
+        'current_ratio', 'quick_ratio', 'cash_ratio', 'debt_to_equity',
+        'debt_ratio', 'interest_coverage_ratio', 'roa', 'roe',
+        'gross_margin', 'net_margin', 'asset_turnover', 'inventory_turnover', 'receivables_turnover'
+    ]
+    df_final = df[[col for col in schema_cols if col in df.columns]].copy()
+    df_final.dropna(subset=['ticker', 'report_date'], inplace=True)
+    return df_final
+
+
+def best_of(fn, raw, repeat):
+    times = []
+    for _ in range(repeat):
+        frame = raw.copy()  # legacy_financials adds its columns to the raw frame
+        started = time.perf_counter()
+        out = fn(frame)
+        times.append(time.perf_counter() - started)
+    return out, min(times)
+
+
+def csv_bytes(df):
+    buf = io.StringIO()
+    df.to_csv(buf, index=False)
+    return buf.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registry-based vs legacy financial statement cleaning.")
+    parser.add_argument('--companies', type=int, default=10000)
+    parser.add_argument('--periods', type=int, default=12, help="Statements per company (annual + quarterly)")
+    parser.add_argument('--extra', type=int, default=250, help="Unrelated raw columns")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    raw = synthetic_financials(args.companies, args.periods, args.extra)
+    print(f"Synthetic raw statements: {len(raw)} rows x {raw.shape[1]} columns "
+          f"({args.companies} companies x {args.periods} periods)\n")
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', pd.errors.PerformanceWarning)
+        old, t_old = best_of(legacy_financials, raw, args.repeat)
+    new, t_new = best_of(map_financials, raw, args.repeat)
+
+    print(f"{'implementation':<22} {'best ms':>10}")
+    print('-' * 33)
+    print(f"{'legacy (pandas)':<22} {t_old * 1000:>10.1f}")
+    print(f"{'registries (NumPy)':<22} {t_new * 1000:>10.1f}")
+    print(f"\nSpeedup: {t_old / t_new:.1f}x")
+
+    if csv_bytes(old) != csv_bytes(new):
+        diff = [c for c in old.columns if not old[c].equals(new.get(c))]
+        print(f"\nFAILED: outputs differ (columns: {', '.join(diff) or 'layout'})")
+        sys.exit(1)
+    print("OK: CSV output is byte-identical.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# backend/etl/bench_clean_incremental.py
+# Author: Hoang Son Lai
+#
+# Incremental vs full cleaning of financial statements (clean_state.py), in
+# a temporary directory, on synthetic raw statements laid out like the
+# real files (all annual rows, then all quarterly rows, one block per
+# ticker). After a full clean it applies a typical daily change:
+#
+#   - --changed tickers get a new quarter (the case the fingerprints target)
+#   - one ticker restates an old annual value
+#   - one ticker is dropped and one new ticker appears
+#
+# then cleans incrementally, and compares the file byte for byte with a
+# full rebuild of the same raw frame. Exits with status 1 if they differ.
+#
+#   python bench_clean_incremental.py --companies 10000 --changed 1
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+from bench_clean_financials import synthetic_financials
+from clean_data import map_financials
+import clean_state
+
+
+def synthetic_raw(n_companies, n_extra):
+    """Annual file + quarterly file, concatenated as clean_financials does."""
+    annual = synthetic_financials(n_companies, 4, n_extra, seed=1).assign(Report_Period='FY')
+    quarterly = synthetic_financials(n_companies, 5, n_extra, seed=2).assign(Report_Period='Q')
+    return annual, quarterly
+
+
+def timed_splice(raw, path, full):
+    started = time.perf_counter()
+    stats = clean_state.splice('financial_statements', raw, 'Ticker', map_financials, full=full,
+                               path=path, fingerprint_path=path + '.json')
+    return stats, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental vs full financial statement cleaning.")
+    parser.add_argument('--companies', type=int, default=10000)
+    parser.add_argument('--changed', type=int, default=1, help="Tickers that get a new quarter")
+    parser.add_argument('--extra', type=int, default=250, help="Unrelated raw columns")
+    args = parser.parse_args()
+
+    annual, quarterly = synthetic_raw(args.companies, args.extra)
+    before = pd.concat([annual, quarterly], ignore_index=True)
+
+    tickers = annual['Ticker'].unique()
+    new_rows = quarterly.groupby('Ticker', sort=False).tail(1).head(args.changed).copy()
+    new_rows['Date'] = '2026-03-31'
+    parts = []
+    for ticker, grp in quarterly.groupby('Ticker', sort=False):
+        parts.append(grp)
+        parts.append(new_rows[new_rows['Ticker'] == ticker])
+    quarterly2 = pd.concat(parts)
+    annual2 = annual.copy()
+    annual2.loc[annual2['Ticker'] == tickers[-1], 'Total Revenue'] *= 1.01
+    newcomer = annual[annual['Ticker'] == tickers[0]].assign(Ticker='NEW')
+    dropped = tickers[1]
+    after = pd.concat([annual2, newcomer, quarterly2], ignore_index=True)
+    after = after[after['Ticker'] != dropped].reset_index(drop=True)
+    print(f"Synthetic raw statements: {len(before)} rows, {args.companies} tickers; then "
+          f"{args.changed} new quarter(s), 1 restatement, 1 ticker added, 1 removed\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inc_path = os.path.join(tmp, 'incremental.csv')
+        full_path = os.path.join(tmp, 'full.csv')
+        _, t_first = timed_splice(before, inc_path, full=True)
+        _, t_same = timed_splice(before, inc_path, full=False)
+        stats, t_inc = timed_splice(after, inc_path, full=False)
+        _, t_full = timed_splice(after, full_path, full=True)
+        with open(inc_path, 'rb') as f:
+            incremental = f.read()
+        with open(full_path, 'rb') as f:
+            rebuilt = f.read()
+
+    print(f"{'run':<34} {'ms':>9}")
+    print('-' * 44)
+    print(f"{'full clean':<34} {t_first * 1000:>9.1f}")
+    print(f"{'incremental, nothing changed':<34} {t_same * 1000:>9.1f}")
+    print(f"{'incremental, daily change':<34} {t_inc * 1000:>9.1f}")
+    print(f"{'full rebuild, daily change':<34} {t_full * 1000:>9.1f}")
+    print(f"\nIncremental: {stats['cleaned']} re-cleaned, {stats['reused']} reused, "
+          f"{stats['removed']} removed; {t_full / t_inc:.1f}x faster than a full rebuild")
+
+    if incremental != rebuilt:
+        print("\nFAILED: incremental file differs from the full rebuild")
+        sys.exit(1)
+    print("OK: incremental file is byte-identical to the full rebuild.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# backend/etl/bench_downsample.py
+# Author: Hoang Son Lai
+#
+# Visual error and cost of the chart downsampling methods in downsample.py,
+# per ticker, against the full daily series:
+#
+#   lttb     Largest-Triangle-Three-Buckets to N points
+#   stride   every k-th bar to N points (the naive baseline)
+#   weekly   weekly OHLCV bars (close at the week's last trading day)
+#   monthly  monthly OHLCV bars
+#
+# Error = |close - reduced line| / (max close - min close), i.e. the fraction
+# of the chart height the reduced line is off; "max" is the worst bar of the
+# worst ticker, "mean" the average over all bars. Exits with status 1 when
+# LTTB's worst error exceeds --max-error or its mean error exceeds
+# --max-mean-error, so it can guard changes to the downsampling code.
+#
+#   python bench_downsample.py                      # cleaned stock_prices
+#   python bench_downsample.py --synthetic --tickers 100 --years 7 --points 300 500 1000
+
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+from storage import CsvStore, read_table
+from bench_storage import synthetic_prices
+from downsample import lttb, resample_ohlcv, series_error
+
+
+def stride(prices, n_out):
+    parts = []
+    for _, group in prices.groupby('ticker', sort=False):
+        idx = np.unique(np.linspace(0, len(group) - 1, min(n_out, len(group))).round().astype(int))
+        parts.append(group.iloc[idx])
+    return pd.concat(parts, ignore_index=True)
+
+
+def measure(prices, reduced, elapsed):
+    full = dict(tuple(prices.groupby('ticker', sort=False)))
+    maxes, means, weights, points = [], [], [], []
+    for ticker, part in reduced.groupby('ticker', sort=False):
+        worst, mean = series_error(full[ticker], part)
+        maxes.append(worst)
+        means.append(mean)
+        weights.append(len(full[ticker]))
+        points.append(len(part))
+    return {
+        'points': float(np.mean(points)),
+        'max_error': max(maxes),
+        'mean_error': float(np.average(means, weights=weights)),
+        'ms': elapsed * 1000,
+    }
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Visual error of LTTB / stride / OHLCV downsampling.")
+    parser.add_argument('--points', type=int, nargs='+', default=[300, 500])
+    parser.add_argument('--synthetic', action='store_true', help="Use synthetic bars instead of stock_prices")
+    parser.add_argument('--tickers', type=int, default=50)
+    parser.add_argument('--years', type=int, default=7)
+    parser.add_argument('--max-error', type=float, default=0.15,
+                        help="Fail if LTTB's worst bar is off by more than this fraction of the range")
+    parser.add_argument('--max-mean-error', type=float, default=0.02,
+                        help="Fail if LTTB's mean error exceeds this fraction of the range")
+    args = parser.parse_args()
+
+    if args.synthetic or not CsvStore().exists('stock_prices'):
+        prices = synthetic_prices(args.tickers, args.years)
+        source = f"synthetic ({args.tickers} tickers x {args.years}y)"
+    else:
+        prices = read_table('stock_prices', columns=['ticker', 'date', 'open', 'high', 'low', 'close', 'volume'])
+        source = f"stock_prices ({prices['ticker'].nunique()} tickers)"
+    prices = prices.dropna(subset=['close']).sort_values(['ticker', 'date'], kind='mergesort')
+    prices['date'] = pd.to_datetime(prices['date'])
+    print(f"Source: {source}, {len(prices)} daily bars, "
+          f"{len(prices) / prices['ticker'].nunique():.0f} per ticker\n")
+
+    header = f"{'method':<16} {'points':>8} {'max err %':>10} {'mean err %':>11} {'time ms':>9}"
+    print(header)
+    print('-' * len(header))
+    failures = []
+    rows = []
+    for resolution in ('weekly', 'monthly'):
+        reduced, elapsed = timed(resample_ohlcv, prices, resolution, label='last')
+        rows.append((resolution, measure(prices, reduced, elapsed)))
+    for n in args.points:
+        for name, fn in (('lttb', lttb), ('stride', stride)):
+            reduced, elapsed = timed(fn, prices, n)
+            result = measure(prices, reduced, elapsed)
+            rows.append((f"{name} {n}", result))
+            if name == 'lttb':
+                if result['max_error'] > args.max_error:
+                    failures.append(f"lttb {n}: max error {result['max_error']:.2%} > {args.max_error:.2%}")
+                if result['mean_error'] > args.max_mean_error:
+                    failures.append(f"lttb {n}: mean error {result['mean_error']:.2%} > {args.max_mean_error:.2%}")
+    for name, r in rows:
+        print(f"{name:<16} {r['points']:>8.0f} {r['max_error'] * 100:>10.2f} "
+              f"{r['mean_error'] * 100:>11.3f} {r['ms']:>9.1f}")
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print(f"\nOK: LTTB within {args.max_error:.0%} max / {args.max_mean_error:.0%} mean error of the chart height.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# backend/etl/bench_memory.py
+# Author: Hoang Son Lai
+#
+# Bytes per row and peak RSS of the cleaned price and financial tables as
+# loaded before schema.py (read_csv + pd.to_datetime: object tickers, int64
+# / float64 columns) and with its compact dtypes, on synthetic data. Prices
+# are rounded to the DECIMAL(15,4) scale like the stored values, so the
+# float32 case applies.
+#
+#   python bench_memory.py --tickers 500 --years 7 --companies 5000
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import pandas as pd
+from bench_clean_financials import synthetic_financials
+from bench_storage import peak_rss_kb, synthetic_prices
+from clean_data import map_financials
+from schema import PRICE_COLUMNS, PRICE_SCALE, bytes_per_row
+from storage import CsvStore, TABLES
+
+CASES = {
+    'legacy': 'read_csv + to_datetime (before)',
+    'compact': 'schema.py dtypes',
+    'float32': 'schema.py dtypes + float32 prices',
+}
+
+
+def legacy_read(path, name):
+    df = pd.read_csv(path)
+    for col in TABLES[name]['dates']:
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+    return df
+
+
+def run_case(case, name, root):
+    """Loads one table in this (fresh) process and prints bytes per row and peak RSS growth."""
+    store = CsvStore(root=root)
+    rss_before = peak_rss_kb()
+    started = time.perf_counter()
+    if case == 'legacy':
+        df = legacy_read(store.path(name), name)
+    else:
+        df = store.read(name, float32=case == 'float32')
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        'elapsed_ms': elapsed * 1000,
+        'peak_rss_mb': (peak_rss_kb() - rss_before) / 1024,
+        'bytes_per_row': bytes_per_row(df),
+        'rows': len(df),
+        'dtypes': sorted({str(t) for t in df.dtypes}),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per row of the cleaned tables, before/after schema.py.")
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--years', type=int, default=7)
+    parser.add_argument('--companies', type=int, default=5000)
+    parser.add_argument('--case', choices=sorted(CASES), help=argparse.SUPPRESS)
+    parser.add_argument('--table', help=argparse.SUPPRESS)
+    parser.add_argument('--root', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        run_case(args.case, args.table, args.root)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CsvStore(root=tmp)
+        prices = synthetic_prices(args.tickers, args.years)
+        prices[PRICE_COLUMNS] = prices[PRICE_COLUMNS].round(PRICE_SCALE)
+        store.write('stock_prices', prices)
+        financials = map_financials(synthetic_financials(args.companies, 12, 0))
+        store.write('financial_statements', financials)
+        del prices, financials
+
+        print(f"Synthetic: stock_prices {args.tickers} tickers x {args.years}y, "
+              f"financial_statements {args.companies} companies x 12 periods\n")
+        header = f"{'table / load':<52} {'B/row':>8} {'vs before':>10} {'peak RSS':>10} {'ms':>8}"
+        print(header)
+        print('-' * len(header))
+        for name in ('stock_prices', 'financial_statements'):
+            baseline = None
+            for case, label in CASES.items():
+                if case == 'float32' and not any(TABLES[name]['decimals'].get(c) for c in PRICE_COLUMNS):
+                    continue
+                # Each load runs in its own process so peak RSS is not polluted by the others
+                out = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--case', case, '--table', name, '--root', tmp],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                r = json.loads(out.strip().splitlines()[-1])
+                baseline = baseline or r['bytes_per_row']
+                print(f"{name + ': ' + label:<52} {r['bytes_per_row']:>8.1f} "
+                      f"{r['bytes_per_row'] / baseline:>9.0%} {r['peak_rss_mb']:>7.1f} MB {r['elapsed_ms']:>8.1f}")
+            print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# backend/etl/bench_storage.py
+# Author: Hoang Son Lai
+#
+# Compares load time and memory of the cleaned price table stored as CSV
+# (current path: read_csv + pd.to_datetime) vs the ticker-partitioned
+# Parquet dataset from storage.py, on synthetic daily bars.
+#
+#   python bench_storage.py --tickers 500 --years 7
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from storage import CsvStore, ParquetStore
+
+
+def synthetic_prices(n_tickers, years, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end='2026-01-01', periods=252 * years).date
+    frames = []
+    for i in range(n_tickers):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates))))
+        frames.append(pd.DataFrame({
+            'ticker': f'T{i:04d}',
+            'date': dates,
+            'open': close * (1 + rng.normal(0, 0.005, len(dates))),
+            'high': close * 1.01,
+            'low': close * 0.99,
+            'close': close,
+            'adj_close': close,
+            'volume': rng.integers(1e5, 1e8, len(dates)),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+CASES = {
+    'csv_full':    ('CSV     full table',        'csv',     None,                      False),
+    'pq_full':     ('Parquet full table',        'parquet', None,                      False),
+    'csv_cols':    ('CSV     ticker,date,close', 'csv',     ['ticker', 'date', 'close'], False),
+    'pq_cols':     ('Parquet ticker,date,close', 'parquet', ['ticker', 'date', 'close'], False),
+    'csv_tickers': ('CSV     5 tickers',         'csv',     None,                      True),
+    'pq_tickers':  ('Parquet 5 tickers',         'parquet', None,                      True),
+}
+
+
+def peak_rss_kb():
+    """High-water RSS of this process. VmHWM is reset on exec, unlike ru_maxrss which is
+    inherited from the (large) parent process."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_case(case, root):
+    """Runs one read in this (fresh) process and prints elapsed time and peak RSS growth."""
+    _, fmt, columns, subset = CASES[case]
+    store = CsvStore(root=root) if fmt == 'csv' else ParquetStore(root=os.path.join(root, 'parquet'))
+    tickers = [f'T{i:04d}' for i in range(5)] if subset else None
+    rss_before = peak_rss_kb()
+    started = time.perf_counter()
+    df = store.read('stock_prices', columns=columns, tickers=tickers)
+    elapsed = time.perf_counter() - started
+    rss_peak = peak_rss_kb() - rss_before
+    print(json.dumps({
+        'elapsed_ms': elapsed * 1000,
+        'peak_rss_mb': rss_peak / 1024,  # KiB -> MiB
+        'frame_mb': df.memory_usage(deep=True).sum() / 1e6,
+        'rows': len(df),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV vs Parquet load benchmark for the cleaned price table.")
+    parser.add_argument('--tickers', type=int, default=200)
+    parser.add_argument('--years', type=int, default=7)
+    parser.add_argument('--case', choices=sorted(CASES), help=argparse.SUPPRESS)
+    parser.add_argument('--root', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        run_case(args.case, args.root)
+        return
+
+    df = synthetic_prices(args.tickers, args.years)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_store = CsvStore(root=tmp)
+        pq_store = ParquetStore(root=os.path.join(tmp, 'parquet'))
+        csv_store.write('stock_prices', df)
+        pq_store.write('stock_prices', df)
+        del df
+
+        csv_mb = os.path.getsize(csv_store.path('stock_prices')) / 1e6
+        pq_mb = sum(
+            os.path.getsize(os.path.join(root, f))
+            for root, _, files in os.walk(pq_store.path('stock_prices')) for f in files
+        ) / 1e6
+        print(f"{args.tickers} tickers x {args.years}y | on disk: CSV {csv_mb:.1f} MB, Parquet {pq_mb:.1f} MB\n")
+
+        # Each read runs in its own process so peak RSS is not polluted by the others
+        for case, (label, *_rest) in CASES.items():
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--case', case, '--root', tmp],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(
+                f"{label:<28} {r['elapsed_ms']:9.1f} ms   peak RSS +{r['peak_rss_mb']:7.1f} MB   "
+                f"frame {r['frame_mb']:7.1f} MB   rows {r['rows']:>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+# backend/etl/bench_views.py
+# Author: Hoang Son Lai
+#
+# Query timings of the view workloads before and after the materialized
+# tables (materialize.py): each query is run as the views used to compute it
+# (latest-report ROW_NUMBER() subquery over financial_statements, AVG(close)
+# window over stock_prices) and as a read of latest_financials /
+# price_metrics. The two result sets must match. The SQL is the portable
+# core of each view, without the display formatting (FORMAT / TO_CHAR).
+#
+# By default everything runs on a synthetic SQLite database. The script then
+# also times an incremental refresh after a daily load (a new bar for every
+# ticker, a restated older bar, new FY statements) and checks that the
+# refreshed tables equal a full rebuild. With --target it times a loaded
+# MySQL/Supabase database (read-only). Exits with status 1 on any mismatch.
+#
+#   python bench_views.py --tickers 500 --years 7 --repeat 5
+#   python bench_views.py --target supabase
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import pandas as pd
+from sqlalchemy import create_engine, text
+from bench_clean_financials import synthetic_financials
+from bench_storage import synthetic_prices
+from clean_data import FINANCIAL_COLUMNS, map_financials
+from schema import PRICE_COLUMNS, PRICE_SCALE
+import materialize
+
+SECTORS = ['Technology', 'Financial Services', 'Healthcare', 'Consumer Cyclical', 'Energy']
+
+
+def latest(condition):
+    """The latest-report subquery the views repeated, with their per-view filter."""
+    return f"""(
+        SELECT f1.*, ROW_NUMBER() OVER (PARTITION BY f1.ticker ORDER BY f1.report_date DESC) AS rn
+        FROM financial_statements f1
+        WHERE {condition} AND f1.period = 'FY'
+    )"""
+
+
+# (view, legacy SQL, SQL over the materialized tables); {ticker} = the ticker of view 8
+QUERIES = [
+    ('1 top revenue', f"""
+        SELECT c.name, c.sector, f.report_date, f.revenue, f.net_income
+        FROM {latest('f1.revenue IS NOT NULL AND f1.revenue > 0')} f JOIN companies c ON f.ticker = c.ticker
+        WHERE f.rn = 1 ORDER BY f.revenue DESC, c.ticker LIMIT 10
+    """, """
+        SELECT c.name, c.sector, f.report_date, f.revenue, f.net_income
+        FROM latest_financials f JOIN companies c ON f.ticker = c.ticker
+        WHERE f.basis = 'revenue' ORDER BY f.revenue DESC, c.ticker LIMIT 10
+    """),
+    ('2 net margin', f"""
+        SELECT c.ticker, c.name, f.report_date, ROUND(f.net_margin * 100, 2), ROUND(f.gross_margin * 100, 2)
+        FROM {latest('f1.revenue > 0')} f JOIN companies c ON f.ticker = c.ticker
+        WHERE f.rn = 1 ORDER BY f.net_margin DESC, c.ticker LIMIT 10
+    """, """
+        SELECT c.ticker, c.name, f.report_date, ROUND(f.net_margin * 100, 2), ROUND(f.gross_margin * 100, 2)
+        FROM latest_financials f JOIN companies c ON f.ticker = c.ticker
+        WHERE f.basis = 'revenue' ORDER BY f.net_margin DESC, c.ticker LIMIT 10
+    """),
+    ('3 debt risk', f"""
+        SELECT c.name, c.industry, f.debt_to_equity, f.current_ratio, f.interest_coverage_ratio, f.report_date
+        FROM {latest('f1.debt_to_equity IS NOT NULL')} f JOIN companies c ON f.ticker = c.ticker
+        WHERE f.rn = 1 AND f.debt_to_equity > 2 ORDER BY f.debt_to_equity DESC, c.ticker
+    """, """
+        SELECT c.name, c.industry, f.debt_to_equity, f.current_ratio, f.interest_coverage_ratio, f.report_date
+        FROM latest_financials f JOIN companies c ON f.ticker = c.ticker
+        WHERE f.basis = 'debt_to_equity' AND f.debt_to_equity > 2 ORDER BY f.debt_to_equity DESC, c.ticker
+    """),
+    ('4 ROE / ROA', f"""
+        SELECT c.ticker, c.name, f.report_date, ROUND(f.roe * 100, 2), ROUND(f.roa * 100, 2)
+        FROM {latest('f1.roe IS NOT NULL')} f JOIN companies c ON f.ticker = c.ticker
+        WHERE f.rn = 1 ORDER BY f.roe DESC, c.ticker LIMIT 10
+    """, """
+        SELECT c.ticker, c.name, f.report_date, ROUND(f.roe * 100, 2), ROUND(f.roa * 100, 2)
+        FROM latest_financials f JOIN companies c ON f.ticker = c.ticker
+        WHERE f.basis = 'roe' ORDER BY f.roe DESC, c.ticker LIMIT 10
+    """),
+    ('5 sector margins', f"""
+        SELECT c.sector, COUNT(DISTINCT f.ticker), ROUND(AVG(f.net_margin) * 100, 2),
+               ROUND(AVG(f.roe) * 100, 2), MAX(f.report_date)
+        FROM {latest('f1.revenue > 0')} f JOIN companies c ON f.ticker = c.ticker
+        WHERE f.rn = 1 GROUP BY c.sector ORDER BY c.sector
+    """, """
+        SELECT c.sector, COUNT(DISTINCT f.ticker), ROUND(AVG(f.net_margin) * 100, 2),
+               ROUND(AVG(f.roe) * 100, 2), MAX(f.report_date)
+        FROM latest_financials f JOIN companies c ON f.ticker = c.ticker
+        WHERE f.basis = 'revenue' GROUP BY c.sector ORDER BY c.sector
+    """),
+    ('6 P/E', """
+        SELECT lp.ticker, lp.close, le.basic_eps, ROUND(lp.close / NULLIF(le.basic_eps, 0), 2)
+        FROM (SELECT ticker, close FROM stock_prices WHERE date = (SELECT MAX(date) FROM stock_prices)) lp
+        JOIN (
+            SELECT f1.ticker, f1.basic_eps FROM financial_statements f1
+            JOIN (SELECT ticker, MAX(report_date) AS max_date FROM financial_statements
+                  WHERE period = 'FY' GROUP BY ticker) f2
+              ON f1.ticker = f2.ticker AND f1.report_date = f2.max_date
+            WHERE f1.period = 'FY'
+        ) le ON lp.ticker = le.ticker
+        ORDER BY lp.ticker
+    """, """
+        SELECT lp.ticker, lp.close, le.basic_eps, ROUND(lp.close / NULLIF(le.basic_eps, 0), 2)
+        FROM (SELECT ticker, close FROM stock_prices WHERE date = (SELECT MAX(date) FROM stock_prices)) lp
+        JOIN latest_financials le ON lp.ticker = le.ticker AND le.basis = 'fy'
+        ORDER BY lp.ticker
+    """),
+    ('8 MA 30 (one ticker)', f"""
+        SELECT ticker, date, close, AVG(close) OVER (
+            PARTITION BY ticker ORDER BY date ROWS BETWEEN {materialize.MA_WINDOW - 1} PRECEDING AND CURRENT ROW
+        ) AS ma_30
+        FROM stock_prices WHERE ticker = '{{ticker}}' ORDER BY date DESC LIMIT 100
+    """, """
+        SELECT ticker, date, close, ma_30
+        FROM price_metrics WHERE ticker = '{ticker}' ORDER BY date DESC LIMIT 100
+    """),
+]
+
+
+def build_synthetic(engine, n_tickers, years, seed=0):
+    """companies / stock_prices / financial_statements laid out like schema.sql, with its unique keys."""
+    prices = synthetic_prices(n_tickers, years, seed=seed)
+    prices[PRICE_COLUMNS] = prices[PRICE_COLUMNS].round(PRICE_SCALE)
+    tickers = prices['ticker'].unique()
+    raw = synthetic_financials(n_tickers, 20, 0, seed=seed)
+    raw['Ticker'] = raw['Ticker'].map(dict(zip(raw['Ticker'].unique(), tickers)))
+    financials = map_financials(raw)[FINANCIAL_COLUMNS]
+    companies = pd.DataFrame({
+        'ticker': tickers,
+        'name': [f'Company {t}' for t in tickers],
+        'sector': [SECTORS[i % len(SECTORS)] for i in range(len(tickers))],
+        'industry': [f'Industry {i % 12}' for i in range(len(tickers))],
+    })
+    with engine.begin() as conn:
+        companies.to_sql('companies', conn, index=False)
+        prices.to_sql('stock_prices', conn, index=False, chunksize=50000)
+        financials.to_sql('financial_statements', conn, index=False, chunksize=50000)
+        conn.execute(text("CREATE UNIQUE INDEX unique_stock ON stock_prices (ticker, date)"))
+        conn.execute(text("CREATE UNIQUE INDEX unique_financial ON financial_statements (ticker, report_date, period)"))
+        conn.execute(text("CREATE UNIQUE INDEX pk_companies ON companies (ticker)"))
+    return prices, financials
+
+
+def daily_change(engine, prices, financials):
+    """Appends a bar per ticker, restates one older bar and adds FY statements; returns the loaded deltas."""
+    last = prices.groupby('ticker', sort=False).tail(1).copy()
+    last['date'] = (pd.to_datetime(last['date']) + pd.offsets.BDay(1)).dt.date
+    last[PRICE_COLUMNS] = (last[PRICE_COLUMNS] * 1.01).round(PRICE_SCALE)
+    restated = prices[prices['ticker'] == last['ticker'].iloc[0]].iloc[-10:-9].copy()
+    restated[PRICE_COLUMNS] = (restated[PRICE_COLUMNS] * 0.98).round(PRICE_SCALE)
+    statements = financials[financials['period'] == 'FY'].groupby('ticker', sort=False).tail(1).head(2).copy()
+    statements['report_date'] = pd.Timestamp('2026-12-31').date()
+    statements['revenue'] = statements['revenue'] * 1.1
+    cols = ', '.join(PRICE_COLUMNS)
+    with engine.begin() as conn:
+        conn.execute(text(f"UPDATE stock_prices SET ({cols}) = ({', '.join(':' + c for c in PRICE_COLUMNS)}) "
+                          f"WHERE ticker = :ticker AND date = :date"),
+                     [dict(r, date=r['date'].isoformat()) for r in restated.to_dict(orient='records')])
+        last.to_sql('stock_prices', conn, index=False, if_exists='append')
+        statements.to_sql('financial_statements', conn, index=False, if_exists='append')
+    return pd.concat([restated, last]), statements
+
+
+def snapshot(engine):
+    # SQLite averages REAL with a running sum, so where the window input
+    # starts moves ma_30 by ~1e-13 (NUMERIC / DECIMAL sums are exact):
+    # compare at the DECIMAL(19, 8) scale of the MySQL column
+    with engine.connect() as conn:
+        return {
+            table: pd.read_sql(text(f"SELECT * FROM {table} ORDER BY {order}"), conn).round(8)
+            for table, order in (('latest_financials', 'ticker, basis'), ('price_metrics', 'ticker, date'))
+        }
+
+
+def time_query(engine, sql, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with engine.connect() as conn:
+            rows = conn.execute(text(sql)).fetchall()
+        timings.append(time.perf_counter() - started)
+    return [tuple(round(v, 6) if isinstance(v, float) else v for v in row) for row in rows], statistics.median(timings)
+
+
+def compare_queries(engine, ticker, repeat):
+    header = f"{'view':<24} {'before ms':>10} {'after ms':>10} {'speedup':>8} {'rows':>6}"
+    print(header)
+    print('-' * len(header))
+    ok = True
+    for label, legacy, materialized in QUERIES:
+        before, t_before = time_query(engine, legacy.format(ticker=ticker), repeat)
+        after, t_after = time_query(engine, materialized.format(ticker=ticker), repeat)
+        same = before == after
+        ok = ok and same
+        print(f"{label:<24} {t_before * 1000:>10.2f} {t_after * 1000:>10.2f} "
+              f"{t_before / t_after:>7.1f}x {len(after):>6}{'' if same else '  MISMATCH'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="View query timings before/after the materialized tables.")
+    parser.add_argument('--target', choices=['mysql', 'supabase'],
+                        help="Time a loaded database instead of a synthetic SQLite one")
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--years', type=int, default=7)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--ticker', default='AAPL', help="Ticker of view 8 with --target")
+    args = parser.parse_args()
+
+    if args.target:
+        from loader import get_dialect
+        engine = get_dialect(args.target).engine()
+        ok = compare_queries(engine, args.ticker, args.repeat)
+        engine.dispose()
+        if not ok:
+            print("\nFAILED: materialized results differ from the view queries")
+            sys.exit(1)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'views.db')}")
+        prices, financials = build_synthetic(engine, args.tickers, args.years)
+        print(f"Synthetic SQLite: {len(prices)} bars, {len(financials)} statements, {args.tickers} tickers\n")
+
+        scope = materialize.RefreshScope('bench', path=os.path.join(tmp, 'scope.json'))
+        started = time.perf_counter()
+        materialize.refresh('supabase', engine, scope, full=True)
+        t_full = time.perf_counter() - started
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))  # planner statistics, as autovacuum keeps them in PostgreSQL
+        print()
+        ok = compare_queries(engine, prices['ticker'].iloc[0], args.repeat)
+
+        bars, statements = daily_change(engine, prices, financials)
+        scope.add('stock_prices', bars)
+        scope.add('financial_statements', statements)
+        print("\nDaily change: 1 new bar per ticker, 1 restated bar, 2 new FY statements")
+        started = time.perf_counter()
+        materialize.refresh('supabase', engine, scope)
+        t_inc = time.perf_counter() - started
+        incremental = snapshot(engine)
+        materialize.refresh('supabase', engine, scope, full=True)
+        rebuilt = snapshot(engine)
+        print(f"\nRefresh: full {t_full * 1000:.1f} ms, incremental {t_inc * 1000:.1f} ms "
+              f"({t_full / t_inc:.1f}x faster)")
+        ok = ok and compare_queries(engine, prices['ticker'].iloc[0], 1)
+        engine.dispose()
+
+    for table in incremental:
+        if not incremental[table].equals(rebuilt[table]):
+            print(f"FAILED: incremental {table} differs from a full rebuild")
+            ok = False
+    if not ok:
+        print("\nFAILED: materialized results differ from the view queries")
+        sys.exit(1)
+    print("OK: materialized results match the view queries; incremental refresh equals a full rebuild.")
+
+
+if __name__ == "__main__":
+    main()
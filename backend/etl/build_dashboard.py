@@ -0,0 +1,296 @@
+# backend/etl/build_dashboard.py
+# Author: Hoang Son Lai
+#
+# Precomputes what the static dashboards render, so the browser no longer
+# downloads and parses the full cleaned CSVs before the first chart.
+# Runs in Phase 1 right after clean_data.main.
+#
+# Output (data/dashboard/v<DASHBOARD_SCHEMA_VERSION>/):
+#   manifest.json             -> {schema_version, generated_at, data_as_of,
+#                                 artifacts: {name: {path, version, bytes, raw_bytes}}}
+#   companies.json.gz         -> company list (ticker selector, names, sectors)
+#   global.json.gz            -> global_dashboard.html: per fiscal-year selection
+#                                ("latest", 2025, ...) the company rows, Row 1
+#                                rankings per metric, sector sums and heatmap
+#                                ranges, plus the 12-month market trends (Row 4)
+#   company/<TICKER>.json.gz  -> company_dashboard.html: financial rows (FY + Q)
+#                                and the price series with chart overlays
+#                                (MA20/50/200, EMA12/26, Bollinger Bands)
+#
+# Artifacts are compact JSON, gzipped with a fixed mtime so identical content
+# gives identical bytes (no git churn on days nothing changed). `version` is
+# a hash of the JSON; the dashboards append it as ?v= so browsers never mix
+# stale and fresh files. A breaking layout change bumps the schema version
+# (new directory) instead of changing v1 in place.
+#
+# Price series: daily bars for the last DASHBOARD_DAILY_DAYS, and the history
+# before that reduced to DASHBOARD_HISTORY_POINTS bars with LTTB
+# (downsample.py), so the payload no longer grows with the history length.
+# Overlays are computed on the daily bars first; LTTB keeps whole bars, so
+# they stay exact at every kept point.
+
+import os
+import gzip
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+from config import (
+    DATA_DASHBOARD_DIR, DASHBOARD_SCHEMA_VERSION, DASHBOARD_DAILY_DAYS, DASHBOARD_HISTORY_POINTS,
+    DASHBOARD_TOP_N,
+)
+from storage import read_table
+from indicators import compute_overlays
+from downsample import lttb
+from generate_insights import ROW1_METRICS, ROW2_SECTOR_METRICS
+
+# Heatmap columns in global_dashboard.html (Row 3)
+HEATMAP_RATIOS = ['gross_margin', 'net_margin', 'roe', 'roa', 'current_ratio', 'debt_to_equity']
+GLOBAL_FIELDS = list(dict.fromkeys(ROW1_METRICS + ROW2_SECTOR_METRICS + HEATMAP_RATIOS))
+
+OVERLAYS = ['ma20', 'ma50', 'ma200', 'ema12', 'ema26', 'bb_upper', 'bb_lower']
+PRICE_DECIMALS = 4  # DECIMAL(15, 4) in schema.sql
+TREND_MONTHS = 12
+
+
+def output_dir():
+    return os.path.join(DATA_DASHBOARD_DIR, f'v{DASHBOARD_SCHEMA_VERSION}')
+
+
+# ----------------------------------------------------------------------
+# JSON helpers
+# ----------------------------------------------------------------------
+def _json_default(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return None if np.isnan(value) else float(value)
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def _column(series):
+    """Series -> JSON list (NaN -> null, dates -> YYYY-MM-DD)."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime('%Y-%m-%d').tolist()
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def _records(df):
+    return [dict(zip(df.columns, row)) for row in zip(*(_column(df[c]) for c in df.columns))]
+
+
+def write_artifact(name, payload):
+    """Writes <name>.json.gz (only if its bytes changed) and returns its manifest entry."""
+    body = json.dumps(payload, separators=(',', ':'), allow_nan=False, default=_json_default).encode('utf-8')
+    data = gzip.compress(body, compresslevel=9, mtime=0)
+    rel_path = f'{name}.json.gz'
+    path = os.path.join(output_dir(), rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    unchanged = False
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            unchanged = f.read() == data
+    if not unchanged:
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return {
+        'path': rel_path,
+        'version': hashlib.sha256(body).hexdigest()[:12],
+        'bytes': len(data),
+        'raw_bytes': len(body),
+    }
+
+
+# ----------------------------------------------------------------------
+# Global dashboard
+# ----------------------------------------------------------------------
+def fy_history(companies, financials):
+    """FY rows with non-zero revenue, newest first per ticker, with name/sector (processData)."""
+    fy = financials[
+        (financials['period'] == 'FY') & financials['revenue'].notna() & (financials['revenue'] != 0)
+    ].copy()
+    info = companies.set_index('ticker')
+    fy['name'] = fy['ticker'].map(info['name']).fillna(fy['ticker'])
+    fy['sector'] = fy['ticker'].map(info['sector']).fillna('Unknown')
+    # Reports dated Jan/Feb belong to the previous fiscal year (the dashboard's assignedYear)
+    fy['fiscal_year'] = fy['report_date'].dt.year - (fy['report_date'].dt.month <= 2)
+    return fy.sort_values(['ticker', 'report_date'], ascending=[True, False], kind='mergesort')
+
+
+def year_selection(rows):
+    """Everything Rows 1-3 need for one fiscal-year selection (one row per ticker)."""
+    rows = rows.sort_values('revenue', ascending=False, kind='mergesort')
+
+    top = {}
+    for metric in ROW1_METRICS:
+        ranked = rows[rows[metric].notna() & (rows[metric] != 0)]
+        ranked = ranked.sort_values(metric, ascending=False, kind='mergesort')
+        if DASHBOARD_TOP_N:
+            ranked = ranked.head(DASHBOARD_TOP_N)
+        top[metric] = ranked['ticker'].tolist()
+
+    sectors = {}
+    for metric in ROW2_SECTOR_METRICS:
+        sums = rows[metric].fillna(0).groupby(rows['sector'], sort=False, observed=True).sum()
+        sums = sums.sort_values(ascending=False, kind='mergesort')
+        sectors[metric] = [[sector, float(value)] for sector, value in sums.items()]
+
+    heatmap = {}
+    for ratio in HEATMAP_RATIOS:
+        values = rows[ratio].dropna()
+        heatmap[ratio] = [float(values.min()), float(values.max())] if not values.empty else None
+
+    return {
+        'rows': _records(rows[['ticker', 'name', 'sector', 'report_date'] + GLOBAL_FIELDS]),
+        'top': top,
+        'sectors': sectors,
+        'heatmap': heatmap,
+        'avg_revenue': float(rows['revenue'].fillna(0).mean()) if not rows.empty else 0.0,
+    }
+
+
+def market_trends(prices, tickers):
+    """Row 4: cumulative % return over the last 12 months for each ticker, best first."""
+    max_date = prices['date'].max()
+    start = max_date - pd.DateOffset(months=TREND_MONTHS)
+    window = prices[prices['date'] >= start]
+    series = []
+    for ticker in tickers:
+        t = window[window['ticker'] == ticker]
+        if t.empty:
+            continue
+        first = t['close'].iloc[0]
+        pct = (t['close'] - first) / first * 100
+        series.append({
+            'ticker': ticker,
+            'return': float((t['close'].iloc[-1] - first) / first),
+            'date': _column(t['date']),
+            'pct': _column(pct.round(2)),
+        })
+    series.sort(key=lambda s: s['return'], reverse=True)
+    return {'start': start.strftime('%Y-%m-%d'), 'end': max_date.strftime('%Y-%m-%d'), 'series': series}
+
+
+def build_global(companies, financials, prices):
+    history = fy_history(companies, financials)
+    latest = history.drop_duplicates('ticker')
+
+    years = {'latest': year_selection(latest)}
+    for year in sorted(history['fiscal_year'].unique(), reverse=True):
+        in_year = history[history['fiscal_year'] == year].drop_duplicates('ticker')
+        years[str(int(year))] = year_selection(in_year)
+
+    # Row 4 always follows the latest revenue leaders, whatever year is selected
+    leaders = latest.sort_values('revenue', ascending=False, kind='mergesort')['ticker'].tolist()
+    return {
+        'sectors': sorted(companies['sector'].dropna().unique().tolist()),
+        'last_price_date': prices['date'].max().strftime('%Y-%m-%d') if not prices.empty else None,
+        'years': years,
+        'trends': market_trends(prices, leaders) if not prices.empty else None,
+    }
+
+
+# ----------------------------------------------------------------------
+# Company dashboard
+# ----------------------------------------------------------------------
+def price_series(prices):
+    """Daily bars with overlays and day-over-day change; history before the daily window LTTB-reduced."""
+    df = compute_overlays(prices)
+    df['change_pct'] = df.groupby('ticker', sort=False, observed=True)['close'].pct_change(fill_method=None) * 100
+
+    last_date = df.groupby('ticker', sort=False, observed=True)['date'].transform('max')
+    is_old = df['date'] < last_date - pd.Timedelta(days=DASHBOARD_DAILY_DAYS)
+    history = lttb(df[is_old], DASHBOARD_HISTORY_POINTS)
+    out = pd.concat([history, df[~is_old]], ignore_index=True)
+    return out.sort_values(['ticker', 'date'], kind='mergesort').reset_index(drop=True)
+
+
+def build_company(ticker, financials, series):
+    fin = financials[
+        (financials['ticker'] == ticker) & financials['revenue'].notna() & (financials['revenue'] != 0)
+    ].sort_values(['report_date', 'period'], kind='mergesort')
+    bars = series[series['ticker'] == ticker]
+    columns = ['open', 'high', 'low', 'close', 'change_pct'] + OVERLAYS
+    prices = {'date': _column(bars['date'])}
+    prices.update({c: _column(bars[c].round(PRICE_DECIMALS)) for c in columns})
+    prices['volume'] = _column(bars['volume'].astype('Int64'))
+    return {'ticker': ticker, 'financials': _records(fin), 'prices': prices}
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+def load_data():
+    companies = read_table('companies')
+    financials = read_table('financial_statements')
+    prices = read_table('stock_prices', columns=['ticker', 'date', 'open', 'high', 'low', 'close', 'volume'])
+    prices = prices.dropna(subset=['close']).sort_values(['ticker', 'date'], kind='mergesort')
+    return companies, financials, prices
+
+
+def write_manifest(artifacts, data_as_of):
+    """Rewrites manifest.json only when an artifact changed, so generated_at marks the last change."""
+    path = os.path.join(output_dir(), 'manifest.json')
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            try:
+                previous = json.load(f)
+            except ValueError:
+                previous = {}
+        if previous.get('artifacts') == artifacts and previous.get('data_as_of') == data_as_of:
+            return False
+    manifest = {
+        'schema_version': DASHBOARD_SCHEMA_VERSION,
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'data_as_of': data_as_of,
+        'artifacts': artifacts,
+    }
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+    return True
+
+
+def prune(artifacts):
+    """Removes company files for tickers that are no longer tracked."""
+    company_dir = os.path.join(output_dir(), 'company')
+    if not os.path.isdir(company_dir):
+        return
+    keep = {os.path.basename(a['path']) for a in artifacts.values()}
+    for fname in os.listdir(company_dir):
+        if fname.endswith('.json.gz') and fname not in keep:
+            os.remove(os.path.join(company_dir, fname))
+            print(f"  Removed stale artifact company/{fname}")
+
+
+def main():
+    print("--- Building dashboard artifacts ---")
+    companies, financials, prices = load_data()
+
+    artifacts = {
+        'companies': write_artifact('companies', _records(companies)),
+        'global': write_artifact('global', build_global(companies, financials, prices)),
+    }
+    series = price_series(prices) if not prices.empty else prices
+    for ticker in sorted(companies['ticker']):
+        artifacts[f'company/{ticker}'] = write_artifact(
+            f'company/{ticker}', build_company(ticker, financials, series)
+        )
+    prune({k: v for k, v in artifacts.items() if k.startswith('company/')})
+
+    data_as_of = prices['date'].max().strftime('%Y-%m-%d') if not prices.empty else None
+    changed = write_manifest(artifacts, data_as_of)
+
+    total = sum(a['bytes'] for a in artifacts.values())
+    raw = sum(a['raw_bytes'] for a in artifacts.values())
+    print(f"  {len(artifacts)} artifacts in {output_dir()}: {total / 1024:.0f} KB gzipped "
+          f"({raw / 1024:.0f} KB JSON){'' if changed else ', unchanged'}")
+    print("--- Dashboard artifacts complete ---")
+
+
+if __name__ == "__main__":
+    main()
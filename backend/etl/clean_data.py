@@ -5,6 +5,20 @@ import pandas as pd
 import numpy as np
 import os
 from config import DATA_RAW_DIR, DATA_CLEANED_DIR
+import clean_state
+import instrument
+import price_state
+import schema
+import storage
+
+def parse_dates(values):
+    """
+    UTC calendar dates (datetime.date, None if missing) of date strings.
+    Tickers share their dates, so each distinct string is parsed once and
+    rows point to one shared date object.
+    """
+    codes, uniques = pd.factorize(values)
+    return np.append(pd.to_datetime(uniques, utc=True).date, None)[codes]  # code -1 -> None
 
 def clean_companies():
     """Clean company info data."""
@@ -14,21 +28,31 @@ def clean_companies():
         return
 
     df = pd.read_csv(path)
+    instrument.count('rows_read.raw_companies', len(df))
     df = df.drop_duplicates(subset=['ticker'])
     df.fillna({'website': '', 'description': ''}, inplace=True)
     
     output_path = os.path.join(DATA_CLEANED_DIR, 'companies.csv')
-    df.to_csv(output_path, index=False)
+    storage.save_table('companies', df)
     print(f"Saved: {output_path}")
 
-def clean_prices():
-    """Clean stock price data."""
+def clean_prices(full=False):
+    """Clean stock price data.
+
+    If raw_prices.csv came from an incremental fetch, the new bars are merged
+    into the existing stock_prices.csv instead of rewriting it (pass
+    full=True to force a rewrite from a fully fetched raw file). An
+    incremental raw file that cannot be merged raises instead of replacing
+    the table with the overlap bars only.
+    """
     path = os.path.join(DATA_RAW_DIR, 'raw_prices.csv')
     if not os.path.exists(path):
         print(f"Skipping prices: {path} not found.")
         return
 
-    df = pd.read_csv(path)
+    # Ticker is parsed straight into a categorical (schema.py)
+    df = pd.read_csv(path, dtype=schema.csv_dtypes('raw_prices'))
+    instrument.count('rows_read.raw_prices', len(df))
     
     # Standardize columns
     cols_map = {
@@ -42,18 +66,220 @@ def clean_prices():
         df['adj_close'] = df['close']
         
     # --- Xử lý múi giờ chuẩn ---
-    df['date'] = pd.to_datetime(df['date'], utc=True).dt.date
+    df['date'] = parse_dates(df['date'])
     
     # Select only needed columns
     final_cols = ['ticker', 'date', 'open', 'high', 'low', 'close', 'adj_close', 'volume']
     df = df[final_cols].dropna(subset=['ticker', 'date'])
     
     output_path = os.path.join(DATA_CLEANED_DIR, 'stock_prices.csv')
-    df.to_csv(output_path, index=False)
-    print(f"Saved: {output_path}")
+    state = price_state.load_state()
+    raw_incremental = price_state.read_raw_meta().get('mode') == 'incremental'
+    can_merge = bool(state) and os.path.exists(output_path)
+
+    if raw_incremental and (full or not can_merge):
+        # raw_prices.csv only holds the bars since the last run: saving it as
+        # the whole table (and its state) would silently drop the history
+        reason = "a full rewrite was requested" if can_merge else "stock_prices.csv or its state is missing"
+        raise RuntimeError(
+            f"raw_prices.csv comes from an incremental fetch and cannot be merged ({reason}); "
+            f"run fetch_data.py --full first."
+        )
+
+    if raw_incremental:
+        merge_prices(df, state, output_path)
+    else:
+        storage.save_table('stock_prices', df)
+        price_state.save_state(price_state.build_state(df))
+        print(f"Saved: {output_path}")
+
+def merge_prices(df, state, output_path):
+    """Append new bars to stock_prices.csv; rewrite (streamed) only if the provider restated old bars."""
+    df = df.copy()
+    df['date'] = df['date'].astype(str)
+
+    fresh_parts = []
+    restated_parts = []
+    for ticker, grp in df.groupby('ticker', sort=False, observed=True):
+        info = state.get(ticker)
+        if info is None:
+            fresh_parts.append(grp)
+            continue
+
+        fresh_parts.append(grp[grp['date'] > info['last_date']])
+
+        # So sánh các phiên trong cửa sổ overlap với bản đã lưu
+        stored = {row[0]: row[1:] for row in info['tail']}
+        overlap = grp[grp['date'] <= info['last_date']]
+        changed = [
+            rec['date'] in stored and price_state.bar_values(rec) != stored[rec['date']]
+            for rec in overlap.to_dict(orient='records')
+        ]
+        if any(changed):
+            restated_parts.append(overlap[changed])
+
+    fresh = pd.concat(fresh_parts) if fresh_parts else df.iloc[0:0]
+    restated = pd.concat(restated_parts) if restated_parts else df.iloc[0:0]
+
+    if not restated.empty:
+        # Ghi lại file theo từng chunk (không nạp toàn bộ vào RAM), bỏ các dòng bị điều chỉnh
+        restated_keys = set(restated['ticker'].astype(str) + '|' + restated['date'])
+        tmp_path = output_path + '.tmp'
+        first = True
+        for chunk in pd.read_csv(output_path, chunksize=200_000, dtype=str, keep_default_na=False):
+            keys = chunk['ticker'] + '|' + chunk['date']
+            chunk[~keys.isin(restated_keys)].to_csv(
+                tmp_path, mode='w' if first else 'a', header=first, index=False
+            )
+            first = False
+        restated.to_csv(tmp_path, mode='a', header=False, index=False)
+        os.replace(tmp_path, output_path)
+
+    if not fresh.empty:
+        fresh.to_csv(output_path, mode='a', header=False, index=False)
+
+    changed = pd.concat([restated, fresh])
+    storage.upsert_table('stock_prices', changed, keys=['date'])
+    price_state.save_state(price_state.build_state(changed, previous=state))
+    print(
+        f"Merged into {output_path}: {len(fresh)} new bars, "
+        f"{len(restated)} restated bars, {len(df) - len(fresh) - len(restated)} unchanged"
+    )
+
+# --- Financial statements: field & ratio registries ---
+# Schema column <- yfinance labels in order of preference: the first label
+# present in the raw files is used (yfinance renamed several of them over
+# time, e.g. opex and receivables). A field with none of its labels is 0.
+# Every field is float64 in the ratio block; the exported columns keep the
+# dtype read from the raw files.
+FINANCIAL_FIELDS = [
+    ('revenue', ('Total Revenue',)),
+    ('cogs', ('Cost Of Revenue',)),
+    ('gross_profit', ('Gross Profit',)),
+    ('opex', ('Operating Expense', 'Total Operating Expenses')),
+    ('accounts_receivable', ('Accounts Receivable', 'Net Receivables', 'Receivables')),
+    ('operating_income_ebit', ('Operating Income',)),
+    ('ebt', ('Pretax Income',)),
+    ('net_income', ('Net Income',)),
+    ('ebitda', ('EBITDA',)),
+    ('basic_eps', ('Basic EPS',)),
+    ('diluted_eps', ('Diluted EPS',)),
+    ('total_assets', ('Total Assets',)),
+    ('current_assets', ('Current Assets',)),
+    ('cash_and_equivalents', ('Cash And Cash Equivalents',)),
+    ('inventory', ('Inventory',)),
+    ('total_liabilities', ('Total Liabilities Net Minority Interest',)),
+    ('current_liabilities', ('Current Liabilities',)),
+    ('accounts_payable', ('Accounts Payable',)),
+    ('short_term_debt', ('Current Debt',)),
+    ('long_term_debt', ('Long Term Debt',)),
+    ('total_equity', ('Stockholders Equity',)),
+    ('common_stock', ('Common Stock',)),
+    ('retained_earnings', ('Retained Earnings',)),
+    ('interest_expense', ('Interest Expense',)),  # chỉ dùng cho interest_coverage_ratio
+]
+
+# Derived fields: (column, terms); the first term minus the others
+DERIVED_FIELDS = [
+    ('non_current_assets', ('total_assets', 'current_assets')),
+]
+
+# Ratios: (column, numerator terms, denominator). A zero, NaN or infinite
+# denominator gives NaN, and so does any result that is not finite, so the
+# cleaned file never contains inf.
+FINANCIAL_RATIOS = [
+    # Liquidity
+    ('current_ratio', ('current_assets',), 'current_liabilities'),
+    ('quick_ratio', ('current_assets', 'inventory'), 'current_liabilities'),
+    ('cash_ratio', ('cash_and_equivalents',), 'current_liabilities'),
+    # Solvency
+    ('debt_to_equity', ('total_liabilities',), 'total_equity'),
+    ('debt_ratio', ('total_liabilities',), 'total_assets'),
+    ('interest_coverage_ratio', ('operating_income_ebit',), 'interest_expense'),
+    # Profitability
+    ('roa', ('net_income',), 'total_assets'),
+    ('roe', ('net_income',), 'total_equity'),
+    ('gross_margin', ('gross_profit',), 'revenue'),
+    ('net_margin', ('net_income',), 'revenue'),
+    # Efficiency
+    ('asset_turnover', ('revenue',), 'total_assets'),
+    ('inventory_turnover', ('cogs',), 'inventory'),
+    ('receivables_turnover', ('revenue',), 'accounts_receivable'),
+]
+
+FINANCIAL_COLUMNS = [
+    'ticker', 'report_date', 'period',
+    'revenue', 'cogs', 'gross_profit', 'opex', 'operating_income_ebit',
+    'ebt', 'net_income', 'ebitda', 'basic_eps', 'diluted_eps',
+    'total_assets', 'current_assets', 'cash_and_equivalents', 'accounts_receivable',
+    'inventory', 'non_current_assets', 'total_liabilities', 'current_liabilities',
+    'accounts_payable', 'short_term_debt', 'long_term_debt', 'total_equity',
+    'common_stock', 'retained_earnings',
+    'current_ratio', 'quick_ratio', 'cash_ratio', 'debt_to_equity',
+    'debt_ratio', 'interest_coverage_ratio', 'roa', 'roe',
+    'gross_margin', 'net_margin', 'asset_turnover', 'inventory_turnover', 'receivables_turnover'
+]
+
+
+def _terms(block, rows, terms):
+    values = block[rows[terms[0]]]
+    for term in terms[1:]:
+        values = values - block[rows[term]]
+    return values
+
+
+def map_financials(raw):
+    """Maps raw yfinance statements (annual + quarterly rows) to the financial_statements schema."""
+    n = len(raw)
+    columns = {}
+    names = [name for name, _ in FINANCIAL_FIELDS] + [name for name, _ in DERIVED_FIELDS]
+    rows = {name: i for i, name in enumerate(names)}
+    # Một khối float64 liên tục: mỗi field là một hàng
+    block = np.zeros((len(names), n))
+    for name, aliases in FINANCIAL_FIELDS:
+        source = next((label for label in aliases if label in raw.columns), None)
+        if source is None:
+            columns[name] = 0
+        else:
+            columns[name] = raw[source]
+            block[rows[name]] = raw[source].to_numpy(dtype=np.float64, na_value=np.nan)
+    for name, terms in DERIVED_FIELDS:
+        block[rows[name]] = _terms(block, rows, terms)
+        columns[name] = block[rows[name]]
+
+    # Ratios in one pass: each denominator's validity mask is computed once
+    ratios = np.full((len(FINANCIAL_RATIOS), n), np.nan)
+    masks = {}
+    with np.errstate(all='ignore'):
+        for i, (name, numerator, denominator) in enumerate(FINANCIAL_RATIOS):
+            den = block[rows[denominator]]
+            if denominator not in masks:
+                masks[denominator] = np.isfinite(den) & (den != 0)
+            np.divide(_terms(block, rows, numerator), den, out=ratios[i], where=masks[denominator])
+    ratios[~np.isfinite(ratios)] = np.nan
+    for i, (name, _, _) in enumerate(FINANCIAL_RATIOS):
+        columns[name] = ratios[i]
+
+    if 'Ticker' in raw.columns:
+        columns['ticker'] = raw['Ticker']
+    columns['report_date'] = parse_dates(raw['Date'])
+    # Đọc biến phân loại kỳ báo cáo (Năm hay Quý)
+    columns['period'] = raw['Report_Period'] if 'Report_Period' in raw.columns else 'FY'
 
-def clean_financials():
-    """Clean financials (Annual & Quarterly) and calculate metrics."""
+    df = pd.DataFrame(
+        {col: columns[col] for col in FINANCIAL_COLUMNS if col in columns}, index=raw.index
+    )
+    # Bỏ các dòng rỗng (nếu quá trình merge tạo ra dòng lỗi)
+    return df.dropna(subset=[c for c in ('ticker', 'report_date') if c in df.columns])
+
+
+def clean_financials(full=False):
+    """Clean financials (Annual & Quarterly) and calculate metrics.
+
+    Only the tickers whose raw statements changed since the last run are
+    re-cleaned and spliced into financial_statements.csv (clean_state.py);
+    full=True rebuilds every ticker. Both give byte-identical files.
+    """
     path_ann = os.path.join(DATA_RAW_DIR, 'raw_financials.csv')
     path_qtr = os.path.join(DATA_RAW_DIR, 'raw_financials_quarterly.csv')
     
@@ -69,112 +295,17 @@ def clean_financials():
 
     # Gộp chung dữ liệu Năm và Quý để xử lý 1 lần
     df = pd.concat(dfs, ignore_index=True)
-    
-    # Helper to safe get column
-    def get_col(col_name):
-        return df[col_name] if col_name in df.columns else 0
-
-    # 1. Mapping yfinance keys to Schema
-    df['revenue'] = get_col('Total Revenue')
-    df['cogs'] = get_col('Cost Of Revenue')
-    df['gross_profit'] = get_col('Gross Profit')
-    
-    # SỬA LỖI YFINANCE MỚI NHẤT (OPEX VÀ RECEIVABLES)
-    df['opex'] = get_col('Operating Expense') if 'Operating Expense' in df.columns else get_col('Total Operating Expenses')
-    
-    if 'Accounts Receivable' in df.columns:
-        df['accounts_receivable'] = get_col('Accounts Receivable')
-    elif 'Net Receivables' in df.columns:
-        df['accounts_receivable'] = get_col('Net Receivables')
-    elif 'Receivables' in df.columns:
-        df['accounts_receivable'] = get_col('Receivables')
-    else:
-        df['accounts_receivable'] = 0
-        
-    df['operating_income_ebit'] = get_col('Operating Income')
-    df['ebt'] = get_col('Pretax Income')
-    df['net_income'] = get_col('Net Income')
-    df['ebitda'] = get_col('EBITDA')
-    df['basic_eps'] = get_col('Basic EPS')
-    df['diluted_eps'] = get_col('Diluted EPS')
-    
-    df['total_assets'] = get_col('Total Assets')
-    df['current_assets'] = get_col('Current Assets')
-    df['cash_and_equivalents'] = get_col('Cash And Cash Equivalents')
-    df['inventory'] = get_col('Inventory')
-    df['non_current_assets'] = df['total_assets'] - df['current_assets']
-    
-    df['total_liabilities'] = get_col('Total Liabilities Net Minority Interest')
-    df['current_liabilities'] = get_col('Current Liabilities')
-    df['accounts_payable'] = get_col('Accounts Payable')
-    df['short_term_debt'] = get_col('Current Debt')
-    df['long_term_debt'] = get_col('Long Term Debt')
-    
-    df['total_equity'] = get_col('Stockholders Equity')
-    df['common_stock'] = get_col('Common Stock')
-    df['retained_earnings'] = get_col('Retained Earnings')
-
-    interest_expense = get_col('Interest Expense')
-    
-    # 2. Calculating Ratios
-    # Replace 0 with NaN to avoid division by zero errors
-    df['current_ratio'] = df['current_assets'] / df['current_liabilities'].replace(0, np.nan)
-    df['quick_ratio'] = (df['current_assets'] - df['inventory']) / df['current_liabilities'].replace(0, np.nan)
-    df['cash_ratio'] = df['cash_and_equivalents'] / df['current_liabilities'].replace(0, np.nan)
-    
-    df['debt_to_equity'] = df['total_liabilities'] / df['total_equity'].replace(0, np.nan)
-    df['debt_ratio'] = df['total_liabilities'] / df['total_assets'].replace(0, np.nan)
-    df['interest_coverage_ratio'] = df['operating_income_ebit'] / interest_expense.replace(0, np.nan)
-    
-    df['roa'] = df['net_income'] / df['total_assets'].replace(0, np.nan)
-    df['roe'] = df['net_income'] / df['total_equity'].replace(0, np.nan)
-    df['gross_margin'] = df['gross_profit'] / df['revenue'].replace(0, np.nan)
-    df['net_margin'] = df['net_income'] / df['revenue'].replace(0, np.nan)
-    
-    df['asset_turnover'] = df['revenue'] / df['total_assets'].replace(0, np.nan)
-    df['inventory_turnover'] = df['cogs'] / df['inventory'].replace(0, np.nan)
-    df['receivables_turnover'] = df['revenue'] / df['accounts_receivable'].replace(0, np.nan)
-
-    # 3. Formatting
-    df['report_date'] = pd.to_datetime(df['Date'], utc=True).dt.date
-    
-    # Đọc biến phân loại kỳ báo cáo (Năm hay Quý)
-    if 'Report_Period' in df.columns:
-        df['period'] = df['Report_Period']
-    else:
-        df['period'] = 'FY'
-        
-    df.rename(columns={'Ticker': 'ticker'}, inplace=True)
-    
-    schema_cols = [
-        'ticker', 'report_date', 'period',
-        'revenue', 'cogs', 'gross_profit', 'opex', 'operating_income_ebit',
-        'ebt', 'net_income', 'ebitda', 'basic_eps', 'diluted_eps',
-        'total_assets', 'current_assets', 'cash_and_equivalents', 'accounts_receivable',
-        'inventory', 'non_current_assets', 'total_liabilities', 'current_liabilities',
-        'accounts_payable', 'short_term_debt', 'long_term_debt', 'total_equity',
-        'common_stock', 'retained_earnings',
-        'current_ratio', 'quick_ratio', 'cash_ratio', 'debt_to_equity',
-        'debt_ratio', 'interest_coverage_ratio', 'roa', 'roe',
-        'gross_margin', 'net_margin', 'asset_turnover', 'inventory_turnover', 'receivables_turnover'
-    ]
-    
-    # Filter columns that actually exist
-    existing_cols = [col for col in schema_cols if col in df.columns]
-    df_final = df[existing_cols].copy()
-    
-    # Bỏ các dòng rỗng (nếu quá trình merge tạo ra dòng lỗi)
-    df_final.dropna(subset=['ticker', 'report_date'], inplace=True)
+    instrument.count('rows_read.raw_financials', len(df))
+    clean_state.splice('financial_statements', df, 'Ticker', map_financials, full=full)
     
     output_path = os.path.join(DATA_CLEANED_DIR, 'financial_statements.csv')
-    df_final.to_csv(output_path, index=False)
     print(f"Saved: {output_path}")
 
-def main():
+def main(full=False):
     print("--- Starting Data Cleaning Process ---")
     clean_companies()
-    clean_prices()
-    clean_financials()
+    clean_prices(full=full)
+    clean_financials(full=full)
     print("--- Cleaning Complete ---")
 
 if __name__ == "__main__":
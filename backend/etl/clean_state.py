@@ -0,0 +1,194 @@
+# backend/etl/clean_state.py
+# Author: Hoang Son Lai
+#
+# Incremental cleaning driven by per-ticker fingerprints of the raw inputs.
+#
+# data/cleaned/<table>_fingerprints.json describes the cleaned CSV last written:
+#   {"context": hash of the raw columns/dtypes + the cleaning code,
+#    "output": sha256 of the cleaned CSV,
+#    "tickers": {ticker: fingerprint},
+#    "layout": [[ticker, lines], ...]}
+# A ticker's fingerprint hashes its raw rows (pandas row hashes, in order)
+# and the length of every run of consecutive rows it has in the raw frame
+# (e.g. one run in the annual file, one in the quarterly file). "layout"
+# lists those runs in raw order with the number of CSV lines each produced.
+#
+# splice() re-cleans only the tickers whose fingerprint changed and copies
+# the CSV lines of all other tickers from the existing file, run by run, in
+# raw order. The cleaning function must be row-local (each output row
+# depends on its raw row and the raw columns only), and the whole raw frame
+# is parsed before the changed tickers are taken out of it, so every
+# column has the dtype of a full rebuild: the spliced file is byte-identical
+# to a full rebuild. When that cannot be vouched for (other raw columns,
+# other cleaning code, a cleaned file changed since it was written) the
+# table is rebuilt in full.
+
+import hashlib
+import io
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+from config import DATA_CLEANED_DIR
+import instrument
+import storage
+from run_state import file_hash
+
+
+def state_path(name):
+    return os.path.join(DATA_CLEANED_DIR, f'{name}_fingerprints.json')
+
+
+def _read_state(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"  Ignoring unreadable fingerprints {path}: {e}")
+        return None
+
+
+def _write_state(path, payload):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)
+
+
+def _runs(keys):
+    """Run number of every row: consecutive rows with the same key share a run."""
+    values = keys.to_numpy(dtype=object)
+    starts = np.ones(len(values), dtype=bool)
+    starts[1:] = values[1:] != values[:-1]
+    return np.cumsum(starts) - 1
+
+
+def context(raw, clean_fn):
+    """Hash of what every cleaned row depends on besides its own raw row."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(c), str(t)] for c, t in raw.dtypes.items()]).encode())
+    digest.update(pd.__version__.encode())
+    for module in (sys.modules[clean_fn.__module__], sys.modules[__name__]):
+        digest.update((file_hash(module.__file__) or '').encode())
+    return digest.hexdigest()[:16]
+
+
+def fingerprints(raw, key):
+    """{ticker: fingerprint of its raw rows and runs}; rows without a ticker are left out."""
+    row_hashes = pd.util.hash_pandas_object(raw, index=False).to_numpy()
+    runs = _runs(raw[key])
+    out = {}
+    for ticker, idx in raw.groupby(key, sort=False, observed=True).indices.items():
+        digest = hashlib.sha256(row_hashes[idx].tobytes())
+        digest.update(np.unique(runs[idx], return_counts=True)[1].tobytes())
+        out[ticker] = digest.hexdigest()[:16]
+    return out
+
+
+def _csv_lines(df):
+    buf = io.StringIO()
+    df.to_csv(buf, index=False)
+    lines = buf.getvalue().splitlines(keepends=True)
+    return lines[0], lines[1:]
+
+
+def _chunks(path, layout):
+    """Existing CSV lines per (ticker, occurrence of its run), following the stored layout."""
+    with open(path, encoding='utf-8', newline='') as f:
+        header = f.readline()
+        lines = f.readlines()
+    chunks, seen, pos = {}, {}, 0
+    for ticker, n in layout:
+        k = seen[ticker] = seen.get(ticker, -1) + 1
+        chunks[(ticker, k)] = lines[pos:pos + n]
+        pos += n
+    return header, chunks
+
+
+def splice(name, raw, key, clean_fn, full=False, path=None, fingerprint_path=None):
+    """
+    Cleans raw with clean_fn (row-local, keeps the raw index) into the CSV
+    export of `name`, re-cleaning only the tickers whose raw rows changed.
+    Returns {'mode', 'cleaned', 'reused', 'removed'} (ticker counts).
+    """
+    path = path or storage.CsvStore().path(name)
+    fingerprint_path = fingerprint_path or state_path(name)
+    prints = fingerprints(raw, key)
+    ctx = context(raw, clean_fn)
+    state = _read_state(fingerprint_path)
+
+    reason = None
+    if full:
+        reason = "full rebuild requested"
+    elif not state or not os.path.exists(path):
+        reason = "no previous fingerprints"
+    elif state.get('context') != ctx:
+        reason = "raw columns or cleaning code changed"
+    elif file_hash(path) != state.get('output'):
+        reason = "cleaned file changed since it was written"
+
+    keys = raw[key]
+    runs = _runs(keys)
+    run_keys = keys.to_numpy(dtype=object)[np.r_[0, np.flatnonzero(np.diff(runs)) + 1]] if len(raw) else []
+    run_keys = [k if k in prints else None for k in run_keys]  # None: rows without a ticker
+
+    if reason:
+        changed, removed = set(prints), set()
+        subset = raw
+    else:
+        changed = {t for t, fp in prints.items() if state['tickers'].get(t) != fp}
+        removed = set(state['tickers']) - set(prints)
+        if not changed and not removed and None not in run_keys:
+            print(f"{name}: raw rows unchanged for all {len(prints)} tickers, nothing to re-clean.")
+            instrument.count(f'clean.{name}.reused_tickers', len(prints))
+            return {'mode': 'unchanged', 'cleaned': 0, 'reused': len(prints), 'removed': 0}
+        # Rows without a ticker have no fingerprint: they always go through clean_fn
+        subset = raw[keys.isin(changed) | ~keys.isin(prints)]
+
+    cleaned = clean_fn(subset)
+    header, new_lines = _csv_lines(cleaned)
+    line_runs = pd.Series(runs, index=raw.index).loc[cleaned.index].to_numpy()
+    fresh = {}
+    for run, line in zip(line_runs, new_lines):
+        fresh.setdefault(run, []).append(line)
+
+    old = {}
+    if not reason:
+        old_header, old = _chunks(path, state['layout'])
+        if old_header != header:
+            print(f"{name}: CSV header differs from the stored file, rebuilding in full.")
+            return splice(name, raw, key, clean_fn, full=True, path=path, fingerprint_path=fingerprint_path)
+
+    out, layout, seen = [header], [], {}
+    for run, ticker in enumerate(run_keys):
+        if ticker is None or ticker in changed:
+            lines = fresh.get(run, [])
+        else:
+            k = seen[ticker] = seen.get(ticker, -1) + 1
+            lines = old[(ticker, k)]
+        out.extend(lines)
+        layout.append([ticker, len(lines)])
+
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        f.writelines(out)
+    os.replace(tmp, path)
+    _write_state(fingerprint_path, {
+        'context': ctx, 'output': file_hash(path), 'tickers': prints, 'layout': layout,
+    })
+
+    reused = len(prints) - len(changed)
+    instrument.count(f'rows_written.{name}', len(cleaned))
+    instrument.count(f'clean.{name}.cleaned_tickers', len(changed))
+    instrument.count(f'clean.{name}.reused_tickers', reused)
+    if reason:
+        storage.mirror_table(name, cleaned)
+        print(f"{name}: cleaned all {len(changed)} tickers ({reason}).")
+    else:
+        storage.mirror_table(name, cleaned, tickers=changed | removed)
+        print(f"{name}: re-cleaned {len(changed)} ticker(s), reused {reused}, removed {len(removed)}.")
+    return {'mode': 'full' if reason else 'incremental', 'cleaned': len(changed),
+            'reused': reused, 'removed': len(removed)}
@@ -10,6 +10,14 @@ load_dotenv()
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 DATA_RAW_DIR = os.path.join(BASE_DIR, 'data', 'raw')
 DATA_CLEANED_DIR = os.path.join(BASE_DIR, 'data', 'cleaned')
+DATA_CACHE_DIR = os.path.join(BASE_DIR, 'data', 'cache')
+DATA_DASHBOARD_DIR = os.path.join(BASE_DIR, 'data', 'dashboard')
+DATA_REPORTS_DIR = os.path.join(BASE_DIR, 'data', 'reports')
+
+# Cleaned-layer storage: 'csv' (default) or 'parquet'. CSV exports are always
+# written for the static dashboards; 'parquet' adds a ticker-partitioned copy
+# under data/cleaned/parquet/ that the ETL readers use instead.
+STORAGE_FORMAT = os.getenv('STORAGE_FORMAT', 'csv')
 
 # Ensure directories exist
 os.makedirs(DATA_RAW_DIR, exist_ok=True)
@@ -21,6 +29,41 @@ TICKERS = [
     'PG', 'HD', 'MA', 'UNH', 'DIS', 'BAC', 'NVDA', 'PYPL', 'NFLX', 'ADBE', 'KO'
 ]
 
+# --- Fetching (yFinance) ---
+# Number of tickers fetched in parallel, and the shared request budget
+# (requests/second, burst size) across all workers.
+FETCH_WORKERS = int(os.getenv('FETCH_WORKERS', 4))
+FETCH_RATE_PER_SEC = float(os.getenv('FETCH_RATE_PER_SEC', 4))
+FETCH_BURST = int(os.getenv('FETCH_BURST', 4))
+
+# --- Price history ---
+# Full backfill window, and the overlap re-fetched on incremental runs so
+# that bars restated by the provider after the last run are picked up.
+PRICE_HISTORY_PERIOD = os.getenv('PRICE_HISTORY_PERIOD', '7y')
+PRICE_OVERLAP_DAYS = int(os.getenv('PRICE_OVERLAP_DAYS', 7))
+PRICE_TAIL_ROWS = 10  # bars per ticker kept in stock_prices_state.json
+
+# --- Run state (run_state.py) ---
+# A rerun resumes an unfinished run_phase1/run_phase2 run (skipping the stages
+# and tickers it already finished) if it started less than this many hours ago.
+RUN_RESUME_HOURS = float(os.getenv('RUN_RESUME_HOURS', 12))
+# Stages run concurrently by dag.py
+DAG_WORKERS = int(os.getenv('DAG_WORKERS', 4))
+# Run reports (instrument.py): how many are kept per pipeline in
+# data/reports/, and how often the RSS of a running stage is sampled
+ETL_REPORT_KEEP = int(os.getenv('ETL_REPORT_KEEP', 30))
+INSTRUMENT_RSS_INTERVAL = float(os.getenv('INSTRUMENT_RSS_INTERVAL', 0.1))
+
+# --- Dashboard artifacts (build_dashboard.py) ---
+# Precomputed JSON for the static dashboards under data/dashboard/v<schema>/.
+# Price series keep daily bars for the last DASHBOARD_DAILY_DAYS and an LTTB
+# reduction to DASHBOARD_HISTORY_POINTS bars before that; DASHBOARD_TOP_N caps
+# the Row 1 rankings (0 = every company).
+DASHBOARD_SCHEMA_VERSION = 1
+DASHBOARD_DAILY_DAYS = int(os.getenv('DASHBOARD_DAILY_DAYS', 366))
+DASHBOARD_HISTORY_POINTS = int(os.getenv('DASHBOARD_HISTORY_POINTS', 300))
+DASHBOARD_TOP_N = int(os.getenv('DASHBOARD_TOP_N', 0))
+
 # --- 1. MySQL Configuration (Local) ---
 DB_CONFIG = {
     'user': os.getenv('DB_USER'),
@@ -39,6 +82,57 @@ SUPABASE_DB_CONFIG = {
     'database': os.getenv('SUPA_DB_NAME')
 }
 
+# --- Database load (loader.py) ---
+# Targets loaded by default (comma-separated: mysql, supabase); all targets
+# are loaded concurrently from one read of the cleaned files.
+LOAD_TARGETS = [t.strip() for t in os.getenv('LOAD_TARGETS', 'supabase').split(',') if t.strip()]
+# Per-target strategy: 'load_data' (MySQL LOAD DATA LOCAL INFILE) / 'copy'
+# (PostgreSQL COPY) bulk-load a staging table and upsert with one statement,
+# falling back to 'insert' (chunked executemany) if the bulk load fails.
+MYSQL_LOAD_MODE = os.getenv('MYSQL_LOAD_MODE', 'load_data')
+SUPABASE_LOAD_MODE = os.getenv('SUPABASE_LOAD_MODE', 'copy')
+# Bulk batches are sized to ~LOAD_BATCH_BYTES of serialized rows unless a
+# fixed row count is set (0 = auto).
+LOAD_BATCH_BYTES = int(os.getenv('LOAD_BATCH_BYTES', 16 * 1024 * 1024))
+MYSQL_LOAD_BATCH_ROWS = int(os.getenv('MYSQL_LOAD_BATCH_ROWS', 0))
+SUPABASE_COPY_CHUNK_ROWS = int(os.getenv('SUPABASE_COPY_CHUNK_ROWS', 0))
+# executemany chunk sizes (rows per round trip)
+MYSQL_INSERT_CHUNK_ROWS = int(os.getenv('MYSQL_INSERT_CHUNK_ROWS', 2000))
+SUPABASE_INSERT_CHUNK_ROWS = int(os.getenv('SUPABASE_INSERT_CHUNK_ROWS', 500))
+
+# --- View export (export_queries.py) ---
+# Views fetched in parallel (one pooled connection each; keep it within the
+# engine's default pool of 5), and rows per server-side cursor fetch.
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', 4))
+EXPORT_FETCH_ROWS = int(os.getenv('EXPORT_FETCH_ROWS', 2000))
+
+# --- Flask API (backend/app.py) ---
+# One pooled engine per process. API_DATABASE_URL overrides DB_CONFIG (e.g. a
+# read replica, or sqlite:///... for local load tests).
+API_DATABASE_URL = os.getenv('API_DATABASE_URL')
+API_POOL_SIZE = int(os.getenv('API_POOL_SIZE', 5))
+API_POOL_MAX_OVERFLOW = int(os.getenv('API_POOL_MAX_OVERFLOW', 10))
+API_POOL_TIMEOUT = int(os.getenv('API_POOL_TIMEOUT', 30))
+API_POOL_RECYCLE = int(os.getenv('API_POOL_RECYCLE', 1800))  # below MySQL wait_timeout
+# Response cache for the /api data endpoints: TTL + LRU bounded by entries and
+# MB, dropped whenever etl_load_log gets a new row (checked every N seconds).
+API_CACHE_TTL = int(os.getenv('API_CACHE_TTL', 3600))
+API_CACHE_MAX_ENTRIES = int(os.getenv('API_CACHE_MAX_ENTRIES', 512))
+API_CACHE_MAX_MB = int(os.getenv('API_CACHE_MAX_MB', 64))
+API_CACHE_GENERATION_CHECK = float(os.getenv('API_CACHE_GENERATION_CHECK', 30))
+# Page sizes for the keyset-paginated endpoints (?limit=, capped at the max)
+API_DEFAULT_PAGE_ROWS = int(os.getenv('API_DEFAULT_PAGE_ROWS', 100))
+API_MAX_PAGE_ROWS = int(os.getenv('API_MAX_PAGE_ROWS', 5000))
+# Batch endpoints: max tickers per request, rows fetched per server-side cursor batch
+API_MAX_BATCH_TICKERS = int(os.getenv('API_MAX_BATCH_TICKERS', 100))
+API_STREAM_BATCH_ROWS = int(os.getenv('API_STREAM_BATCH_ROWS', 2000))
+# Streamed responses (batch, NDJSON, CSV) are written in ~N KB chunks, gzipped
+# on the fly at this level when the client accepts it
+API_STREAM_CHUNK_KB = int(os.getenv('API_STREAM_CHUNK_KB', 64))
+API_STREAM_GZIP_LEVEL = int(os.getenv('API_STREAM_GZIP_LEVEL', 6))
+# ?resolution=lttb: default / maximum number of points returned
+API_LTTB_POINTS = int(os.getenv('API_LTTB_POINTS', 500))
+
 # --- 3. Frontend API ---
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_ANON_KEY = os.getenv('SUPABASE_ANON_KEY')
\ No newline at end of file
@@ -0,0 +1,109 @@
+# backend/etl/dag.py
+# Author: Hoang Son Lai
+#
+# Minimal DAG runner for the ETL stages.
+#
+# A pipeline is a list of Node(name, fn, deps, ...): every node whose
+# dependencies completed (or were skipped as up to date) is submitted to a
+# thread pool of DAG_WORKERS, so independent stages overlap, e.g. cleaning
+# prices while financials are cleaned, or the Supabase load while the AI
+# insights are generated. Each node runs through RunState.run (run_state.py),
+# so unchanged stages are skipped and a failed run resumes where it stopped.
+# When a node fails, the nodes that depend on it are not started, the other
+# branches finish, and run_dag raises at the end.
+#
+# Every node is an instrument.stage (instrument.py): its timing, peak RSS and
+# counters, and the child spans its code records (e.g. one per fetched
+# ticker), go into the run report data/reports/<pipeline>_<run_id>.json,
+# written even when a stage failed. The report's stages form a Gantt chart
+# (start / end per stage, plus Chrome trace events); a text version is
+# printed at the end of the run.
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from config import DAG_WORKERS
+import instrument
+
+
+class Node:
+    def __init__(self, name, fn, deps=(), params=None, inputs=(), outputs=(), always=False, checkpoint=False):
+        self.name = name
+        self.fn = fn
+        self.deps = list(deps)
+        self.params = params or {}
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.always = always
+        self.checkpoint = checkpoint
+
+
+def _check(nodes):
+    names = [n.name for n in nodes]
+    if len(set(names)) != len(names):
+        raise ValueError("Duplicate node names in the pipeline")
+    for node in nodes:
+        missing = [d for d in node.deps if d not in names]
+        if missing:
+            raise ValueError(f"Node {node.name} depends on unknown node(s): {', '.join(missing)}")
+    # Kahn's algorithm: every node must be reachable without a cycle
+    remaining = {n.name: set(n.deps) for n in nodes}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Dependency cycle between: {', '.join(sorted(remaining))}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+def run_dag(pipeline, nodes, state, workers=None):
+    """Runs the nodes in dependency order, independent ones concurrently; writes the run report."""
+    _check(nodes)
+    workers = max(1, workers or DAG_WORKERS)
+    instrument.reset()
+    pending = {n.name: n for n in nodes}
+    done, failed, blocked = set(), {}, set()
+    running = {}
+
+    def execute(node):
+        with instrument.stage(node.name) as result:
+            ran = state.run(node.name, node.fn, params=node.params, inputs=node.inputs, outputs=node.outputs,
+                            always=node.always, checkpoint=node.checkpoint)
+            if not ran:
+                result['status'] = 'skipped'
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dag') as pool:
+        while pending or running:
+            for name, node in list(pending.items()):
+                if any(d in failed or d in blocked for d in node.deps):
+                    blocked.add(name)
+                    del pending[name]
+                    print(f"[dag] Not running {name}: a dependency failed.")
+                elif all(d in done for d in node.deps):
+                    del pending[name]
+                    running[pool.submit(execute, node)] = name
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    done.add(name)
+                else:
+                    failed[name] = error
+                    print(f"[dag] {name} failed: {type(error).__name__}: {error}")
+
+    blocked.update(pending)  # downstream of a blocked node
+    for name in sorted(blocked):
+        instrument.recorder.add_stage(name, 'blocked')
+    report = instrument.build_report(
+        pipeline, state.run_id, {n.name: n.deps for n in nodes}, workers, 'failed' if failed else 'ok',
+    )
+    path = instrument.write_report(report)
+    instrument.print_timeline(report)
+    print(f"Run report: {path}")
+    if failed:
+        raise RuntimeError(f"{pipeline}: {len(failed)} stage(s) failed ({', '.join(failed)}), "
+                           f"{len(blocked)} not run")
+    state.finish()
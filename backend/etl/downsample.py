@@ -0,0 +1,168 @@
+# backend/etl/downsample.py
+# Author: Hoang Son Lai
+#
+# Downsampling of daily price series for charts.
+#
+#   resample_ohlcv(prices, 'weekly' | 'monthly')
+#       -> one OHLCV bar per ticker and calendar week (Mon-Fri) / month:
+#          first open, max high, min low, last close / adj_close, summed
+#          volume. `date` is the first day of the period, so a bar keeps the
+#          same key while the period is still filling up (safe to upsert).
+#   lttb_indices(x, y, n_out) / lttb(prices, n_out)
+#       -> Largest-Triangle-Three-Buckets: keeps n_out of the daily bars
+#          (always the first and last), choosing in each bucket the bar that
+#          forms the largest triangle with its neighbours, so peaks and
+#          troughs survive where plain striding would drop them. The kept
+#          rows are real bars, so any per-bar column (volume, overlays) can
+#          ride along.
+#   visual_error(x, y, kept_x, kept_y)
+#       -> how far the chart of the reduced series is from the full one:
+#          |y - interpolated reduced line| at every original bar, as a
+#          fraction of the series' range (times the chart height in pixels
+#          = how many pixels the line is off).
+#
+# The ETL precomputes the weekly/monthly bars into the stock_prices_resampled
+# table (loaded like the other cleaned tables, served by the API with
+# ?resolution=weekly|monthly); LTTB depends on the requested range and point
+# count, so the API computes it per request (?resolution=lttb&points=N) and
+# build_dashboard.py precomputes it for the dashboard artifacts.
+# bench_downsample.py reports (and bounds) the visual error of each method.
+
+import numpy as np
+import pandas as pd
+import storage
+from config import DATA_CLEANED_DIR
+
+RESOLUTIONS = {'weekly': 'W-SUN', 'monthly': 'M'}
+RESAMPLED_TABLE = 'stock_prices_resampled'
+
+
+def _date_values(dates):
+    """Dates as float days (LTTB / interpolation x axis)."""
+    return pd.to_datetime(dates).to_numpy(dtype='datetime64[D]').astype(np.int64).astype(float)
+
+
+# ----------------------------------------------------------------------
+# OHLCV resampling
+# ----------------------------------------------------------------------
+def resample_ohlcv(prices, resolution, label='start'):
+    """Per-ticker OHLCV bars per week / month. label='last' dates each bar by its last trading day."""
+    freq = RESOLUTIONS[resolution]
+    df = prices.dropna(subset=['close']).sort_values(['ticker', 'date'], kind='mergesort')
+    period = pd.to_datetime(df['date']).dt.to_period(freq)
+    agg = {'date': 'last', 'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+    if 'adj_close' in df.columns:
+        agg['adj_close'] = 'last'
+    out = (
+        df.groupby([df['ticker'], period], sort=False, observed=True)
+        .agg(agg)
+        .reset_index(level=0)
+    )
+    if label == 'start':
+        out['date'] = out.index.to_timestamp(how='start')
+    out = out.reset_index(drop=True)
+    out['date'] = pd.to_datetime(out['date'])
+    return out
+
+
+def build_resampled(prices):
+    """Rows of the stock_prices_resampled table: weekly + monthly bars for every ticker."""
+    frames = []
+    for resolution in RESOLUTIONS:
+        bars = resample_ohlcv(prices, resolution)
+        bars.insert(1, 'resolution', resolution)
+        frames.append(bars)
+    out = pd.concat(frames, ignore_index=True)
+    out['volume'] = out['volume'].round().astype('Int64')
+    return out[['ticker', 'resolution', 'date', 'open', 'high', 'low', 'close', 'adj_close', 'volume']]
+
+
+# ----------------------------------------------------------------------
+# Largest-Triangle-Three-Buckets
+# ----------------------------------------------------------------------
+def lttb_indices(x, y, n_out):
+    """Indices (sorted) of the n_out points LTTB keeps out of (x, y); all of them if n_out >= len."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        raise ValueError("LTTB needs at least 3 output points")
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    every = (n - 2) / (n_out - 2)
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        # Average of the next bucket (the last point for the last bucket)
+        next_start = end
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def lttb(prices, n_out, value='close'):
+    """Per-ticker LTTB reduction of `prices` (rows kept whole), sorted by ticker, date."""
+    df = prices.dropna(subset=[value]).sort_values(['ticker', 'date'], kind='mergesort')
+    parts = []
+    for _, group in df.groupby('ticker', sort=False, observed=True):
+        idx = lttb_indices(_date_values(group['date']), group[value].to_numpy(), n_out)
+        parts.append(group.iloc[idx])
+    if not parts:
+        return df
+    return pd.concat(parts).reset_index(drop=True)
+
+
+# ----------------------------------------------------------------------
+# Visual error
+# ----------------------------------------------------------------------
+def visual_error(x, y, kept_x, kept_y):
+    """(max, mean) distance between the full series and the reduced line, as a fraction of the y range."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    span = np.nanmax(y) - np.nanmin(y)
+    if len(y) == 0 or not span:
+        return 0.0, 0.0
+    drawn = np.interp(x, np.asarray(kept_x, dtype=float), np.asarray(kept_y, dtype=float))
+    err = np.abs(y - drawn) / span
+    return float(err.max()), float(err.mean())
+
+
+def series_error(full, reduced, value='close'):
+    """visual_error for one ticker's full and reduced frames (both with date + value)."""
+    return visual_error(
+        _date_values(full['date']), full[value].to_numpy(),
+        _date_values(reduced['date']), reduced[value].to_numpy(),
+    )
+
+
+# ----------------------------------------------------------------------
+# ETL stage
+# ----------------------------------------------------------------------
+def main():
+    print("--- Building resampled price bars ---")
+    if not storage.CsvStore().exists('stock_prices'):
+        print(f"Skipping: no stock_prices in {DATA_CLEANED_DIR}.")
+        return
+    prices = storage.read_table(
+        'stock_prices', columns=['ticker', 'date', 'open', 'high', 'low', 'close', 'adj_close', 'volume']
+    )
+    out = build_resampled(prices)
+    storage.save_table(RESAMPLED_TABLE, out)
+    counts = out.groupby('resolution', observed=True).size()
+    print(f"Saved {RESAMPLED_TABLE}: {len(out)} rows "
+          f"({', '.join(f'{n} {r}' for r, n in counts.items())}) from {len(prices)} daily bars")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,122 @@
 # backend/etl/export_queries.py
 # Author: Hoang Son Lai
+#
+# Exports the Supabase views view_query1..8 to data/query_data/result<i>.csv.
+# The views (backend/sql/supabase_views.sql) read the materialized tables
+# latest_financials / price_metrics that the loader refreshes (materialize.py).
+#
+# Views are fetched concurrently by EXPORT_WORKERS threads, each on its own
+# pooled connection from one engine. Rows are streamed from a server-side
+# cursor in EXPORT_FETCH_ROWS batches straight into csv.writer, hashing the
+# bytes on the way; no DataFrame is built. A file is only replaced when its
+# content hash changed, so the daily commit of data/query_data/ only
+# contains views whose results actually moved.
+#
+# Values are written the way DataFrame.to_csv wrote them after pd.read_sql
+# (NUMERIC as float, NULL as an empty field), so an unchanged view gives the
+# same bytes as before.
 
+import csv
+import hashlib
+import io
 import os
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
 from sqlalchemy import text
-from config import BASE_DIR
+from config import BASE_DIR, EXPORT_FETCH_ROWS, EXPORT_WORKERS
 from load_to_supabase import get_supabase_engine
+from run_state import file_hash
+import instrument
 
 # Đường dẫn đến thư mục chứa file kết quả CSV
 QUERY_DATA_DIR = os.path.join(BASE_DIR, 'data', 'query_data')
 os.makedirs(QUERY_DATA_DIR, exist_ok=True)
 
-def export_views_to_csv():
+VIEWS = [(f"view_query{i}", f"result{i}.csv") for i in range(1, 9)]
+
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, Decimal):
+        return repr(float(value))
+    if isinstance(value, float):
+        return '' if value != value else repr(value)
+    return value
+
+
+def export_view(engine, view_name, filename):
+    """Streams one view into its CSV; returns (rows, changed)."""
+    output_path = os.path.join(QUERY_DATA_DIR, filename)
+    tmp_path = output_path + '.tmp'
+    digest = hashlib.sha256()
+    rows = 0
+    try:
+        with instrument.span(f"export:{view_name}"), engine.connect() as conn:
+            # Lấy dữ liệu từ View trên Supabase (server-side cursor, từng batch)
+            result = conn.execution_options(stream_results=True, max_row_buffer=EXPORT_FETCH_ROWS).execute(
+                text(f"SELECT * FROM {view_name}")
+            )
+            buf = io.StringIO()
+            writer = csv.writer(buf, lineterminator='\n')
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+                writer.writerow(result.keys())
+                for batch in result.partitions(EXPORT_FETCH_ROWS):
+                    writer.writerows([csv_value(v) for v in row] for row in batch)
+                    rows += len(batch)
+                    chunk = buf.getvalue()
+                    digest.update(chunk.encode('utf-8'))
+                    f.write(chunk)
+                    buf.seek(0)
+                    buf.truncate()
+                chunk = buf.getvalue()  # header only, for an empty view
+                digest.update(chunk.encode('utf-8'))
+                f.write(chunk)
+    except Exception:
+        # Giữ nguyên file cũ nếu view lỗi giữa chừng
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    changed = digest.hexdigest()[:16] != file_hash(output_path)
+    if changed:
+        os.replace(tmp_path, output_path)
+    else:
+        os.remove(tmp_path)
+    instrument.count('supabase.export_rows', rows)
+    return rows, changed
+
+
+def export_views_to_csv(workers=None):
     print("\n>>> EXPORTING SUPABASE VIEWS TO CSV <<<")
     engine = get_supabase_engine()
-    
-    for i in range(1, 9):
-        view_name = f"view_query{i}"
-        output_path = os.path.join(QUERY_DATA_DIR, f'result{i}.csv')
-        
-        try:
-            print(f"Fetching data from {view_name}...", end='\r')
-            with engine.connect() as conn:
-                # Lấy dữ liệu từ View trên Supabase
-                df = pd.read_sql(text(f"SELECT * FROM {view_name}"), conn)
-            
-            # Lưu đè lên file CSV cũ
-            df.to_csv(output_path, index=False)
-            print(f"[Success] Saved {view_name} to result{i}.csv ({len(df)} rows)")
-            
-        except Exception as e:
-            print(f"[Error] Failed to export {view_name}: {e}")
+    workers = max(1, min(workers or EXPORT_WORKERS, len(VIEWS)))
+    unchanged = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='export') as pool:
+            futures = {
+                pool.submit(instrument.propagate(export_view), engine, view_name, filename): (view_name, filename)
+                for view_name, filename in VIEWS
+            }
+            for future, (view_name, filename) in futures.items():
+                try:
+                    rows, changed = future.result()
+                except Exception as e:
+                    instrument.count('supabase.export_errors')
+                    print(f"[Error] Failed to export {view_name}: {e}")
+                    continue
+                if changed:
+                    print(f"[Success] Saved {view_name} to {filename} ({rows} rows)")
+                else:
+                    unchanged += 1
+                    print(f"[Unchanged] {view_name}: {filename} kept ({rows} rows)")
+    finally:
+        engine.dispose()
+    instrument.count('supabase.export_unchanged', unchanged)
+    print(f"Exported {len(VIEWS)} views with {workers} connections, {unchanged} unchanged.")
 
 def main():
     export_views_to_csv()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
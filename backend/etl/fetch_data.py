@@ -4,13 +4,35 @@
 import yfinance as yf
 import pandas as pd
 import os
+import json
 import time
-from config import TICKERS, DATA_RAW_DIR
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import (
+    TICKERS, DATA_RAW_DIR, FETCH_WORKERS, FETCH_RATE_PER_SEC, FETCH_BURST,
+    PRICE_HISTORY_PERIOD, PRICE_OVERLAP_DAYS,
+)
+from rate_limiter import TokenBucket
+import instrument
+import price_state
 
-def fetch_company_info(ticker_symbol):
+def _throttle(limiter):
+    """Chờ tới lượt gọi Yahoo (mỗi request tiêu 1 token của bucket dùng chung)"""
+    if limiter is not None:
+        limiter.acquire()
+    instrument.count('yahoo.requests')
+
+def _count_error(e):
+    """Đếm lỗi Yahoo cho báo cáo (instrument.py); 429 được đếm riêng"""
+    instrument.count('yahoo.errors')
+    if '429' in str(e) or 'Too Many Requests' in str(e) or type(e).__name__ == 'YFRateLimitError':
+        instrument.count('yahoo.rate_limited')
+
+def fetch_company_info(ticker_symbol, limiter=None):
     """Lấy thông tin chung bằng yFinance"""
     try:
         ticker = yf.Ticker(ticker_symbol)
+        _throttle(limiter)
         info = ticker.info
         
         data = {
@@ -25,14 +47,20 @@ def fetch_company_info(ticker_symbol):
         }
         return pd.DataFrame([data])
     except Exception as e:
+        _count_error(e)
         print(f"  -> Lỗi lấy Info {ticker_symbol}: {e}")
         return pd.DataFrame()
 
-def fetch_stock_history(ticker_symbol, period="7y"):
-    """Lấy lịch sử giá bằng yFinance (Đã xử lý chống lỗi dòng rỗng)"""
+def fetch_stock_history(ticker_symbol, period=PRICE_HISTORY_PERIOD, start=None, limiter=None):
+    """Lấy lịch sử giá bằng yFinance (Đã xử lý chống lỗi dòng rỗng).
+    Nếu có `start` (YYYY-MM-DD) thì chỉ lấy các phiên từ ngày đó trở đi."""
     try:
         ticker = yf.Ticker(ticker_symbol)
-        hist = ticker.history(period=period)
+        _throttle(limiter)
+        if start:
+            hist = ticker.history(start=start)
+        else:
+            hist = ticker.history(period=period)
         hist.reset_index(inplace=True)
         
         # Bộ lọc loại bỏ những ngày dữ liệu lỗi của Yahoo
@@ -42,10 +70,11 @@ def fetch_stock_history(ticker_symbol, period="7y"):
         hist['Ticker'] = ticker_symbol
         return hist
     except Exception as e:
+        _count_error(e)
         print(f"  -> Lỗi lấy Giá Cổ Phiếu {ticker_symbol}: {e}")
         return pd.DataFrame()
 
-def fetch_financials(ticker_symbol):
+def fetch_financials(ticker_symbol, limiter=None):
     """Lấy Báo cáo tài chính Năm và Quý và TRẢ VỀ 2 BẢNG RIÊNG BIỆT"""
     try:
         t = yf.Ticker(ticker_symbol)
@@ -54,8 +83,11 @@ def fetch_financials(ticker_symbol):
         # 1. XỬ LÝ BÁO CÁO NĂM (ANNUAL)
         # ==========================================
         annual_df = pd.DataFrame()
+        _throttle(limiter)
         inc_ann = t.financials.T
+        _throttle(limiter)
         bal_ann = t.balance_sheet.T
+        _throttle(limiter)
         cf_ann = t.cashflow.T
         
         if not inc_ann.empty and not bal_ann.empty and not cf_ann.empty:
@@ -69,8 +101,11 @@ def fetch_financials(ticker_symbol):
         # 2. XỬ LÝ BÁO CÁO QUÝ (QUARTERLY)
         # ==========================================
         quarterly_df = pd.DataFrame()
+        _throttle(limiter)
         inc_qtr = t.quarterly_financials.T
+        _throttle(limiter)
         bal_qtr = t.quarterly_balance_sheet.T
+        _throttle(limiter)
         cf_qtr = t.quarterly_cashflow.T
         
         if not inc_qtr.empty and not bal_qtr.empty and not cf_qtr.empty:
@@ -83,34 +118,122 @@ def fetch_financials(ticker_symbol):
         return annual_df, quarterly_df
         
     except Exception as e:
+        _count_error(e)
         print(f"  -> Lỗi xử lý BCTC {ticker_symbol}: {e}")
         return pd.DataFrame(), pd.DataFrame()
 
-def main():
+def fetch_ticker(ticker_symbol, limiter=None, price_start=None):
+    """Lấy toàn bộ dữ liệu (Info, Giá, BCTC) của 1 mã. Trả về dict kết quả + thời gian chạy"""
+    started = time.perf_counter()
+    with instrument.span(f"fetch:{ticker_symbol}"):
+        info_df = fetch_company_info(ticker_symbol, limiter)
+        price_df = fetch_stock_history(ticker_symbol, start=price_start, limiter=limiter)
+        ann_df, qtr_df = fetch_financials(ticker_symbol, limiter)
+    instrument.count('yahoo.price_rows', len(price_df))
+    return {
+        'ticker': ticker_symbol,
+        'companies': info_df,
+        'prices': price_df,
+        'financials_annual': ann_df,
+        'financials_quarterly': qtr_df,
+        'elapsed': time.perf_counter() - started,
+    }
+
+FRAMES = ['companies', 'prices', 'financials_annual', 'financials_quarterly']
+
+def save_checkpoint(checkpoint, res):
+    """Lưu kết quả của 1 mã vào thư mục checkpoint (chạy lại sau lỗi sẽ không tải lại mã này)"""
+    saved = []
+    for name in FRAMES:
+        if not res[name].empty:
+            res[name].to_csv(checkpoint.path(f"{res['ticker']}.{name}.csv"), index=False)
+            saved.append(name)
+    # Written last: lists the frames of a complete checkpoint
+    with open(checkpoint.path(f"{res['ticker']}.frames.json"), 'w', encoding='utf-8') as f:
+        json.dump(saved, f)
+    checkpoint.mark(res['ticker'])
+
+def checkpoint_frames(checkpoint, ticker_symbol):
+    """
+    Frames saved for a finished ticker, or None if its checkpoint files are
+    missing. run_state_*.json is committed but data/cache/checkpoints/ is not,
+    so on a fresh checkout a ticker marked done has nothing to resume from
+    and must be fetched again rather than dropped from the raw files.
+    """
+    marker = checkpoint.path(f"{ticker_symbol}.frames.json")
+    if not os.path.exists(marker):
+        return None
+    with open(marker, encoding='utf-8') as f:
+        names = json.load(f)
+    if not all(os.path.exists(checkpoint.path(f"{ticker_symbol}.{name}.csv")) for name in names):
+        return None
+    return names
+
+def load_checkpoint(checkpoint, ticker_symbol, names):
+    res = {'ticker': ticker_symbol, 'elapsed': 0.0}
+    for name in FRAMES:
+        path = checkpoint.path(f"{ticker_symbol}.{name}.csv")
+        res[name] = pd.read_csv(path) if name in names else pd.DataFrame()
+    return res
+
+def main(workers=None, tickers=None, full=False, checkpoint=None):
     print("--- Starting Data Fetching Process (Powered by Bulletproof yFinance) ---")
-    
-    all_companies = []
-    all_prices = []
-    all_financials_annual = []
-    all_financials_quarterly = []
-
-    for t in TICKERS:
-        print(f"Fetching data for {t}...")
-        try:
-            # 1. Info
-            all_companies.append(fetch_company_info(t))
-            
-            # 2. Prices
-            all_prices.append(fetch_stock_history(t))
-            
-            # 3. Financials (Tách làm 2 mảng riêng biệt)
-            ann_df, qtr_df = fetch_financials(t)
-            all_financials_annual.append(ann_df)
-            all_financials_quarterly.append(qtr_df)
-            
-            time.sleep(1)
-        except Exception as e:
-            print(f"LỖI TOÀN CỤC khi lấy {t}: {e}")
+
+    workers = max(1, workers or FETCH_WORKERS)
+    tickers = tickers or TICKERS
+
+    # Incremental: chỉ lấy giá từ (ngày cuối đã lưu - overlap); mã mới vẫn lấy đủ lịch sử
+    price_starts = {} if full else price_state.fetch_start_dates(PRICE_OVERLAP_DAYS)
+    mode = 'incremental' if price_starts else 'full'
+    print(f"Price mode: {mode}" + ("" if price_starts else f" ({PRICE_HISTORY_PERIOD} backfill)"))
+    # Bucket dùng chung cho mọi worker, thay cho time.sleep(1) cố định
+    limiter = TokenBucket(FETCH_RATE_PER_SEC, FETCH_BURST)
+    print(f"Workers: {workers} | Rate limit: {FETCH_RATE_PER_SEC:g} req/s (burst {FETCH_BURST})")
+
+    run_started = time.perf_counter()
+    results = {}
+    # Resume (run_state.py): các mã đã lấy xong trong lần chạy dở trước được đọc lại từ checkpoint
+    if checkpoint is not None:
+        missing = 0
+        for t in tickers:
+            if t in checkpoint.done:
+                names = checkpoint_frames(checkpoint, t)
+                if names is None:
+                    missing += 1
+                    continue
+                results[t] = load_checkpoint(checkpoint, t, names)
+        if results:
+            print(f"Resumed {len(results)} tickers from checkpoint")
+        if missing:
+            print(f"Refetching {missing} tickers marked done whose checkpoint files are missing")
+    fetched = []
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            # propagate: requests made in the workers count towards this stage's report
+            pool.submit(instrument.propagate(fetch_ticker), t, limiter, price_starts.get(t)): t
+            for t in tickers if t not in results
+        }
+        for future in as_completed(futures):
+            t = futures[future]
+            try:
+                res = future.result()
+                results[t] = res
+                fetched.append(res)
+                print(f"Fetched {t} in {res['elapsed']:.2f}s")
+                # Mã lỗi (mọi bảng rỗng) không được đánh dấu, lần chạy lại sẽ thử lại
+                if checkpoint is not None and any(not res[name].empty for name in FRAMES):
+                    save_checkpoint(checkpoint, res)
+            except Exception as e:
+                instrument.count('yahoo.errors')
+                print(f"LỖI TOÀN CỤC khi lấy {t}: {e}")
+
+    # Giữ đúng thứ tự TICKERS trong file output, bất kể mã nào xong trước
+    ordered = [results[t] for t in tickers if t in results]
+    all_companies = [r['companies'] for r in ordered]
+    all_prices = [r['prices'] for r in ordered]
+    all_financials_annual = [r['financials_annual'] for r in ordered]
+    all_financials_quarterly = [r['financials_quarterly'] for r in ordered]
 
     # Lọc bỏ các DataFrame rỗng trước khi concat
     all_companies = [df for df in all_companies if not df.empty]
@@ -124,6 +247,7 @@ def main():
     
     if all_prices:
         pd.concat(all_prices, ignore_index=True).to_csv(os.path.join(DATA_RAW_DIR, 'raw_prices.csv'), index=False)
+        price_state.write_raw_meta(mode, {t: price_starts.get(t) for t in tickers if t in results})
     
     # LƯU FILE BÁO CÁO NĂM (Giữ nguyên tên cũ)
     if all_financials_annual:
@@ -133,7 +257,25 @@ def main():
     if all_financials_quarterly:
         pd.concat(all_financials_quarterly, ignore_index=True).to_csv(os.path.join(DATA_RAW_DIR, 'raw_financials_quarterly.csv'), index=False)
 
+    total = time.perf_counter() - run_started
+    if fetched:
+        latencies = sorted(r['elapsed'] for r in fetched)
+        print(
+            f"Per-ticker latency: min {latencies[0]:.2f}s | "
+            f"median {latencies[len(latencies) // 2]:.2f}s | max {latencies[-1]:.2f}s"
+        )
+    print(f"Fetched {len(fetched)}/{len(tickers)} tickers in {total:.2f}s"
+          + (f" ({len(ordered) - len(fetched)} from checkpoint)" if len(ordered) > len(fetched) else ""))
     print(f"--- Fetching Complete. 4 files saved to {DATA_RAW_DIR} ---")
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch raw company, price and financial data from yFinance.")
+    parser.add_argument('--workers', type=int, default=FETCH_WORKERS,
+                        help=f"Number of tickers fetched in parallel (default: {FETCH_WORKERS})")
+    parser.add_argument('--full', action='store_true',
+                        help=f"Ignore stored high-water marks and re-download {PRICE_HISTORY_PERIOD} of prices")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    main(workers=args.workers, full=args.full)
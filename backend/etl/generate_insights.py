@@ -23,6 +23,13 @@
 #                         (21 tickers x (2 summaries + 1 stock) = 63 calls/day)
 #   Total: ~77 calls/day, well under typical free-tier rate limits.
 #
+# All prompts are submitted up front to a concurrent Groq client
+# (groq_client.py) that stays under the requests/tokens-per-minute budget
+# below instead of sleeping a fixed delay after every call. Completions are
+# cached by a hash of (model, system prompt, prompt, max_tokens) in
+# data/cache/insight_cache.json, so prompts whose numbers did not change
+# since the last run (e.g. FY summaries between annual reports) skip Groq.
+#
 # These JSON files are pre-computed for every filter combination the
 # dashboards expose, so the frontend only ever does a static fetch() —
 # no client-side API calls, no exposed key.
@@ -30,15 +37,34 @@
 import os
 import json
 import time
-import requests
 import pandas as pd
 import numpy as np
+from concurrent.futures import Future
 from datetime import datetime, timezone
-from config import DATA_CLEANED_DIR, TICKERS
+from config import DATA_CACHE_DIR, DATA_CLEANED_DIR, TICKERS
+from storage import read_table
+from indicators import compute_signals
+from groq_client import GroqClient
+from prompt_cache import PromptCache
+import instrument
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL = os.getenv("GROQ_MODEL", "openai/gpt-oss-20b")
-GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_URL = os.getenv("GROQ_URL", "https://api.groq.com/openai/v1/chat/completions")
+
+# Client-side budget for the batch job (free-tier requests/minute; GROQ_TPM=0
+# means no client-side token cap). The client also adapts to the
+# x-ratelimit-* headers Groq sends back.
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", 4))
+GROQ_RPM = int(os.getenv("GROQ_RPM", 30))
+GROQ_TPM = int(os.getenv("GROQ_TPM", 0))
+
+# Prompt cache: entries older than the TTL are regenerated, and the file keeps
+# at most INSIGHT_CACHE_MAX_ENTRIES (least recently used dropped first).
+# INSIGHT_CACHE_TTL_HOURS=0 disables the cache.
+INSIGHT_CACHE_PATH = os.path.join(DATA_CACHE_DIR, "insight_cache.json")
+INSIGHT_CACHE_TTL_HOURS = float(os.getenv("INSIGHT_CACHE_TTL_HOURS", 24 * 30))
+INSIGHT_CACHE_MAX_ENTRIES = int(os.getenv("INSIGHT_CACHE_MAX_ENTRIES", 2000))
 
 # Metric options exposed by each selector in global_dashboard.html
 ROW1_METRICS = [
@@ -50,10 +76,6 @@ ROW2_SECTOR_METRICS = ["revenue", "total_assets", "net_income"]
 
 REPORT_TYPES = ["FY", "Q"]
 
-# Small pause between calls so we never burst past the free-tier
-# requests-per-minute limit, regardless of how fast Groq responds.
-CALL_DELAY_SECONDS = 1.3
-
 SYSTEM_PROMPT = (
     "You are a financial analyst writing very short insight captions for a "
     "live dashboard. Rules: 1-2 sentences max. Be specific and reference "
@@ -65,56 +87,66 @@ SYSTEM_PROMPT = (
 
 
 # ----------------------------------------------------------------------
-# Low-level Groq call with retry/backoff
+# Groq calls (concurrent, rate-limited, retry/backoff in groq_client.py)
 # ----------------------------------------------------------------------
-def call_groq(user_prompt, max_tokens=120, retries=4):
-    if not GROQ_API_KEY:
-        return "Insight unavailable (GROQ_API_KEY not configured)."
-
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "model": GROQ_MODEL,
-        "messages": [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt},
-        ],
-        "max_tokens": max_tokens,
-        "temperature": 0.4,
-    }
-    # gpt-oss models reason before answering; without capping effort, reasoning
-    # tokens can eat the whole max_tokens budget and leave content empty.
-    if "gpt-oss" in GROQ_MODEL:
-        payload["reasoning_effort"] = "low"
-
-    result = "Insight temporarily unavailable."
-    for attempt in range(retries):
-        try:
-            resp = requests.post(GROQ_URL, headers=headers, json=payload, timeout=30)
-            if resp.status_code == 200:
-                data = resp.json()
-                result = data["choices"][0]["message"]["content"].strip()
-                result = result.replace("—", "-").replace("–", "-")
-                break
-            elif resp.status_code == 429:
-                # Honor Retry-After if Groq sends it, otherwise back off gradually.
-                retry_after = resp.headers.get("Retry-After")
-                wait = float(retry_after) if retry_after else (3 + attempt * 3)
-                print(f"  Rate limited, waiting {wait}s...")
-                time.sleep(wait)
-            else:
-                print(f"  Groq error {resp.status_code}: {resp.text[:200]}")
-                time.sleep(2)
-        except requests.RequestException as e:
-            print(f"  Request failed: {e}")
-            time.sleep(2)
-
-    # Always pause after a call (success or final failure) to stay well under
-    # the per-minute request budget for the rest of the batch job.
-    time.sleep(CALL_DELAY_SECONDS)
-    return result
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        cache = None
+        if INSIGHT_CACHE_TTL_HOURS > 0:
+            cache = PromptCache(
+                INSIGHT_CACHE_PATH,
+                ttl_seconds=INSIGHT_CACHE_TTL_HOURS * 3600,
+                max_entries=INSIGHT_CACHE_MAX_ENTRIES,
+            )
+        _client = GroqClient(
+            api_key=GROQ_API_KEY,
+            model=GROQ_MODEL,
+            system_prompt=SYSTEM_PROMPT,
+            url=GROQ_URL,
+            max_concurrency=GROQ_MAX_CONCURRENCY,
+            rpm=GROQ_RPM,
+            tpm=GROQ_TPM,
+            cache=cache,
+        )
+    return _client
+
+
+def submit_groq(user_prompt, max_tokens=120):
+    """Queues one insight on the shared client; returns a Future (resolved by collect())."""
+    return get_client().submit(user_prompt, max_tokens)
+
+
+def call_groq(user_prompt, max_tokens=120):
+    """Synchronous single call."""
+    return submit_groq(user_prompt, max_tokens).result()
+
+
+def close_client():
+    """Waits for in-flight calls, saves the prompt cache, shuts the client down and returns its stats."""
+    global _client
+    if _client is None:
+        return None
+    _client.close()
+    stats = dict(_client.stats)
+    cache = _client.cache
+    if cache is not None:
+        cache.save()
+        stats.update(cache_hits=cache.hits, cache_misses=cache.misses, cache_hit_ratio=cache.hit_ratio())
+    _client = None
+    return stats
+
+
+def collect(obj):
+    """Replaces every Future in a (nested) insights dict with its result."""
+    if isinstance(obj, dict):
+        return {k: collect(v) for k, v in obj.items()}
+    if isinstance(obj, Future):
+        return obj.result()
+    return obj
 
 
 def safe_num(val, default=0):
@@ -149,6 +181,13 @@ def fmt_compact(n):
     return f"{sign}{n:.0f}"
 
 
+def opt_num(val):
+    """NaN/None -> None, otherwise a plain float (signal-table values are NaN when unavailable)."""
+    if val is None or pd.isna(val):
+        return None
+    return float(val)
+
+
 def metric_label(metric):
     return metric.replace("_", " ").title()
 
@@ -173,12 +212,13 @@ def fmt_change(value, suffix="% vs prior period"):
 # Data loading helpers
 # ----------------------------------------------------------------------
 def load_data():
-    companies = pd.read_csv(os.path.join(DATA_CLEANED_DIR, "companies.csv"))
-    financials = pd.read_csv(os.path.join(DATA_CLEANED_DIR, "financial_statements.csv"))
-    stocks = pd.read_csv(os.path.join(DATA_CLEANED_DIR, "stock_prices.csv"))
-
-    financials["report_date"] = pd.to_datetime(financials["report_date"], errors="coerce")
-    stocks["date"] = pd.to_datetime(stocks["date"], errors="coerce")
+    # Dates come back already parsed from the storage layer (CSV or Parquet),
+    # with compact dtypes; prices only feed rounded indicators here, so they
+    # are float32 where the DECIMAL(15,4) values survive it (schema.py)
+    companies = read_table("companies")
+    financials = read_table("financial_statements")
+    stocks = read_table("stock_prices", columns=["ticker", "date", "open", "high", "low", "close", "volume"],
+                        float32=True)
 
     companies_map = companies.set_index("ticker").to_dict("index")
     return companies, financials, stocks, companies_map
@@ -189,7 +229,7 @@ def latest_fy_financials(financials):
     fy = financials[financials["period"] == "FY"].copy()
     fy = fy[(fy["revenue"].notna()) & (fy["revenue"] != 0)]
     fy = fy.sort_values("report_date", ascending=False)
-    return fy.groupby("ticker", as_index=False).first()
+    return fy.groupby("ticker", as_index=False, observed=True).first()
 
 
 # ----------------------------------------------------------------------
@@ -226,7 +266,7 @@ def build_global_insights(companies, financials, stocks, companies_map):
             )
         else:
             prompt = f"No data is currently available for the metric '{metric_label(metric)}'. State this briefly."
-        result["row1"][metric] = call_groq(prompt)
+        result["row1"][metric] = submit_groq(prompt)
 
     # --- Row 2 Sector: sector distribution, one insight per metric ---
     for metric in ROW2_SECTOR_METRICS:
@@ -234,7 +274,7 @@ def build_global_insights(companies, financials, stocks, companies_map):
         if metric not in latest.columns:
             result["row2_sector"][metric] = f"Metric '{metric}' is not available in the dataset."
             continue
-        sector_agg = latest.groupby("sector")[metric].sum().sort_values(ascending=False)
+        sector_agg = latest.groupby("sector", observed=True)[metric].sum().sort_values(ascending=False)
         sector_agg = sector_agg[sector_agg != 0]
         if not sector_agg.empty:
             label = metric_label(metric)
@@ -248,7 +288,7 @@ def build_global_insights(companies, financials, stocks, companies_map):
             )
         else:
             prompt = f"No sector data is currently available for the metric '{metric_label(metric)}'. State this briefly."
-        result["row2_sector"][metric] = call_groq(prompt)
+        result["row2_sector"][metric] = submit_groq(prompt)
 
     # --- Row 2 Bubble (Revenue vs Net Income vs Assets), fixed chart ---
     print("-- Row2 bubble")
@@ -267,7 +307,7 @@ def build_global_insights(companies, financials, stocks, companies_map):
         )
     else:
         prompt = "No revenue/net income data is currently available. State this briefly."
-    result["row2_bubble"] = call_groq(prompt)
+    result["row2_bubble"] = submit_groq(prompt)
 
     # --- Row 3 Heatmap (financial health ratios), fixed chart ---
     print("-- Row3 heatmap")
@@ -291,7 +331,7 @@ def build_global_insights(companies, financials, stocks, companies_map):
         )
     else:
         prompt = "No ratio data is currently available. State this briefly."
-    result["row3_heatmap"] = call_groq(prompt)
+    result["row3_heatmap"] = submit_groq(prompt)
 
     # --- Row 4: Market Trends (always latest, independent of any filter) ---
     print("-- Row4 market trends")
@@ -366,7 +406,7 @@ def build_global_insights(companies, financials, stocks, companies_map):
             "State this briefly."
         )
 
-    result["row4_market_trends"] = call_groq(prompt)
+    result["row4_market_trends"] = submit_groq(prompt)
 
     result["_generated_at"] = datetime.now(timezone.utc).isoformat()
     return result
@@ -379,6 +419,9 @@ def build_company_insights(companies, financials, stocks, companies_map):
     print("\n=== Generating COMPANY dashboard insights ===")
     print("(Executive Summary per FY/Q + one shared Stock insight per ticker)")
     result = {}
+
+    # One vectorised pass over all tickers instead of per-ticker filtering/loops
+    signals = compute_signals(stocks)
  
     for ticker in TICKERS:
         info = companies_map.get(ticker, {})
@@ -386,65 +429,24 @@ def build_company_insights(companies, financials, stocks, companies_map):
         sector = info.get("sector", "Unknown")
  
         result[ticker] = {}
-        stk = stocks[stocks["ticker"] == ticker].sort_values("date")
+        sig = signals.loc[ticker] if ticker in signals.index else None
  
         # --- Stock insight ---
         print(f"-- {ticker} [stock]")
  
-        if not stk.empty and len(stk) > 5:
- 
-            stk = stk.sort_values("date").reset_index(drop=True)
-            latest_stock = stk.iloc[-1]
-            latest_price = latest_stock["close"]
-            closes = stk["close"].tolist()
- 
-            # ===== 1 DAY =====
-            day_change = None
-            if len(stk) >= 2:
-                prev_price = stk.iloc[-2]["close"]
-                if pd.notna(prev_price) and prev_price > 0:
-                    day_change = (latest_price - prev_price) / prev_price * 100
-
-
-            # ===== 1 MONTH =====
-            one_month_change = None
-            idx_1m = max(0, len(stk) - 21)
-            start_1m = stk.iloc[idx_1m]["close"]
-            if pd.notna(start_1m) and start_1m > 0:
-                one_month_change = (latest_price - start_1m) / start_1m * 100
- 
-            # ===== 3 MONTH =====
-            three_month_change = None
-            idx_3m = max(0, len(stk) - 63)
-            start_3m = stk.iloc[idx_3m]["close"]
-            if pd.notna(start_3m) and start_3m > 0:
-                three_month_change = (latest_price - start_3m) / start_3m * 100
- 
-            # ===== 12 MONTH =====
-            one_year_change = None
-            idx_1y = max(0, len(stk) - 252)
-            start_1y = stk.iloc[idx_1y]["close"]
-            if pd.notna(start_1y) and start_1y > 0:
-                one_year_change = (latest_price - start_1y) / start_1y * 100
- 
-            # ===== MA / BB =====
-            def calc_ma(data, period):
-                if len(data) < period:
-                    return None
-                return sum(data[-period:]) / period
- 
-            def calc_bb(data, period=20, std_mult=2):
-                ma = calc_ma(data, period)
-                if ma is None:
-                    return None, None
-                window = data[-period:]
-                variance = sum((x - ma) ** 2 for x in window) / period
-                std_dev = variance ** 0.5
-                return ma + std_dev * std_mult, ma - std_dev * std_mult
- 
-            ma20 = calc_ma(closes, 20)
-            ma50 = calc_ma(closes, 50)
-            bb_upper, bb_lower = calc_bb(closes, 20, 2)
+        if sig is not None and sig["n_bars"] > 5:
+ 
+            latest_price = sig["close"]
+            day_change = opt_num(sig["change_1d"])
+            one_month_change = opt_num(sig["change_1m"])
+            three_month_change = opt_num(sig["change_3m"])
+            one_year_change = opt_num(sig["change_12m"])
+ 
+            # ===== MA / BB (from the signal table) =====
+            ma20 = opt_num(sig["ma20"])
+            ma50 = opt_num(sig["ma50"])
+            bb_upper = opt_num(sig["bb_upper"])
+            bb_lower = opt_num(sig["bb_lower"])
  
             ma20_line = "N/A (fewer than 20 trading days of history)"
             ma50_line = "N/A (fewer than 50 trading days of history)"
@@ -635,8 +637,7 @@ def build_company_insights(companies, financials, stocks, companies_map):
                 "State this briefly."
             )
  
-        stock_insight = call_groq(prompt, max_tokens=200)
-        result[ticker]["stock"] = stock_insight
+        result[ticker]["stock"] = submit_groq(prompt, max_tokens=200)
  
         # --- Executive Summary ---
         for period in REPORT_TYPES:
@@ -661,11 +662,10 @@ def build_company_insights(companies, financials, stocks, companies_map):
             latest = fin.iloc[-1]
             prev = fin.iloc[-2] if len(fin) > 1 else None
  
-            latest_stock = stk.iloc[-1] if not stk.empty else None
-            stock_1m_ago = stk.iloc[max(0, len(stk) - 21)] if not stk.empty else None
+            latest_close = sig["close"] if sig is not None else None
             stock_price_change = (
-                pct_change(latest_stock["close"], stock_1m_ago["close"])
-                if latest_stock is not None and stock_1m_ago is not None
+                pct_change(latest_close, sig["close_1m_ago"])
+                if sig is not None
                 else None
             )
  
@@ -685,7 +685,7 @@ def build_company_insights(companies, financials, stocks, companies_map):
             )
  
             stock_close_str = (
-                f"{latest_stock['close']:.2f} USD" if latest_stock is not None else "N/A"
+                f"{latest_close:.2f} USD" if latest_close is not None else "N/A"
             )
  
             prompt = (
@@ -719,8 +719,7 @@ def build_company_insights(companies, financials, stocks, companies_map):
                 "Tone: suitable for an investor dashboard. "
                 "Note: for BAC and JPM, do not mention current ratio because they are banks."
             )
-            exec_summary = call_groq(prompt, max_tokens=300)
-            result[ticker][period] = {"executive_summary": exec_summary}
+            result[ticker][period] = {"executive_summary": submit_groq(prompt, max_tokens=300)}
  
     result["_generated_at"] = datetime.now(timezone.utc).isoformat()
     return result
@@ -735,19 +734,42 @@ def main():
         print("WARNING: GROQ_API_KEY not set. Writing placeholder insights.")
  
     companies, financials, stocks, companies_map = load_data()
- 
-    global_insights = build_global_insights(companies, financials, stocks, companies_map)
-    global_path = os.path.join(DATA_CLEANED_DIR, "insights_global.json")
-    with open(global_path, "w", encoding="utf-8") as f:
-        json.dump(global_insights, f, ensure_ascii=False, indent=2)
-    print(f"Saved: {global_path}")
- 
-    company_insights = build_company_insights(companies, financials, stocks, companies_map)
-    company_path = os.path.join(DATA_CLEANED_DIR, "insights_company.json")
-    with open(company_path, "w", encoding="utf-8") as f:
-        json.dump(company_insights, f, ensure_ascii=False, indent=2)
-    print(f"Saved: {company_path}")
- 
+    started = time.perf_counter()
+
+    try:
+        # Submit every prompt for both dashboards first, then wait for the results
+        global_pending = build_global_insights(companies, financials, stocks, companies_map)
+        company_pending = build_company_insights(companies, financials, stocks, companies_map)
+
+        global_insights = collect(global_pending)
+        global_path = os.path.join(DATA_CLEANED_DIR, "insights_global.json")
+        with open(global_path, "w", encoding="utf-8") as f:
+            json.dump(global_insights, f, ensure_ascii=False, indent=2)
+        print(f"Saved: {global_path}")
+
+        company_insights = collect(company_pending)
+        company_path = os.path.join(DATA_CLEANED_DIR, "insights_company.json")
+        with open(company_path, "w", encoding="utf-8") as f:
+            json.dump(company_insights, f, ensure_ascii=False, indent=2)
+        print(f"Saved: {company_path}")
+    finally:
+        # The prompt cache is saved even when the stage fails, so a rerun
+        # (run_state.py) only pays for the insights that were not generated yet
+        stats = close_client()
+        for key in ('calls', 'http_requests', 'retries', 'rate_limited', 'failures', 'cache_hits', 'cache_misses'):
+            if stats and key in stats:
+                instrument.count(f'groq.{key}', stats[key])
+    if stats:
+        print(
+            f"Groq: {stats['calls']} uncached insights, {stats['http_requests']} HTTP requests, "
+            f"{stats['retries']} retries, {stats['rate_limited']} rate-limited, "
+            f"{stats['failures']} failed in {time.perf_counter() - started:.1f}s"
+        )
+        if 'cache_hits' in stats:
+            print(
+                f"Prompt cache: {stats['cache_hits']} hits / {stats['cache_misses']} misses "
+                f"({stats['cache_hit_ratio']:.0%} hit ratio, {stats['cache_hits']} Groq calls saved)"
+            )
     print("--- AI Insights Generation Complete ---")
  
  
@@ -0,0 +1,213 @@
+# backend/etl/groq_client.py
+# Author: Hoang Son Lai
+#
+# Concurrent client for Groq's OpenAI-compatible chat completions API.
+#
+# Prompts are submitted up front and run on a small thread pool; each call
+# first takes from two shared token buckets (requests/minute and
+# tokens/minute), so the batch stays under the account limits without a
+# fixed sleep after every call. The limits adapt to the x-ratelimit-*
+# headers Groq returns: when the remaining budget runs out, every worker
+# pauses until the advertised reset. 429/5xx/network errors are retried with
+# jittered exponential backoff (or Retry-After when Groq sends it).
+#
+# The endpoint URL is a constructor argument, so the client can be pointed
+# at a local stub server. An optional PromptCache (prompt_cache.py) is
+# consulted before queueing: a hit resolves immediately without touching
+# the rate limiter or the network, and only successful completions are
+# stored back.
+
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import requests
+from rate_limiter import TokenBucket
+
+UNAVAILABLE = "Insight temporarily unavailable."
+NO_KEY = "Insight unavailable (GROQ_API_KEY not configured)."
+
+_DURATION_RE = re.compile(r'(?:(\d+(?:\.\d+)?)h)?(?:(\d+(?:\.\d+)?)m(?!s))?(?:(\d+(?:\.\d+)?)s)?(?:(\d+(?:\.\d+)?)ms)?$')
+
+
+def parse_reset(value):
+    """Parses Groq reset headers like '2m59.56s', '7.66s', '250ms' or '12' into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    m = _DURATION_RE.match(value)
+    if not m or not any(m.groups()):
+        return None
+    h, mins, secs, ms = (float(g) if g else 0.0 for g in m.groups())
+    return h * 3600 + mins * 60 + secs + ms / 1000
+
+
+def estimate_tokens(text, max_tokens):
+    """Rough prompt size (~4 chars/token) plus the completion budget."""
+    return len(text) // 4 + max_tokens
+
+
+def _resolved(value):
+    done = Future()
+    done.set_result(value)
+    return done
+
+
+class GroqClient:
+    def __init__(self, api_key, model, system_prompt, url,
+                 max_concurrency=4, rpm=30, tpm=0, max_retries=4,
+                 backoff_base=1.0, backoff_cap=30.0, timeout=30, cache=None):
+        self.api_key = api_key
+        self.cache = cache
+        self.model = model
+        self.system_prompt = system_prompt
+        self.url = url
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+
+        self._requests = TokenBucket(rpm / 60.0, capacity=max(1, max_concurrency))
+        # tpm=0 disables the client-side token budget (the header adaptation still applies)
+        self._tokens = TokenBucket(tpm / 60.0, capacity=tpm) if tpm else None
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix='groq')
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+
+        self.stats = {'calls': 0, 'http_requests': 0, 'retries': 0, 'rate_limited': 0, 'failures': 0}
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def submit(self, user_prompt, max_tokens=120):
+        """Queue one completion; returns a Future resolving to the insight text."""
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(self.model, self.system_prompt, user_prompt, max_tokens)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return _resolved(cached)
+        if not self.api_key:
+            return _resolved(NO_KEY)
+        return self._pool.submit(self._complete, user_prompt, max_tokens, key)
+
+    def complete(self, user_prompt, max_tokens=120):
+        return self.submit(user_prompt, max_tokens).result()
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _payload(self, user_prompt, max_tokens):
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "max_tokens": max_tokens,
+            "temperature": 0.4,
+        }
+        # gpt-oss models reason before answering; without capping effort, reasoning
+        # tokens can eat the whole max_tokens budget and leave content empty.
+        if "gpt-oss" in self.model:
+            payload["reasoning_effort"] = "low"
+        return payload
+
+    def _pause(self, seconds):
+        """Stop every worker from sending until `seconds` from now."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _wait_if_paused(self):
+        while True:
+            with self._lock:
+                remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def _backoff(self, attempt):
+        # "Full jitter": uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def _adapt(self, headers, needed_tokens):
+        """Pause everyone until the reset time when the advertised budget is exhausted."""
+        remaining_req = headers.get('x-ratelimit-remaining-requests')
+        remaining_tok = headers.get('x-ratelimit-remaining-tokens')
+        if remaining_req is not None and remaining_req.isdigit() and int(remaining_req) == 0:
+            wait = parse_reset(headers.get('x-ratelimit-reset-requests'))
+            if wait:
+                self._pause(wait)
+        if remaining_tok is not None and remaining_tok.isdigit() and int(remaining_tok) < needed_tokens:
+            wait = parse_reset(headers.get('x-ratelimit-reset-tokens'))
+            if wait:
+                self._pause(wait)
+
+    def _complete(self, user_prompt, max_tokens, cache_key=None):
+        payload = self._payload(user_prompt, max_tokens)
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        needed = estimate_tokens(self.system_prompt + user_prompt, max_tokens)
+        with self._lock:
+            self.stats['calls'] += 1
+
+        for attempt in range(self.max_retries):
+            self._wait_if_paused()
+            self._requests.acquire()
+            if self._tokens is not None:
+                self._tokens.acquire(needed)
+            with self._lock:
+                self.stats['http_requests'] += 1
+                if attempt:
+                    self.stats['retries'] += 1
+            try:
+                resp = self._session().post(self.url, headers=headers, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                print(f"  Request failed: {e}")
+                time.sleep(self._backoff(attempt))
+                continue
+
+            self._adapt(resp.headers, needed)
+            if resp.status_code == 200:
+                try:
+                    content = resp.json()["choices"][0]["message"]["content"].strip()
+                except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+                    print(f"  Malformed Groq response: {e}")
+                    time.sleep(self._backoff(attempt))
+                    continue
+                content = content.replace("—", "-").replace("–", "-")
+                if cache_key is not None and content:
+                    self.cache.put(cache_key, content)
+                return content
+
+            if resp.status_code == 429:
+                with self._lock:
+                    self.stats['rate_limited'] += 1
+                # Honor Retry-After if Groq sends it, otherwise jittered exponential backoff.
+                wait = parse_reset(resp.headers.get("Retry-After")) or self._backoff(attempt)
+                print(f"  Rate limited, waiting {wait:.1f}s...")
+                self._pause(wait)
+            else:
+                print(f"  Groq error {resp.status_code}: {resp.text[:200]}")
+                time.sleep(self._backoff(attempt))
+
+        with self._lock:
+            self.stats['failures'] += 1
+        return UNAVAILABLE
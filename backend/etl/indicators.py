@@ -0,0 +1,189 @@
+# backend/etl/indicators.py
+# Author: Hoang Son Lai
+#
+# Vectorised technical indicators for every ticker at once.
+#
+# Both entry points take the cleaned price frame (ticker, date, high, low,
+# close, ...) and work on one sort by (ticker, date) with grouped pandas
+# operations, so there is no per-ticker Python loop:
+#
+#   compute_series(prices)  -> one row per bar with MA20/MA50, Bollinger
+#                              Bands, RSI14, MACD(12,26,9), ATR14 and
+#                              20-day volatility (chart overlays).
+#   compute_signals(prices) -> one row per ticker with the latest close,
+#                              1D/1M/3M/12M changes and the latest value of
+#                              every indicator (what the insight prompts use).
+#   compute_overlays(prices)-> one row per bar with the company dashboard's
+#                              chart overlays (MA20/50/200, EMA12/26,
+#                              Bollinger Bands), computed the way its JS
+#                              calculateMA / calculateEMA / calculateBB do.
+#
+# Conventions match the original build_company_insights: periods are in
+# trading bars (1M = 21, 3M = 63, 12M = 252, clamped to the first bar),
+# MAs are simple means of the last N closes, Bollinger Bands use the
+# population standard deviation (ddof=0), and a value is NaN when there is
+# not enough history.
+
+import numpy as np
+import pandas as pd
+
+MA_SHORT = 20
+MA_LONG = 50
+MA_TREND = 200
+EMA_FAST, EMA_SLOW = 12, 26
+BB_PERIOD = 20
+BB_STD_MULT = 2
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+VOL_PERIOD = 20
+TRADING_DAYS = 252
+
+# Look-back (in bars) for each performance window
+CHANGE_WINDOWS = {'1d': 1, '1m': 20, '3m': 62, '12m': 251}
+
+
+def _sorted(prices):
+    return prices.sort_values(['ticker', 'date'], kind='mergesort').reset_index(drop=True)
+
+
+def _grouped_ewm_mean(values, keys, **ewm_kwargs):
+    """Per-ticker EWM mean, returned aligned to the original (flat) index."""
+    out = values.groupby(keys, sort=False, observed=True).ewm(**ewm_kwargs).mean()
+    return out.reset_index(level=0, drop=True).sort_index()
+
+
+def _wilder_rsi(close, keys, period=RSI_PERIOD):
+    delta = close.groupby(keys, sort=False, observed=True).diff()
+    gain = delta.clip(lower=0)
+    loss = -delta.clip(upper=0)
+    avg_gain = _grouped_ewm_mean(gain, keys, alpha=1 / period, adjust=False, min_periods=period)
+    avg_loss = _grouped_ewm_mean(loss, keys, alpha=1 / period, adjust=False, min_periods=period)
+    rs = avg_gain / avg_loss.replace(0, np.nan)
+    rsi = 100 - 100 / (1 + rs)
+    # No losses at all over the window -> RSI is 100 by definition
+    return rsi.mask(avg_loss.eq(0) & avg_gain.notna(), 100.0)
+
+
+def _macd(close, keys):
+    ema_fast = _grouped_ewm_mean(close, keys, span=MACD_FAST, adjust=False)
+    ema_slow = _grouped_ewm_mean(close, keys, span=MACD_SLOW, adjust=False)
+    macd = ema_fast - ema_slow
+    signal = _grouped_ewm_mean(macd, keys, span=MACD_SIGNAL, adjust=False)
+    return macd, signal
+
+
+def _atr(df, keys, period=ATR_PERIOD):
+    prev_close = df['close'].groupby(keys, sort=False, observed=True).shift(1)
+    true_range = pd.concat([
+        df['high'] - df['low'],
+        (df['high'] - prev_close).abs(),
+        (df['low'] - prev_close).abs(),
+    ], axis=1).max(axis=1, skipna=True)
+    return _grouped_ewm_mean(true_range, keys, alpha=1 / period, adjust=False, min_periods=period)
+
+
+def compute_series(prices):
+    """Per-bar indicator series for all tickers (sorted by ticker, date)."""
+    df = _sorted(prices)
+    keys = df['ticker']
+    close = df['close']
+    grouped = close.groupby(keys, sort=False, observed=True)
+
+    df['ma20'] = grouped.rolling(MA_SHORT).mean().reset_index(level=0, drop=True)
+    df['ma50'] = grouped.rolling(MA_LONG).mean().reset_index(level=0, drop=True)
+    bb_std = grouped.rolling(BB_PERIOD).std(ddof=0).reset_index(level=0, drop=True)
+    bb_mid = df['ma20'] if BB_PERIOD == MA_SHORT else (
+        grouped.rolling(BB_PERIOD).mean().reset_index(level=0, drop=True)
+    )
+    df['bb_upper'] = bb_mid + BB_STD_MULT * bb_std
+    df['bb_lower'] = bb_mid - BB_STD_MULT * bb_std
+
+    df['rsi14'] = _wilder_rsi(close, keys)
+    df['macd'], df['macd_signal'] = _macd(close, keys)
+    df['macd_hist'] = df['macd'] - df['macd_signal']
+    if {'high', 'low'}.issubset(df.columns):
+        df['atr14'] = _atr(df, keys)
+
+    log_ret = np.log(close.where(close > 0)).groupby(keys, sort=False, observed=True).diff()
+    df['volatility_20'] = (
+        log_ret.groupby(keys, sort=False, observed=True).rolling(VOL_PERIOD).std()
+        .reset_index(level=0, drop=True) * np.sqrt(TRADING_DAYS)
+    )
+    return df
+
+
+def _sma_seeded_ema(close, keys, pos, period):
+    """EMA whose first value (bar period - 1) is the SMA of the first `period` closes."""
+    seed = close.groupby(keys, sort=False, observed=True).rolling(period).mean().reset_index(level=0, drop=True)
+    start = close.where(pos >= period).mask(pos == period - 1, seed)
+    return _grouped_ewm_mean(start, keys, span=period, adjust=False)
+
+
+def compute_overlays(prices):
+    """Per-bar overlay series for all tickers (sorted by ticker, date), NaN before enough bars."""
+    df = _sorted(prices)
+    keys = df['ticker']
+    close = df['close']
+    grouped = close.groupby(keys, sort=False, observed=True)
+    pos = grouped.cumcount()
+
+    for period in (MA_SHORT, MA_LONG, MA_TREND):
+        df[f'ma{period}'] = grouped.rolling(period).mean().reset_index(level=0, drop=True)
+    for period in (EMA_FAST, EMA_SLOW):
+        df[f'ema{period}'] = _sma_seeded_ema(close, keys, pos, period)
+    bb_mid = grouped.rolling(BB_PERIOD).mean().reset_index(level=0, drop=True)
+    bb_std = grouped.rolling(BB_PERIOD).std(ddof=0).reset_index(level=0, drop=True)
+    df['bb_upper'] = bb_mid + BB_STD_MULT * bb_std
+    df['bb_lower'] = bb_mid - BB_STD_MULT * bb_std
+    return df
+
+
+def _window_stats(df, period):
+    """Mean and population std of the last `period` closes per ticker (NaN if shorter)."""
+    tail = df.groupby('ticker', sort=False, observed=True).tail(period)
+    g = tail.groupby('ticker', sort=False, observed=True)['close']
+    n = g.size()
+    mean = g.mean().where(n >= period)
+    std = g.std(ddof=0).where(n >= period)
+    return mean, std
+
+
+def compute_signals(prices):
+    """One row per ticker with the latest close, period changes and indicator values."""
+    series = compute_series(prices)
+    g = series.groupby('ticker', sort=False, observed=True)
+    pos = g.cumcount()
+    n_bars = g.size()
+
+    last = g.tail(1).set_index('ticker')
+    signals = pd.DataFrame(index=last.index)
+    signals['n_bars'] = n_bars
+    signals['date'] = last['date']
+    signals['close'] = last['close']
+
+    # Close N bars before the latest one, clamped to the first bar (like iloc[max(0, n - k)])
+    last_idx = g.tail(1).index
+    first_close = g['close'].transform('first')
+    for label, bars in CHANGE_WINDOWS.items():
+        ref = g['close'].shift(bars)
+        if label != '1d':  # a single bar has no previous day, but longer windows clamp
+            ref = ref.where(pos >= bars, first_close)
+        ref = ref.loc[last_idx].set_axis(last.index)
+        signals[f'close_{label}_ago'] = ref
+        base = ref.where(ref > 0)
+        signals[f'change_{label}'] = (signals['close'] - base) / base * 100
+
+    # Window statistics over exactly the last N closes, like sum(x[-N:]) / N
+    ma20, std20 = _window_stats(series, MA_SHORT)
+    ma50, _ = _window_stats(series, MA_LONG)
+    signals['ma20'] = ma20
+    signals['ma50'] = ma50
+    signals['bb_upper'] = ma20 + BB_STD_MULT * std20
+    signals['bb_lower'] = ma20 - BB_STD_MULT * std20
+
+    for col in ['rsi14', 'macd', 'macd_signal', 'macd_hist', 'atr14', 'volatility_20']:
+        if col in last.columns:
+            signals[col] = last[col]
+
+    return signals
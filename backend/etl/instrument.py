@@ -0,0 +1,426 @@
+# backend/etl/instrument.py
+# Author: Hoang Son Lai
+#
+# Shared timing / counter / memory instrumentation for the ETL, and the run
+# report it produces.
+#
+#   with instrument.stage('clean_prices'):    # one per DAG node (dag.py)
+#       with instrument.span('fetch:AAPL'):   # optional child spans
+#           instrument.count('yahoo.requests')
+#
+# - Stages record start / end (seconds since the run started), status and
+#   RSS at start, end and peak; a daemon thread samples the RSS of the
+#   process every INSTRUMENT_RSS_INTERVAL seconds while a stage is open.
+#   Stages run concurrently, so a stage's peak is the process peak while it
+#   was running (it includes whatever ran beside it).
+# - Counters (rows read/written, HTTP calls, retries, 429s, ...) are summed
+#   per stage: the current stage lives in a contextvar, and thread pools
+#   inside a stage submit instrument.propagate(fn) so their work counts
+#   towards it. Names are "<source>.<what>", e.g. yahoo.requests,
+#   groq.rate_limited, supabase.rows_sent, rows_written.stock_prices.
+#
+# run_dag writes one report per run to data/reports/<pipeline>_<run_id>.json
+# (stages, child spans, counters, critical path, process peak RSS, plus the
+# spans as Chrome trace events for chrome://tracing / Perfetto). The newest
+# ETL_REPORT_KEEP reports per pipeline are kept; the daily workflow commits
+# them with the data, so nights can be compared:
+#
+#   python instrument.py                         # two newest 'daily' reports
+#   python instrument.py OLD.json NEW.json --threshold 0.25
+#
+# which prints the per-stage differences and exits with status 1 when a
+# stage got slower or used more memory than the thresholds, failed where it
+# used to pass, or an error counter (errors, retries, rate_limited,
+# failures, fallbacks) went up.
+
+import argparse
+import contextvars
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from config import DATA_REPORTS_DIR, ETL_REPORT_KEEP, INSTRUMENT_RSS_INTERVAL
+
+_stage = contextvars.ContextVar('etl_stage', default=None)
+
+PROBLEM_COUNTERS = ('errors', 'retries', 'rate_limited', 'failures', 'fallbacks')
+
+
+# ----------------------------------------------------------------------
+# Memory
+# ----------------------------------------------------------------------
+def rss_kb():
+    """Current resident set size of this process (Linux /proc; ru_maxrss elsewhere)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def peak_rss_kb():
+    """High-water RSS of this process (VmHWM, as in bench_storage.py)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _mb(kb):
+    return round(kb / 1024, 1)
+
+
+# ----------------------------------------------------------------------
+# Recorder
+# ----------------------------------------------------------------------
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sampler = None
+        self.reset()
+
+    def reset(self):
+        """Starts a new run: clears spans and counters, time origin = now."""
+        with self._lock:
+            self.origin = time.perf_counter()
+            self.started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+            self.stages = {}
+            self.spans = []
+            self.counters = defaultdict(Counter)
+            self._open = set()
+
+    def _ensure_sampler(self):
+        if self._sampler is None or not self._sampler.is_alive():
+            self._sampler = threading.Thread(target=self._sample, name='rss-sampler', daemon=True)
+            self._sampler.start()
+
+    def _sample(self):
+        while True:
+            rss = rss_kb()
+            with self._lock:
+                for name in self._open:
+                    rec = self.stages[name]
+                    rec['rss_peak_kb'] = max(rec['rss_peak_kb'], rss)
+            time.sleep(INSTRUMENT_RSS_INTERVAL)
+
+    def _seconds(self, t):
+        return round(t - self.origin, 3)
+
+    def open_stage(self, name):
+        rss = rss_kb()
+        with self._lock:
+            self.stages[name] = {
+                'status': 'running', 'start': self._seconds(time.perf_counter()),
+                'rss_start_kb': rss, 'rss_peak_kb': rss, 'thread': threading.current_thread().name,
+            }
+            self._open.add(name)
+        self._ensure_sampler()
+
+    def close_stage(self, name, status, error=None):
+        rss = rss_kb()
+        with self._lock:
+            self._open.discard(name)
+            rec = self.stages[name]
+            rec['end'] = self._seconds(time.perf_counter())
+            rec['seconds'] = round(rec['end'] - rec['start'], 3)
+            rec['rss_end_kb'] = rss
+            rec['rss_peak_kb'] = max(rec['rss_peak_kb'], rss)
+            rec['status'] = status
+            if error:
+                rec['error'] = error
+
+    def add_stage(self, name, status):
+        """A stage that never started (e.g. blocked by a failed dependency)."""
+        now = self._seconds(time.perf_counter())
+        with self._lock:
+            self.stages[name] = {'status': status, 'start': now, 'end': now, 'seconds': 0.0}
+
+    def add_span(self, name, parent, start, end, status):
+        with self._lock:
+            self.spans.append({
+                'name': name, 'parent': parent,
+                'start': self._seconds(start), 'end': self._seconds(end),
+                'seconds': round(end - start, 3), 'status': status,
+                'thread': threading.current_thread().name,
+            })
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[_stage.get()][name] += n
+
+
+recorder = Recorder()
+
+
+def reset():
+    recorder.reset()
+
+
+@contextmanager
+def stage(name):
+    """Times one stage; counters incremented inside it (or in propagated threads) are attributed to it.
+
+    Yields a dict: set result['status'] = 'skipped' when the stage had nothing to do.
+    """
+    token = _stage.set(name)
+    recorder.open_stage(name)
+    result = {'status': 'ok'}
+    try:
+        yield result
+    except BaseException as e:
+        recorder.close_stage(name, 'failed', f"{type(e).__name__}: {e}")
+        raise
+    else:
+        recorder.close_stage(name, result['status'])
+    finally:
+        _stage.reset(token)
+
+
+@contextmanager
+def span(name):
+    """Times a piece of work inside the current stage (recorded as its child span)."""
+    started = time.perf_counter()
+    status = 'ok'
+    try:
+        yield
+    except BaseException:
+        status = 'failed'
+        raise
+    finally:
+        recorder.add_span(name, _stage.get(), started, time.perf_counter(), status)
+
+
+def count(name, n=1):
+    """Adds n to a counter of the current stage ('<source>.<what>')."""
+    if n:
+        recorder.count(name, n)
+
+
+def propagate(fn):
+    """Wraps fn to run in a copy of the current context (stage), for ThreadPoolExecutor.submit.
+
+    A context can only be entered by one thread at a time: wrap once per submit.
+    """
+    ctx = contextvars.copy_context()
+    return functools.partial(ctx.run, fn)
+
+
+# ----------------------------------------------------------------------
+# Report
+# ----------------------------------------------------------------------
+def critical_path(stages, deps):
+    """Chain of dependent stages with the largest total duration (what bounds the run time)."""
+    best = {}
+
+    def longest(name):
+        if name not in best:
+            prev = max((longest(d) for d in deps.get(name, [])), key=lambda p: p[0], default=(0.0, []))
+            best[name] = (prev[0] + stages.get(name, {}).get('seconds', 0.0), prev[1] + [name])
+        return best[name]
+
+    for name in deps:
+        longest(name)
+    return max(best.values(), key=lambda p: p[0])[1] if best else []
+
+
+def build_report(pipeline, run_id, deps, workers, status):
+    """The run as a JSON-ready dict (deps: {stage: [dependencies]} in declaration order)."""
+    with recorder._lock:
+        raw = {name: dict(rec) for name, rec in recorder.stages.items()}
+        spans = sorted((dict(s) for s in recorder.spans), key=lambda s: (s['start'], s['name']))
+        counters = {stage: dict(c) for stage, c in recorder.counters.items()}
+        total = round(time.perf_counter() - recorder.origin, 3)
+        started_at = recorder.started_at
+
+    stages = {}
+    for name in list(deps) + [n for n in raw if n not in deps]:
+        if name not in raw:
+            continue
+        rec = raw[name]
+        out = {k: rec[k] for k in ('status', 'start', 'end', 'seconds') if k in rec}
+        for key in ('rss_start', 'rss_end', 'rss_peak'):
+            if f'{key}_kb' in rec:
+                out[f'{key}_mb'] = _mb(rec[f'{key}_kb'])
+        out['deps'] = deps.get(name, [])
+        out['counters'] = dict(sorted(counters.get(name, {}).items()))
+        for key in ('thread', 'error'):
+            if key in rec:
+                out[key] = rec[key]
+        stages[name] = out
+
+    totals = Counter()
+    for c in counters.values():
+        totals.update(c)
+
+    threads = {}
+    events = []
+    for name, rec in stages.items():
+        events.append({
+            'name': name, 'cat': 'stage', 'ph': 'X', 'ts': int(rec['start'] * 1e6), 'dur': int(rec['seconds'] * 1e6),
+            'pid': 1, 'tid': threads.setdefault(rec.get('thread', name), len(threads) + 1),
+            'args': {'status': rec['status'], **rec['counters']},
+        })
+    for s in spans:
+        events.append({
+            'name': s['name'], 'cat': s['parent'] or 'span', 'ph': 'X', 'ts': int(s['start'] * 1e6),
+            'dur': int(s['seconds'] * 1e6), 'pid': 1, 'tid': threads.setdefault(s['thread'], len(threads) + 1),
+            'args': {'status': s['status']},
+        })
+
+    return {
+        'pipeline': pipeline,
+        'run_id': run_id,
+        'started_at': started_at,
+        'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'status': status,
+        'seconds': total,
+        'workers': workers,
+        'peak_rss_mb': _mb(peak_rss_kb()),
+        'critical_path': critical_path(stages, deps),
+        'stages': stages,
+        'counters': dict(sorted(totals.items())),
+        'spans': spans,
+        'traceEvents': events,
+    }
+
+
+def write_report(report):
+    os.makedirs(DATA_REPORTS_DIR, exist_ok=True)
+    prefix = f"{report['pipeline']}_"
+    path = os.path.join(DATA_REPORTS_DIR, f"{prefix}{report['run_id']}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    if ETL_REPORT_KEEP > 0:
+        for name in report_files(report['pipeline'])[:-ETL_REPORT_KEEP]:
+            os.remove(os.path.join(DATA_REPORTS_DIR, name))
+    return path
+
+
+def report_files(pipeline):
+    """Report file names of a pipeline, oldest first (run ids are timestamps)."""
+    if not os.path.isdir(DATA_REPORTS_DIR):
+        return []
+    return sorted(f for f in os.listdir(DATA_REPORTS_DIR) if f.startswith(f'{pipeline}_') and f.endswith('.json'))
+
+
+def print_timeline(report, width=50):
+    total = report['seconds'] or 1e-9
+    print(f"\n--- Timeline ({report['seconds']:.1f}s, {report['workers']} workers, "
+          f"peak RSS {report['peak_rss_mb']:.0f} MB) ---")
+    for name, s in sorted(report['stages'].items(), key=lambda kv: kv[1]['start']):
+        left = int(s['start'] / total * width)
+        bar = '#' * max(1, int(s['seconds'] / total * width)) if s['status'] == 'ok' else '.'
+        rss = f"{s['rss_peak_mb']:>6.0f} MB" if 'rss_peak_mb' in s else ' ' * 9
+        print(f"  {name:<20} {s['status']:<8} {s['start']:>7.1f}s +{s['seconds']:>6.1f}s {rss} |{' ' * left}{bar}")
+    print(f"  Critical path: {' -> '.join(report['critical_path'])}")
+    problems = {k: v for k, v in report['counters'].items() if _is_problem(k)}
+    if problems:
+        print(f"  Problems: {', '.join(f'{k}={v}' for k, v in problems.items())}")
+
+
+# ----------------------------------------------------------------------
+# Compare CLI
+# ----------------------------------------------------------------------
+def _fmt(value, digits):
+    return f"{value:.{digits}f}" if value is not None else '-'
+
+
+def _is_problem(counter):
+    return counter.rsplit('.', 1)[-1].endswith(PROBLEM_COUNTERS)
+
+
+def compare(old, new, threshold=0.25, min_seconds=1.0, min_mb=20.0):
+    """Returns (lines, regressions) describing how `new` differs from `old`."""
+    lines, regressions = [], []
+
+    def grew(a, b, floor):
+        return a is not None and b is not None and b - a >= floor and b > a * (1 + threshold)
+
+    header = f"{'stage':<22} {'status':>16} {'seconds':>20} {'peak RSS MB':>18}"
+    lines.append(header)
+    lines.append('-' * len(header))
+    for name in list(new['stages']) + [n for n in old['stages'] if n not in new['stages']]:
+        a, b = old['stages'].get(name, {}), new['stages'].get(name, {})
+        sa, sb = a.get('status', '-'), b.get('status', '-')
+        ta, tb = a.get('seconds'), b.get('seconds')
+        ma, mb = a.get('rss_peak_mb'), b.get('rss_peak_mb')
+        flags = []
+        if sa == 'ok' and sb == 'failed':
+            flags.append('FAILED')
+            regressions.append(f"{name}: ok -> failed ({b.get('error', '')})")
+        if sa == 'ok' and sb == 'ok' and grew(ta, tb, min_seconds):
+            flags.append('SLOWER')
+            regressions.append(f"{name}: {ta:.1f}s -> {tb:.1f}s")
+        if grew(ma, mb, min_mb):
+            flags.append('MEMORY')
+            regressions.append(f"{name}: peak RSS {ma:.0f} -> {mb:.0f} MB")
+        lines.append(f"{name:<22} {sa + ' -> ' + sb:>16} {_fmt(ta, 1) + ' -> ' + _fmt(tb, 1):>20} "
+                     f"{_fmt(ma, 0) + ' -> ' + _fmt(mb, 0):>18}  {' '.join(flags)}")
+
+    flag = ''
+    if old['status'] == 'ok' and new['status'] == 'ok' and grew(old['seconds'], new['seconds'], min_seconds):
+        flag = 'SLOWER'
+        regressions.append(f"total: {old['seconds']:.1f}s -> {new['seconds']:.1f}s")
+    lines.append(f"{'total':<22} {old['status'] + ' -> ' + new['status']:>16} "
+                 f"{_fmt(old['seconds'], 1) + ' -> ' + _fmt(new['seconds'], 1):>20} "
+                 f"{_fmt(old['peak_rss_mb'], 0) + ' -> ' + _fmt(new['peak_rss_mb'], 0):>18}  {flag}")
+
+    changed = []
+    for key in sorted(set(old['counters']) | set(new['counters'])):
+        a, b = old['counters'].get(key, 0), new['counters'].get(key, 0)
+        if _is_problem(key) and b > a:
+            regressions.append(f"{key}: {a} -> {b}")
+            changed.append(f"  {key:<40} {a:>10} -> {b:<10} UP")
+        elif a != b and (not a or abs(b - a) / a > threshold):
+            changed.append(f"  {key:<40} {a:>10} -> {b:<10}")
+    if changed:
+        lines.append("\nCounters that changed:")
+        lines.extend(changed)
+    return lines, regressions
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two ETL run reports and flag regressions.")
+    parser.add_argument('reports', nargs='*', help="OLD.json NEW.json (default: the two newest of --pipeline)")
+    parser.add_argument('--pipeline', default='daily', help="daily, phase1 or phase2 (default: daily)")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Relative increase flagged as a regression (default: 0.25)")
+    parser.add_argument('--min-seconds', type=float, default=1.0, help="Ignore slowdowns smaller than this")
+    parser.add_argument('--min-mb', type=float, default=20.0, help="Ignore peak RSS increases smaller than this")
+    args = parser.parse_args(argv)
+
+    if args.reports and len(args.reports) != 2:
+        parser.error("give two reports (OLD NEW) or none")
+    paths = args.reports or [os.path.join(DATA_REPORTS_DIR, f) for f in report_files(args.pipeline)[-2:]]
+    if len(paths) < 2:
+        print(f"Need two reports to compare; found {len(paths)} for '{args.pipeline}' in {DATA_REPORTS_DIR}.")
+        return 2
+    old, new = (load_report(p) for p in paths)
+    print(f"Old: {old['run_id']} ({old['status']}, {old['seconds']:.1f}s)  {paths[0]}")
+    print(f"New: {new['run_id']} ({new['status']}, {new['seconds']:.1f}s)  {paths[1]}\n")
+    lines, regressions = compare(old, new, args.threshold, args.min_seconds, args.min_mb)
+    print('\n'.join(lines))
+    if regressions:
+        print(f"\nREGRESSIONS ({len(regressions)}):\n  " + "\n  ".join(regressions))
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+# backend/etl/load_manifest.py
+# Author: Hoang Son Lai
+#
+# Per-row content hashes of what was last loaded into each database, so the
+# loader only ships rows that are new or changed since the previous run.
+#
+# One manifest per target (data/cache/load_manifest_<target>.json):
+#   {"db": "<sha256 of host:port/database>", "tables": {table: {"<key>": "<hash>"}}}
+# The manifest is committed to the public repo, so only a hash of the
+# database id (which comes from Actions secrets) is stored or printed.
+# Keys join the table's key columns ("AAPL|2025-01-02"); hashes are
+# hash_pandas_object over the non-key columns rounded to the DB scale, so
+# float noise below the stored precision does not count as a change.
+# A table's entries are only replaced after its load transaction committed,
+# and the file is written atomically (tmp + os.replace). If the manifest was
+# written for another database, it is ignored and everything is sent.
+
+import hashlib
+import json
+import os
+import pandas as pd
+from config import DATA_CACHE_DIR
+from storage import TABLES
+
+RATIO_SCALE = 4  # DECIMAL(10, 4) ratio columns in schema.sql
+
+
+def manifest_path(target):
+    return os.path.join(DATA_CACHE_DIR, f'load_manifest_{target}.json')
+
+
+def db_hash(db):
+    return hashlib.sha256(str(db).encode('utf-8')).hexdigest()
+
+
+def row_keys(df, keys):
+    out = df[keys[0]].astype(str)
+    for col in keys[1:]:
+        out = out + '|' + df[col].astype(str)
+    return out
+
+
+def row_hashes(df, table, keys):
+    values = df.drop(columns=keys)
+    decimals = TABLES.get(table, {}).get('decimals', {})
+    for col in values.columns:
+        if pd.api.types.is_float_dtype(values[col]):
+            scale = decimals.get(col, (None, RATIO_SCALE))[1]
+            values[col] = values[col].round(scale)
+    return pd.util.hash_pandas_object(values, index=False).map('{:016x}'.format)
+
+
+class LoadManifest:
+    def __init__(self, target, db, path=None):
+        self.path = path or manifest_path(target)
+        self.db = db_hash(db)
+        self.tables = self._load(db)
+
+    def _load(self, db):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"  Ignoring unreadable load manifest {self.path}: {e}")
+            return {}
+        # Manifests written before the id was hashed hold it in clear; they are
+        # accepted once and rewritten with the hash on the next save
+        if payload.get('db') not in (self.db, db):
+            print(f"  Load manifest {self.path} is for another database: sending all rows.")
+            return {}
+        return payload.get('tables', {})
+
+    def delta(self, table, df, keys):
+        """Returns (changed rows, their keys, their hashes) compared with the last committed load."""
+        row_key = row_keys(df, keys)
+        row_hash = row_hashes(df, table, keys)
+        previous = row_key.map(self.tables.get(table, {}))
+        changed = (previous != row_hash).to_numpy()
+        return df[changed], row_key[changed], row_hash[changed]
+
+    def commit(self, table, row_key, row_hash):
+        """Records rows that are now in the database and rewrites the manifest atomically."""
+        entries = self.tables.setdefault(table, {})
+        entries.update(zip(row_key.tolist(), row_hash.tolist()))
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            # One entry per line keeps the daily git diff to the rows that changed
+            json.dump({'db': self.db, 'tables': self.tables}, f, indent=0, sort_keys=True)
+        os.replace(tmp, self.path)
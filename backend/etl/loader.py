@@ -0,0 +1,510 @@
+# backend/etl/loader.py
+# Author: Hoang Son Lai
+#
+# Unified database loader for the cleaned tables (MySQL and Supabase/PostgreSQL).
+#
+# The cleaned files are read once, then every target is loaded concurrently
+# (one thread per target, tables in FK order inside each target). Backend
+# differences live in one Dialect class per database:
+#
+#   - engine URL / connect args
+#   - upsert SQL (INSERT IGNORE / ON DUPLICATE KEY vs ON CONFLICT)
+#   - bulk strategy: LOAD DATA LOCAL INFILE (MySQL) or COPY FROM STDIN
+#     (PostgreSQL) into a staging table, merged with one INSERT ... SELECT
+#     in a single transaction
+#   - batch sizes: bulk batches are sized from the serialized row width
+#     (LOAD_BATCH_BYTES per COPY/LOAD DATA) unless pinned by config
+#
+# The chunked executemany path is kept as the 'insert' strategy and as the
+# fallback when a bulk load fails (e.g. MySQL server with local_infile=OFF).
+#
+# Only rows that are new or changed since the last successful load are sent:
+# each target keeps a manifest of per-row hashes (load_manifest.py) that is
+# updated after the table's load committed. --full sends every row and
+# rebuilds the manifest.
+#
+# When a run actually sent rows, a row is appended to etl_load_log in that
+# database; the Flask API uses the latest id as its cache generation.
+#
+# After the tables, the materialized tables behind the SQL views
+# (latest_financials, price_metrics) are refreshed for the tickers whose
+# rows were sent (materialize.py).
+#
+#   python loader.py --targets mysql supabase [--mode insert] [--full]
+
+import argparse
+import io
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote_plus
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+from storage import read_table
+from load_manifest import LoadManifest
+import materialize
+import instrument
+from config import (
+    DATA_CLEANED_DIR, DB_CONFIG, SUPABASE_DB_CONFIG,
+    MYSQL_LOAD_MODE, MYSQL_LOAD_BATCH_ROWS, MYSQL_INSERT_CHUNK_ROWS,
+    SUPABASE_LOAD_MODE, SUPABASE_COPY_CHUNK_ROWS, SUPABASE_INSERT_CHUNK_ROWS,
+    LOAD_BATCH_BYTES, LOAD_TARGETS,
+)
+
+# What gets loaded, in FK order. update=None keeps existing rows (insert-only).
+# Prices are updated on conflict: with delta loads a re-sent bar is one whose
+# values changed (e.g. a restated adjusted close), so it must not be ignored.
+TABLE_SPECS = [
+    {
+        'table': 'companies',
+        'keys': ['ticker'],
+        'update': ['name', 'description'],
+        'extra_updates': ['last_updated=NOW()'],
+        'int_cols': [],
+    },
+    {
+        'table': 'stock_prices',
+        'keys': ['ticker', 'date'],
+        'update': 'non_key',
+        'extra_updates': [],
+        'int_cols': ['volume'],
+    },
+    {
+        # Weekly / monthly bars (downsample.py), keyed by period start
+        'table': 'stock_prices_resampled',
+        'keys': ['ticker', 'resolution', 'date'],
+        'update': 'non_key',
+        'extra_updates': [],
+        'int_cols': ['volume'],
+    },
+    {
+        'table': 'financial_statements',
+        'keys': ['ticker', 'report_date', 'period'],
+        'update': 'non_key',  # every column except id and the key
+        'extra_updates': [],
+        'int_cols': [],
+    },
+]
+
+
+# ----------------------------------------------------------------------
+# Frame preparation (shared by all dialects)
+# ----------------------------------------------------------------------
+def read_cleaned():
+    """Reads every cleaned table once; returns {table: DataFrame} for the files that exist."""
+    frames = {}
+    for spec in TABLE_SPECS:
+        name = spec['table']
+        if not os.path.exists(os.path.join(DATA_CLEANED_DIR, f'{name}.csv')):
+            print(f"Skipping {name}: File not found.")
+            continue
+        df = read_table(name)
+        for col in ('date', 'report_date'):
+            if col in df.columns:
+                df[col] = df[col].dt.date
+        # clean_data writes no inf (ratios are guarded there); this only copies
+        # the frame for a file that was produced some other way
+        values = df.select_dtypes('float').to_numpy()
+        if np.isinf(values).any():
+            df = df.replace([np.inf, -np.inf], np.nan)
+        frames[name] = df
+    return frames
+
+
+def update_columns(spec, columns):
+    if spec['update'] == 'non_key':
+        return [c for c in columns if c not in ['id'] + spec['keys']]
+    return spec['update']
+
+
+def dedupe(df, spec):
+    """One row per key (last wins), integer columns as nullable ints (no trailing '.0')."""
+    df = df.drop_duplicates(subset=spec['keys'], keep='last')
+    for col in spec['int_cols']:
+        if col in df.columns:
+            df = df.assign(**{col: pd.to_numeric(df[col], errors='coerce').round().astype('Int64')})
+    return df
+
+
+def tune_batch_rows(df, target_bytes, sample=1000):
+    """Rows per bulk batch so each COPY/LOAD DATA payload is about `target_bytes`."""
+    if df.empty:
+        return 1
+    head = df.head(sample).to_csv(index=False, header=False)
+    row_bytes = max(1, len(head.encode('utf-8')) // min(len(df), sample))
+    return max(1000, target_bytes // row_bytes)
+
+
+def report(label, rows, seconds):
+    rate = rows / seconds if seconds > 0 else float('inf')
+    print(f"{label}: {rows} rows in {seconds:.2f}s ({rate:,.0f} rows/s)")
+
+
+# ----------------------------------------------------------------------
+# Dialects
+# ----------------------------------------------------------------------
+class Dialect(ABC):
+    name = None
+    label = None
+    strategies = ('bulk', 'insert')
+    aliases = ()  # backend-specific names for 'bulk' (load_data / copy)
+    TABLE_DDL = {}  # CREATE TABLE IF NOT EXISTS for tables newer than schema.sql
+
+    def __init__(self, mode, insert_chunk_rows, batch_rows=0, batch_bytes=LOAD_BATCH_BYTES):
+        mode = mode.lower()
+        if mode not in self.strategies + self.aliases:
+            raise ValueError(f"Unknown load mode for {self.name}: {mode!r}")
+        self.mode = 'insert' if mode == 'insert' else 'bulk'
+        self.insert_chunk_rows = insert_chunk_rows
+        self.batch_rows = batch_rows
+        self.batch_bytes = batch_bytes
+
+    # -- to implement -------------------------------------------------
+    @abstractmethod
+    def engine(self):
+        """SQLAlchemy engine for this database."""
+
+    @abstractmethod
+    def db_id(self):
+        """Identifies the database a load manifest belongs to."""
+
+    @abstractmethod
+    def upsert_sql(self, table, cols, keys, update_cols, extra_updates, source):
+        """INSERT ... <source> that updates `update_cols` (or ignores) rows whose `keys` already exist."""
+
+    @abstractmethod
+    def create_stage(self, conn, table, stage, cols):
+        """Creates an empty staging table `stage` with the columns of `table`."""
+
+    @abstractmethod
+    def drop_stage(self, conn, stage):
+        """Drops the staging table."""
+
+    @abstractmethod
+    def copy_into(self, conn, stage, df, batch_rows):
+        """Bulk-loads `df` into `stage`, `batch_rows` rows per statement."""
+
+    # -- shared -------------------------------------------------------
+    def bulk_upsert(self, engine, spec, df):
+        """Bulk-load `df` into a staging table and merge it with one statement, in one transaction."""
+        table = spec['table']
+        cols = list(df.columns)
+        stage = f"_stage_{table}"
+        batch_rows = self.batch_rows or tune_batch_rows(df, self.batch_bytes)
+        merge = self.upsert_sql(
+            table, cols, spec['keys'], update_columns(spec, cols), spec['extra_updates'],
+            source=f"SELECT {', '.join(cols)} FROM {stage}",
+        )
+        with engine.begin() as conn:
+            self.create_stage(conn, table, stage, cols)
+            self.copy_into(conn, stage, df, batch_rows)
+            conn.execute(text(merge))
+            self.drop_stage(conn, stage)
+
+    def insert_rows(self, engine, spec, df):
+        """Chunked executemany upsert (the original loader path)."""
+        cols = list(df.columns)
+        sql = text(self.upsert_sql(
+            spec['table'], cols, spec['keys'], update_columns(spec, cols), spec['extra_updates'],
+            source=f"VALUES ({', '.join(':' + c for c in cols)})",
+        ))
+        df = df.astype(object)
+        df = df.where(pd.notnull(df), None)
+        with engine.connect() as conn:
+            for i in range(0, len(df), self.insert_chunk_rows):
+                chunk = df.iloc[i:i + self.insert_chunk_rows]
+                conn.execute(sql, chunk.to_dict(orient='records'))
+                conn.commit()
+
+    def upsert(self, engine, spec, df):
+        """Upserts `df` with the configured strategy, falling back to executemany; prints rows/s."""
+        table = spec['table']
+        started = time.perf_counter()
+        if self.mode == 'bulk':
+            try:
+                self.bulk_upsert(engine, spec, df)
+                report(f"{self.label} {table} [bulk]", len(df), time.perf_counter() - started)
+                return
+            except Exception as e:
+                # Staging + merge is one transaction, so nothing was written
+                print(f"{self.label} Bulk load failed for {table} ({e}); falling back to executemany.")
+                instrument.count(f'{self.name}.bulk_fallbacks')
+                started = time.perf_counter()
+        self.insert_rows(engine, spec, df)
+        report(f"{self.label} {table} [insert]", len(df), time.perf_counter() - started)
+
+    def load_table(self, engine, spec, df, manifest, scope=None):
+        """Sends only the rows that changed since the last load, then records them in the manifest.
+
+        The rows are added to the materialized-table refresh `scope` before they are written.
+        """
+        table = spec['table']
+        started = time.perf_counter()
+        df = dedupe(df, spec)
+        total = len(df)
+        df, row_key, row_hash = manifest.delta(table, df, spec['keys'])
+        instrument.count(f'{self.name}.rows_sent', len(df))
+        instrument.count(f'{self.name}.rows_unchanged', total - len(df))
+        if not df.empty:
+            if scope is not None:
+                scope.add(table, df)
+            if table in self.TABLE_DDL:
+                # Tables added after schema.sql was first applied are created on demand
+                with engine.begin() as conn:
+                    conn.execute(text(self.TABLE_DDL[table]))
+            self.upsert(engine, spec, df)
+            manifest.commit(table, row_key, row_hash)
+        print(f"{self.label} {table}: {len(df)} rows sent, {total - len(df)} unchanged skipped "
+              f"in {time.perf_counter() - started:.2f}s")
+        return len(df)
+
+    def log_load(self, engine, rows_sent):
+        """Appends a generation row to etl_load_log (read by the API to invalidate its cache)."""
+        with engine.begin() as conn:
+            conn.execute(text(self.LOAD_LOG_DDL))
+            conn.execute(text("INSERT INTO etl_load_log (rows_sent) VALUES (:rows_sent)"),
+                         {'rows_sent': int(rows_sent)})
+
+
+class MySQLDialect(Dialect):
+    name = 'mysql'
+    label = '[MySQL]'
+    aliases = ('load_data',)
+    LOAD_LOG_DDL = """
+        CREATE TABLE IF NOT EXISTS etl_load_log (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            rows_sent INT
+        )
+    """
+    TABLE_DDL = {
+        'stock_prices_resampled': """
+            CREATE TABLE IF NOT EXISTS stock_prices_resampled (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                ticker VARCHAR(10),
+                resolution VARCHAR(10),
+                date DATE,
+                open DECIMAL(15, 4),
+                high DECIMAL(15, 4),
+                low DECIMAL(15, 4),
+                close DECIMAL(15, 4),
+                adj_close DECIMAL(15, 4),
+                volume BIGINT,
+                FOREIGN KEY (ticker) REFERENCES companies(ticker) ON DELETE CASCADE,
+                UNIQUE KEY unique_stock_resampled (ticker, resolution, date)
+            )
+        """,
+    }
+
+    # Characters that must be backslash-escaped in a LOAD DATA text field
+    ESCAPES = [('\\', '\\\\'), ('\t', '\\t'), ('\n', '\\n'), ('\r', '\\r'), ('\0', '\\0')]
+
+    def engine(self):
+        encoded_password = quote_plus(str(DB_CONFIG['password']))
+        conn_str = f"mysql+mysqlconnector://{DB_CONFIG['user']}:{encoded_password}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+        # LOAD DATA LOCAL INFILE must be enabled on the client side too
+        connect_args = {'allow_local_infile': True} if self.mode == 'bulk' else {}
+        return create_engine(conn_str, connect_args=connect_args)
+
+    def db_id(self):
+        return f"{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+
+    def upsert_sql(self, table, cols, keys, update_cols, extra_updates, source):
+        col_list = ', '.join(cols)
+        if not update_cols:
+            return f"INSERT IGNORE INTO {table} ({col_list}) {source}"
+        sets = [f"{c}=VALUES({c})" for c in update_cols] + list(extra_updates)
+        return f"INSERT INTO {table} ({col_list}) {source} ON DUPLICATE KEY UPDATE {', '.join(sets)}"
+
+    def create_stage(self, conn, table, stage, cols):
+        conn.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {stage}"))
+        conn.execute(text(f"CREATE TEMPORARY TABLE {stage} LIKE {table}"))
+
+    def drop_stage(self, conn, stage):
+        conn.execute(text(f"DROP TEMPORARY TABLE {stage}"))
+
+    @classmethod
+    def _tsv_column(cls, series):
+        null = series.isna()
+        out = series.astype(str)
+        if (pd.api.types.is_string_dtype(series) or series.dtype == object
+                or isinstance(series.dtype, pd.CategoricalDtype)):
+            for raw, escaped in cls.ESCAPES:
+                out = out.str.replace(raw, escaped, regex=False)
+        return out.mask(null, r'\N')
+
+    @classmethod
+    def write_tsv(cls, df, path):
+        """Writes `df` (no header) in LOAD DATA's default escaped tab-separated format, \\N = NULL."""
+        cols = [cls._tsv_column(df[c]) for c in df.columns]
+        line = cols[0]
+        for col in cols[1:]:
+            line = line + '\t' + col
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            if len(line):
+                f.write('\n'.join(line.tolist()))
+                f.write('\n')
+
+    def copy_into(self, conn, stage, df, batch_rows):
+        col_list = ', '.join(df.columns)
+        with tempfile.TemporaryDirectory(prefix='mysql_load_') as tmp:
+            for start in range(0, len(df), batch_rows):
+                path = os.path.join(tmp, f'{stage}_{start}.tsv')
+                self.write_tsv(df.iloc[start:start + batch_rows], path)
+                quoted = "'" + path.replace('\\', '\\\\').replace("'", "\\'") + "'"
+                conn.exec_driver_sql(
+                    f"LOAD DATA LOCAL INFILE {quoted} INTO TABLE {stage} "
+                    f"CHARACTER SET utf8mb4 ({col_list})"
+                )
+                os.remove(path)
+
+
+class PostgresDialect(Dialect):
+    name = 'supabase'
+    label = '[Supabase]'
+    aliases = ('copy',)
+    LOAD_LOG_DDL = """
+        CREATE TABLE IF NOT EXISTS etl_load_log (
+            id SERIAL PRIMARY KEY,
+            loaded_at TIMESTAMPTZ DEFAULT NOW(),
+            rows_sent INT
+        )
+    """
+    TABLE_DDL = {
+        'stock_prices_resampled': """
+            CREATE TABLE IF NOT EXISTS stock_prices_resampled (
+                id SERIAL PRIMARY KEY,
+                ticker VARCHAR(10) REFERENCES companies(ticker) ON DELETE CASCADE,
+                resolution VARCHAR(10),
+                date DATE,
+                open NUMERIC(15, 4),
+                high NUMERIC(15, 4),
+                low NUMERIC(15, 4),
+                close NUMERIC(15, 4),
+                adj_close NUMERIC(15, 4),
+                volume BIGINT,
+                UNIQUE (ticker, resolution, date)
+            )
+        """,
+    }
+
+    def engine(self):
+        encoded_password = quote_plus(str(SUPABASE_DB_CONFIG['password']))
+        conn_str = f"postgresql+psycopg2://{SUPABASE_DB_CONFIG['user']}:{encoded_password}@{SUPABASE_DB_CONFIG['host']}:{SUPABASE_DB_CONFIG['port']}/{SUPABASE_DB_CONFIG['database']}"
+        return create_engine(conn_str)
+
+    def db_id(self):
+        return f"{SUPABASE_DB_CONFIG['host']}:{SUPABASE_DB_CONFIG['port']}/{SUPABASE_DB_CONFIG['database']}"
+
+    def upsert_sql(self, table, cols, keys, update_cols, extra_updates, source):
+        col_list = ', '.join(cols)
+        if not update_cols:
+            action = "DO NOTHING"
+        else:
+            sets = [f"{c}=EXCLUDED.{c}" for c in update_cols] + list(extra_updates)
+            action = f"DO UPDATE SET {', '.join(sets)}"
+        return f"INSERT INTO {table} ({col_list}) {source} ON CONFLICT ({', '.join(keys)}) {action}"
+
+    def create_stage(self, conn, table, stage, cols):
+        # UNLOGGED: no WAL for rows that only live for this transaction
+        conn.execute(text(f"DROP TABLE IF EXISTS {stage}"))
+        conn.execute(text(
+            f"CREATE UNLOGGED TABLE {stage} AS SELECT {', '.join(cols)} FROM {table} WITH NO DATA"
+        ))
+
+    def drop_stage(self, conn, stage):
+        conn.execute(text(f"DROP TABLE {stage}"))
+
+    def copy_into(self, conn, stage, df, batch_rows):
+        sql = f"COPY {stage} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv, NULL '')"
+        cursor = conn.connection.cursor()
+        try:
+            for start in range(0, len(df), batch_rows):
+                buf = io.StringIO()
+                # Empty field = NULL; pandas writes NaN/None as empty and quotes text as needed
+                df.iloc[start:start + batch_rows].to_csv(buf, index=False, header=False)
+                buf.seek(0)
+                cursor.copy_expert(sql, buf)
+        finally:
+            cursor.close()
+
+
+def get_dialect(target, mode=None):
+    if target == 'mysql':
+        return MySQLDialect(mode or MYSQL_LOAD_MODE, MYSQL_INSERT_CHUNK_ROWS, MYSQL_LOAD_BATCH_ROWS)
+    if target == 'supabase':
+        return PostgresDialect(mode or SUPABASE_LOAD_MODE, SUPABASE_INSERT_CHUNK_ROWS, SUPABASE_COPY_CHUNK_ROWS)
+    raise ValueError(f"Unknown load target: {target!r} (expected 'mysql' or 'supabase')")
+
+
+# ----------------------------------------------------------------------
+# Orchestration
+# ----------------------------------------------------------------------
+def load_target(dialect, frames, full=False):
+    engine = dialect.engine()
+    manifest = LoadManifest(dialect.name, dialect.db_id())
+    scope = materialize.RefreshScope(dialect.name)
+    if full:
+        manifest.tables = {}  # resend everything and rebuild the manifest
+    started = time.perf_counter()
+    rows_sent = 0
+    for spec in TABLE_SPECS:
+        table = spec['table']
+        if table not in frames:
+            continue
+        try:
+            print(f"{dialect.label} Loading {table} ({dialect.mode}, {'full' if full else 'delta'})...")
+            with instrument.span(f"{dialect.name}:{table}"):
+                rows_sent += dialect.load_table(engine, spec, frames[table], manifest, scope)
+        except Exception as e:
+            instrument.count(f'{dialect.name}.errors')
+            print(f"{dialect.label} Error loading {table}: {e}")
+    try:
+        print(f"{dialect.label} Refreshing materialized tables...")
+        with instrument.span(f"{dialect.name}:materialize"):
+            materialize.refresh(dialect.name, engine, scope, full=full)
+    except Exception as e:
+        # The scope file stays in data/cache, so the next load retries it
+        instrument.count(f'{dialect.name}.errors')
+        print(f"{dialect.label} Error refreshing materialized tables: {e}")
+    if rows_sent:
+        try:
+            dialect.log_load(engine, rows_sent)
+        except Exception as e:
+            instrument.count(f'{dialect.name}.errors')
+            print(f"{dialect.label} Could not record load in etl_load_log: {e}")
+    print(f"{dialect.label} Done in {time.perf_counter() - started:.1f}s")
+
+
+def load_targets(targets=None, mode=None, full=False):
+    """Reads the cleaned tables once and loads every target concurrently."""
+    targets = list(targets or LOAD_TARGETS)
+    dialects = [get_dialect(t, mode) for t in targets]
+    frames = read_cleaned()
+    if len(dialects) == 1:
+        load_target(dialects[0], frames, full)
+        return
+    with ThreadPoolExecutor(max_workers=len(dialects), thread_name_prefix='load') as pool:
+        for future in [pool.submit(instrument.propagate(load_target), d, frames, full) for d in dialects]:
+            future.result()
+
+
+def main(targets=None, mode=None, full=False):
+    print(f"--- Starting Database Load ({', '.join(targets or LOAD_TARGETS)}) ---")
+    load_targets(targets, mode, full)
+    print("--- Database Load Complete ---")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the cleaned tables into MySQL and/or Supabase.")
+    parser.add_argument('--targets', nargs='+', choices=['mysql', 'supabase'],
+                        help="Databases to load (default: LOAD_TARGETS)")
+    parser.add_argument('--mode', choices=['bulk', 'insert'],
+                        help="Override the per-target strategy (bulk = LOAD DATA / COPY)")
+    parser.add_argument('--full', action='store_true',
+                        help="Send every row instead of only rows changed since the last load")
+    args = parser.parse_args()
+    main(args.targets, args.mode, args.full)
@@ -0,0 +1,296 @@
+# backend/etl/materialize.py
+# Author: Hoang Son Lai
+#
+# Materialized tables behind the SQL views (backend/sql/supabase_views.sql,
+# backend/sql/analysis_queries.sql), refreshed by the loader after each load:
+#
+#   latest_financials  one row per (ticker, basis): the latest FY statement
+#                      whose <basis> filter holds. Views 1-5 each picked the
+#                      latest FY row among rows passing their own filter
+#                      (revenue > 0, debt_to_equity / roe IS NOT NULL), so
+#                      every filter is kept as a basis; 'fy' has no filter
+#                      (latest EPS for the P/E view).
+#   price_metrics      (ticker, date, close, ma_30): the 30-bar moving average
+#                      of close, which the views used to compute with a
+#                      window over all of stock_prices on every read.
+#
+# Refreshes are incremental. The loader records the rows it sends (the delta
+# from load_manifest.py) in a RefreshScope before they are written:
+# financial statement tickers, and per price ticker the earliest bar sent.
+# A changed ticker gets its latest_financials rows rebuilt; price_metrics is
+# rebuilt from that ticker's earliest changed bar onwards (the average of an
+# older bar only depends on bars before it). The scope is kept in
+# data/cache/materialize_pending_<target>.json until the refresh committed,
+# so a refresh that fails is retried by the next load even though the
+# manifest no longer re-sends those rows. An empty materialized table (e.g.
+# just created) is rebuilt in full, as is everything with --full.
+#
+#   python materialize.py --targets supabase [--full]
+
+import argparse
+import json
+import os
+from collections import defaultdict
+import pandas as pd
+from sqlalchemy import bindparam, text
+from config import DATA_CACHE_DIR, LOAD_TARGETS
+import instrument
+
+MA_WINDOW = 30
+
+# basis -> filter on the FY rows of financial_statements
+LATEST_BASES = {
+    'revenue': 'revenue > 0',
+    'debt_to_equity': 'debt_to_equity IS NOT NULL',
+    'roe': 'roe IS NOT NULL',
+    'fy': '1 = 1',
+}
+LATEST_COLUMNS = [
+    'report_date', 'revenue', 'net_income', 'basic_eps', 'gross_margin', 'net_margin',
+    'debt_to_equity', 'current_ratio', 'interest_coverage_ratio', 'roe', 'roa',
+]
+
+# The moving average keeps the precision of AVG() in each database
+# (unconstrained NUMERIC in PostgreSQL, DECIMAL(19, 8) in MySQL)
+DDL = {
+    'mysql': [
+        """
+        CREATE TABLE IF NOT EXISTS latest_financials (
+            ticker VARCHAR(10),
+            basis VARCHAR(20),
+            report_date DATE,
+            revenue DECIMAL(20, 2),
+            net_income DECIMAL(20, 2),
+            basic_eps DECIMAL(10, 4),
+            gross_margin DECIMAL(10, 4),
+            net_margin DECIMAL(10, 4),
+            debt_to_equity DECIMAL(10, 4),
+            current_ratio DECIMAL(10, 4),
+            interest_coverage_ratio DECIMAL(10, 4),
+            roe DECIMAL(10, 4),
+            roa DECIMAL(10, 4),
+            PRIMARY KEY (ticker, basis)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS price_metrics (
+            ticker VARCHAR(10),
+            date DATE,
+            close DECIMAL(15, 4),
+            ma_30 DECIMAL(19, 8),
+            PRIMARY KEY (ticker, date)
+        )
+        """,
+    ],
+    'supabase': [
+        """
+        CREATE TABLE IF NOT EXISTS latest_financials (
+            ticker VARCHAR(10),
+            basis VARCHAR(20),
+            report_date DATE,
+            revenue NUMERIC(20, 2),
+            net_income NUMERIC(20, 2),
+            basic_eps NUMERIC(10, 4),
+            gross_margin NUMERIC(10, 4),
+            net_margin NUMERIC(10, 4),
+            debt_to_equity NUMERIC(10, 4),
+            current_ratio NUMERIC(10, 4),
+            interest_coverage_ratio NUMERIC(10, 4),
+            roe NUMERIC(10, 4),
+            roa NUMERIC(10, 4),
+            PRIMARY KEY (ticker, basis)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS price_metrics (
+            ticker VARCHAR(10),
+            date DATE,
+            close NUMERIC(15, 4),
+            ma_30 NUMERIC,
+            PRIMARY KEY (ticker, date)
+        )
+        """,
+    ],
+}
+
+
+def pending_path(target):
+    return os.path.join(DATA_CACHE_DIR, f'materialize_pending_{target}.json')
+
+
+class RefreshScope:
+    """Tickers (and earliest price dates) whose materialized rows must be rebuilt."""
+
+    def __init__(self, target, path=None):
+        self.path = path or pending_path(target)
+        self.financials = set()
+        self.prices = {}  # ticker -> earliest changed date (ISO string)
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    payload = json.load(f)
+                self.financials = set(payload.get('financial_statements', []))
+                self.prices = dict(payload.get('stock_prices', {}))
+            except (OSError, ValueError) as e:
+                print(f"  Ignoring unreadable refresh scope {self.path}: {e}")
+
+    def add(self, table, df):
+        """Records the rows about to be loaded into `table` (saved before the load runs)."""
+        if df.empty:
+            return
+        if table == 'financial_statements':
+            self.financials.update(df['ticker'].astype(str).unique().tolist())
+        elif table == 'stock_prices':
+            earliest = df.groupby('ticker', observed=True)['date'].min()
+            for ticker, day in earliest.items():
+                day = pd.Timestamp(day).strftime('%Y-%m-%d')
+                self.prices[ticker] = min(day, self.prices.get(ticker, day))
+        else:
+            return
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'financial_statements': sorted(self.financials),
+                       'stock_prices': dict(sorted(self.prices.items()))}, f, indent=0)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        self.financials, self.prices = set(), {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _in_tickers(sql):
+    return text(sql).bindparams(bindparam('tickers', expanding=True))
+
+
+def _is_empty(conn, table):
+    return conn.execute(text(f"SELECT 1 FROM {table} LIMIT 1")).first() is None
+
+
+def refresh_latest_financials(conn, tickers=None):
+    """Rebuilds latest_financials for `tickers` (None = every ticker); returns rows written."""
+    where = " AND ticker IN :tickers" if tickers is not None else ""
+    params = {'tickers': sorted(tickers)} if tickers is not None else {}
+    make = _in_tickers if tickers is not None else text
+    cols = ', '.join(LATEST_COLUMNS)
+    conn.execute(make(f"DELETE FROM latest_financials WHERE 1 = 1{where}"), params)
+    rows = 0
+    for basis, condition in LATEST_BASES.items():
+        rows += conn.execute(make(f"""
+            INSERT INTO latest_financials (ticker, basis, {cols})
+            SELECT ticker, '{basis}', {cols}
+            FROM (
+                SELECT ticker, {cols},
+                       ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY report_date DESC) AS rn
+                FROM financial_statements
+                WHERE period = 'FY' AND {condition}{where}
+            ) f
+            WHERE rn = 1
+        """), params).rowcount
+    return rows
+
+
+def _lookback(conn, tickers, since):
+    """Earliest date of the MA_WINDOW - 1 bars before `since` over `tickers`; None if one has fewer."""
+    dates = conn.execute(_in_tickers(f"""
+        SELECT (
+            SELECT s.date FROM stock_prices s
+            WHERE s.ticker = c.ticker AND s.date < :since
+            ORDER BY s.date DESC LIMIT 1 OFFSET {MA_WINDOW - 2}
+        )
+        FROM companies c
+        WHERE c.ticker IN :tickers
+    """), {'tickers': sorted(tickers), 'since': since}).scalars().all()
+    if not dates or any(d is None for d in dates):
+        return None
+    return min(dates)
+
+
+def refresh_price_metrics(conn, tickers=None, since=None):
+    """Rebuilds price_metrics for `tickers` (None = all) from `since` (ISO date, None = all bars)."""
+    where = " AND ticker IN :tickers" if tickers is not None else ""
+    after = " AND date >= :since" if since is not None else ""
+    params = {}
+    if tickers is not None:
+        params['tickers'] = sorted(tickers)
+    if since is not None:
+        params['since'] = since
+    make = _in_tickers if tickers is not None else text
+    conn.execute(make(f"DELETE FROM price_metrics WHERE 1 = 1{where}{after}"), params)
+    # The window only needs the MA_WINDOW - 1 bars before `since` of every
+    # ticker so that the first rebuilt bars still average their predecessors
+    window_from = ""
+    if tickers is not None and since is not None:
+        params['lookback'] = _lookback(conn, tickers, since)
+        if params['lookback'] is not None:
+            window_from = " AND date >= :lookback"
+    return conn.execute(make(f"""
+        INSERT INTO price_metrics (ticker, date, close, ma_30)
+        SELECT ticker, date, close, ma_30
+        FROM (
+            SELECT ticker, date, close,
+                   AVG(close) OVER (
+                       PARTITION BY ticker ORDER BY date
+                       ROWS BETWEEN {MA_WINDOW - 1} PRECEDING AND CURRENT ROW
+                   ) AS ma_30
+            FROM stock_prices
+            WHERE 1 = 1{where}{window_from}
+        ) p
+        WHERE 1 = 1{after}
+    """), params).rowcount
+
+
+def refresh(dialect_name, engine, scope, full=False):
+    """Creates the materialized tables if needed and refreshes them for `scope` in one transaction."""
+    with engine.begin() as conn:
+        for ddl in DDL[dialect_name]:
+            conn.execute(text(ddl))
+
+        if full or _is_empty(conn, 'latest_financials'):
+            rows = refresh_latest_financials(conn)
+            print(f"  latest_financials: rebuilt for every ticker ({rows} rows)")
+        elif scope.financials:
+            rows = refresh_latest_financials(conn, scope.financials)
+            print(f"  latest_financials: refreshed {len(scope.financials)} ticker(s) ({rows} rows)")
+        instrument.count('materialize.financial_tickers', len(scope.financials))
+
+        if full or _is_empty(conn, 'price_metrics'):
+            rows = refresh_price_metrics(conn)
+            print(f"  price_metrics: rebuilt for every ticker ({rows} rows)")
+        elif scope.prices:
+            # One statement per distinct start date (a daily load shares one)
+            by_since = defaultdict(list)
+            for ticker, since in scope.prices.items():
+                by_since[since].append(ticker)
+            rows = sum(refresh_price_metrics(conn, tickers, since) for since, tickers in by_since.items())
+            print(f"  price_metrics: refreshed {len(scope.prices)} ticker(s) from "
+                  f"{min(by_since)} ({rows} rows)")
+        instrument.count('materialize.price_tickers', len(scope.prices))
+    scope.clear()
+
+
+def main(targets=None, full=False):
+    # Imported here: loader imports this module
+    from loader import get_dialect
+    for target in targets or LOAD_TARGETS:
+        dialect = get_dialect(target)
+        print(f"{dialect.label} Refreshing materialized tables ({'full' if full else 'pending scope'})...")
+        engine = dialect.engine()
+        try:
+            refresh(dialect.name, engine, RefreshScope(dialect.name), full=full)
+        finally:
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh latest_financials and price_metrics.")
+    parser.add_argument('--targets', nargs='+', choices=['mysql', 'supabase'],
+                        help="Databases to refresh (default: LOAD_TARGETS)")
+    parser.add_argument('--full', action='store_true',
+                        help="Rebuild both tables for every ticker instead of the pending scope")
+    args = parser.parse_args()
+    main(args.targets, args.full)
@@ -0,0 +1,100 @@
+# backend/etl/price_state.py
+# Author: Hoang Son Lai
+#
+# Per-ticker high-water marks for the cleaned price store.
+#
+# data/cleaned/stock_prices_state.json keeps, for every ticker, the last
+# date already present in stock_prices.csv plus the last few bars
+# (rounded to the DECIMAL(15,4) precision of the schema). fetch_data uses
+# the last date to request only new bars; clean_data uses the stored bars
+# to detect provider restatements inside the overlap window, so neither
+# stage has to read stock_prices.csv to know where it stopped.
+
+import os
+import json
+from datetime import date, timedelta
+from config import DATA_CLEANED_DIR, DATA_RAW_DIR, PRICE_TAIL_ROWS
+
+STATE_PATH = os.path.join(DATA_CLEANED_DIR, 'stock_prices_state.json')
+PRICES_PATH = os.path.join(DATA_CLEANED_DIR, 'stock_prices.csv')
+RAW_META_PATH = os.path.join(DATA_RAW_DIR, 'raw_prices.meta.json')
+
+VALUE_COLS = ['open', 'high', 'low', 'close', 'adj_close', 'volume']
+
+
+def _write_json(path, payload):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def bar_values(row):
+    """Normalised (rounded) OHLCV tuple used to compare a bar against the stored tail."""
+    out = []
+    for col in VALUE_COLS:
+        v = row[col]
+        if v is None or v != v:  # NaN
+            out.append(None)
+        elif col == 'volume':
+            out.append(int(v))
+        else:
+            out.append(round(float(v), 4))
+    return out
+
+
+def load_state():
+    """Returns {ticker: {'last_date': 'YYYY-MM-DD', 'tail': [[date, o, h, l, c, adj, v], ...]}}."""
+    state = _read_json(STATE_PATH)
+    return state.get('tickers', {}) if state else {}
+
+
+def save_state(tickers_state):
+    _write_json(STATE_PATH, {'tickers': tickers_state})
+
+
+def build_state(df, previous=None):
+    """Merge the bars in `df` (cleaned columns, date as date/str) into the tail of each ticker."""
+    state = dict(previous or {})
+    for ticker, grp in df.groupby('ticker', sort=False, observed=True):
+        tail = {row[0]: row[1:] for row in state.get(ticker, {}).get('tail', [])}
+        for rec in grp.to_dict(orient='records'):
+            tail[str(rec['date'])] = bar_values(rec)
+        dates = sorted(tail)[-PRICE_TAIL_ROWS:]
+        state[ticker] = {
+            'last_date': dates[-1],
+            'tail': [[d] + list(tail[d]) for d in dates],
+        }
+    return state
+
+
+def fetch_start_dates(overlap_days):
+    """First date to request per ticker: last stored date minus the overlap window.
+
+    Empty (a full fetch) when stock_prices.csv is missing: the state alone
+    would fetch only the overlap bars and there would be no history to
+    merge them into.
+    """
+    if not os.path.exists(PRICES_PATH):
+        return {}
+    starts = {}
+    for ticker, info in load_state().items():
+        last = date.fromisoformat(info['last_date'])
+        starts[ticker] = (last - timedelta(days=overlap_days)).isoformat()
+    return starts
+
+
+def write_raw_meta(mode, since):
+    """Describe how raw_prices.csv was produced so clean_data knows whether to merge or rewrite."""
+    _write_json(RAW_META_PATH, {'mode': mode, 'since': since})
+
+
+def read_raw_meta():
+    return _read_json(RAW_META_PATH) or {'mode': 'full', 'since': {}}
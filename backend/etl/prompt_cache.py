@@ -0,0 +1,100 @@
+# backend/etl/prompt_cache.py
+# Author: Hoang Son Lai
+#
+# Content-addressed cache for LLM completions.
+#
+# Entries are keyed by sha256(model, system prompt, user prompt, max_tokens),
+# so an insight is only regenerated when the data in its prompt (or the
+# model/prompt wording) actually changed. Entries expire after a TTL and the
+# file is capped at `max_entries` (least recently used evicted first). The
+# cache lives in data/cache/insight_cache.json, which the daily workflow
+# commits together with the rest of data/, so it survives between runs.
+# Only created_at is stored: recency of use is tracked in memory (entries
+# not used in this process rank by created_at), and save() leaves the file
+# untouched unless an entry was added or evicted, so a run whose insights
+# all came from the cache does not change the committed file.
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class PromptCache:
+    def __init__(self, path, ttl_seconds, max_entries):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = self._load()
+        self._last_used = {}  # key -> time of the last get/put in this process
+        self._dirty = False
+
+    @staticmethod
+    def key(model, system_prompt, user_prompt, max_tokens):
+        raw = json.dumps([model, system_prompt, user_prompt, max_tokens], ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                entries = json.load(f).get('entries', {})
+        except (OSError, ValueError) as e:
+            print(f"  Ignoring unreadable prompt cache {self.path}: {e}")
+            return {}
+        for entry in entries.values():
+            entry.pop('last_used', None)  # written by earlier versions
+        return entries
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry['created_at'] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._last_used[key] = now
+            self.hits += 1
+            return entry['completion']
+
+    def put(self, key, completion):
+        now = time.time()
+        with self._lock:
+            self._entries[key] = {'completion': completion, 'created_at': now}
+            self._last_used[key] = now
+            self._dirty = True
+
+    def _evict(self):
+        now = time.time()
+        live = {k: e for k, e in self._entries.items() if now - e['created_at'] <= self.ttl_seconds}
+        if len(live) > self.max_entries:
+            keep = sorted(live, key=lambda k: self._last_used.get(k, live[k]['created_at']),
+                          reverse=True)[:self.max_entries]
+            live = {k: live[k] for k in keep}
+        if len(live) != len(self._entries):
+            self._dirty = True
+        self._entries = live
+
+    def save(self):
+        """Writes the cache if an entry was added or evicted since it was loaded; returns True if written."""
+        with self._lock:
+            self._evict()
+            if not self._dirty and os.path.exists(self.path):
+                return False
+            payload = {'entries': self._entries}
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+        return True
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -0,0 +1,44 @@
+# backend/etl/rate_limiter.py
+# Author: Hoang Son Lai
+
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by all workers of a job.
+
+    `rate` tokens are added per second up to `capacity`; `acquire()` blocks
+    until enough tokens are available, so the long-run request rate never
+    exceeds `rate` while short bursts of up to `capacity` go through at once.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._last
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._last = now
+
+    def acquire(self, tokens=1.0):
+        """Block until `tokens` are available, then consume them. Returns seconds waited."""
+        tokens = min(float(tokens), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
@@ -1,13 +1,66 @@
+import argparse
+import os
 import fetch_data
 import clean_data
+import downsample
+import build_dashboard
 import generate_insights
+from config import DATA_RAW_DIR, DATA_CLEANED_DIR
+from dag import Node, run_dag
+from run_state import RunState
 
-def main():
+def raw(*names):
+    return [os.path.join(DATA_RAW_DIR, n) for n in names]
+
+def cleaned(*names):
+    return [os.path.join(DATA_CLEANED_DIR, n) for n in names]
+
+RAW_FILES = raw('raw_companies.csv', 'raw_prices.csv', 'raw_prices.meta.json',
+                'raw_financials.csv', 'raw_financials_quarterly.csv')
+COMPANIES = cleaned('companies.csv')
+PRICES = cleaned('stock_prices.csv', 'stock_prices_state.json')
+FINANCIALS = cleaned('financial_statements.csv', 'financial_statements_fingerprints.json')
+RESAMPLED = cleaned('stock_prices_resampled.csv')
+CLEAN_STAGES = ['clean_companies', 'clean_prices', 'clean_financials']
+
+def nodes(full=False):
+    """Phase 1 stages as a DAG (dag.py): the three cleaning stages, and everything after them, overlap."""
+    return [
+        # Yahoo is an external source: always fetched (per ticker, in parallel, checkpointed)
+        Node('fetch_data', fetch_data.main, params={'full': full},
+             outputs=RAW_FILES, always=True, checkpoint=True),
+        Node('clean_companies', clean_data.clean_companies, deps=['fetch_data'],
+             inputs=raw('raw_companies.csv'), outputs=COMPANIES),
+        Node('clean_prices', clean_data.clean_prices, deps=['fetch_data'], params={'full': full},
+             inputs=raw('raw_prices.csv', 'raw_prices.meta.json'), outputs=PRICES),
+        Node('clean_financials', clean_data.clean_financials, deps=['fetch_data'], params={'full': full},
+             inputs=raw('raw_financials.csv', 'raw_financials_quarterly.csv'), outputs=FINANCIALS),
+        Node('downsample', downsample.main, deps=['clean_prices'],
+             inputs=PRICES[:1], outputs=RESAMPLED),
+        Node('build_dashboard', build_dashboard.main, deps=CLEAN_STAGES,
+             inputs=COMPANIES + PRICES[:1] + FINANCIALS[:1],
+             outputs=[os.path.join(build_dashboard.output_dir(), 'manifest.json')]),
+        # Global and company prompts share one concurrent Groq client inside this stage
+        Node('generate_insights', generate_insights.main, deps=CLEAN_STAGES,
+             inputs=COMPANIES + PRICES[:1] + FINANCIALS[:1],
+             outputs=cleaned('insights_global.json', 'insights_company.json')),
+    ]
+
+def main(full=False, force=False, workers=None):
     print("--- PHASE 1: Fetch & Clean Data ---")
-    fetch_data.main()
-    clean_data.main()
-    generate_insights.main()
+    # Unchanged stages are skipped and a rerun after a failure resumes the
+    # unfinished run (fetch resumes per ticker), see run_state.py
+    state = RunState('phase1', fresh=full or force, force=force)
+    run_dag('phase1', nodes(full), state, workers)
     print("Phase 1 Complete. Dashboard data is ready!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Phase 1: fetch, clean, build dashboard artifacts and generate insights.")
+    parser.add_argument('--full', action='store_true',
+                        help="Full price backfill and rebuild of the cleaned tables, instead of fetching only bars "
+                             "after the last stored date and re-cleaning only the tickers that changed")
+    parser.add_argument('--force', action='store_true',
+                        help="Start a new run and run every stage, even if its inputs did not change")
+    parser.add_argument('--workers', type=int, help="Stages run concurrently (default: DAG_WORKERS)")
+    args = parser.parse_args()
+    main(full=args.full, force=args.force, workers=args.workers)
@@ -1,11 +1,38 @@
+import argparse
+import os
 import load_to_supabase
 import export_queries
+from config import DATA_CLEANED_DIR
+from dag import Node, run_dag
+from load_manifest import manifest_path
+from run_state import RunState
 
-def main():
+CLEANED_FILES = [os.path.join(DATA_CLEANED_DIR, f) for f in (
+    'companies.csv', 'stock_prices.csv', 'stock_prices_resampled.csv', 'financial_statements.csv',
+)]
+
+def nodes(full=False, upstream=()):
+    """Phase 2 stages; `upstream` = the Phase 1 nodes producing the cleaned tables (run_pipeline.py)."""
+    # Both stages talk to the database, so they always run; a rerun after a
+    # failed export skips the load that already completed in the same run
+    return [
+        Node('load_to_supabase', load_to_supabase.main, deps=upstream, params={'full': full},
+             inputs=CLEANED_FILES, outputs=[manifest_path('supabase')], always=True),
+        Node('export_queries', export_queries.main, deps=['load_to_supabase'], always=True,
+             outputs=[os.path.join(export_queries.QUERY_DATA_DIR, f'result{i}.csv') for i in range(1, 9)]),
+    ]
+
+def main(full=False, force=False):
     print("--- PHASE 2: Push to Supabase & Export Queries ---")
-    load_to_supabase.main()
-    export_queries.main()
+    state = RunState('phase2', fresh=full or force, force=force)
+    run_dag('phase2', nodes(full), state)
     print("Phase 2 Complete. SQL Queries are updated!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Phase 2: load Supabase and export the SQL views.")
+    parser.add_argument('--full', action='store_true',
+                        help="Send every row to Supabase instead of only rows changed since the last load")
+    parser.add_argument('--force', action='store_true',
+                        help="Start a new run instead of resuming an unfinished one")
+    args = parser.parse_args()
+    main(full=args.full, force=args.force)
@@ -0,0 +1,34 @@
+# backend/etl/run_pipeline.py
+# Author: Hoang Son Lai
+#
+# Phase 1 + Phase 2 as one DAG (dag.py), used by the daily workflow. The
+# Supabase load starts as soon as the cleaned tables and resampled bars are
+# ready, so it overlaps with the dashboard build and the AI insights instead
+# of waiting for the whole of Phase 1. run_phase1.py / run_phase2.py still
+# run each phase on its own.
+
+import argparse
+import run_phase1
+import run_phase2
+from dag import run_dag
+from run_state import RunState
+
+def nodes(full=False):
+    upstream = run_phase1.CLEAN_STAGES + ['downsample']
+    return run_phase1.nodes(full) + run_phase2.nodes(full, upstream=upstream)
+
+def main(full=False, force=False, workers=None):
+    print("--- DAILY PIPELINE: Phase 1 + Phase 2 ---")
+    state = RunState('daily', fresh=full or force, force=force)
+    run_dag('daily', nodes(full), state, workers)
+    print("Pipeline Complete. Dashboard data and SQL query results are updated!")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run Phase 1 and Phase 2 as one dependency graph.")
+    parser.add_argument('--full', action='store_true',
+                        help="Full price backfill, rebuild of the cleaned tables, and send every row to Supabase")
+    parser.add_argument('--force', action='store_true',
+                        help="Start a new run and run every stage, even if its inputs did not change")
+    parser.add_argument('--workers', type=int, help="Stages run concurrently (default: DAG_WORKERS)")
+    args = parser.parse_args()
+    main(full=args.full, force=args.force, workers=args.workers)
@@ -0,0 +1,212 @@
+# backend/etl/run_state.py
+# Author: Hoang Son Lai
+#
+# Resumable run state for run_phase1 / run_phase2.
+#
+# One JSON file per pipeline (data/cache/run_state_<pipeline>.json):
+#   {"run_id", "status": "running" | "complete", "started_at", "finished_at",
+#    "stages": {stage: {"status", "run_id", "params", "inputs": {path: hash},
+#                       "outputs": {path: hash}, "items": [...], "seconds", ...}}}
+# Paths are relative to the repo root; hashes are sha256 of the file bytes
+# (None = file missing). A stage's inputs always include its own module, so
+# editing the code reruns it.
+#
+# RunState.run(stage, fn, ...) skips the stage when
+#   - it already completed in the current run (a rerun after a failure
+#     resumes an unfinished run younger than RUN_RESUME_HOURS), or
+#   - its params and input hashes equal those of its last completed run
+#     (always=True disables this for stages that read external sources),
+# and, in both cases, its outputs on disk are still what it wrote.
+# Stages that pass checkpoint=True get a StageCheckpoint to record finished
+# items (tickers) plus a scratch directory for their partial results, so a
+# resumed stage only redoes the missing items. Checkpoints are dropped once
+# the stage completes. The state file is rewritten atomically after every
+# transition (tmp + os.replace); stages may run concurrently (dag.py), so
+# every update of the state goes through one lock.
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from config import BASE_DIR, DATA_CACHE_DIR, RUN_RESUME_HOURS
+
+
+def state_path(pipeline):
+    return os.path.join(DATA_CACHE_DIR, f'run_state_{pipeline}.json')
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def file_hash(path):
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def hash_files(paths):
+    return {os.path.relpath(p, BASE_DIR): file_hash(p) for p in paths}
+
+
+class StageCheckpoint:
+    """Finished items of one stage within the current run, plus a directory for partial results."""
+
+    def __init__(self, state, stage):
+        self.state = state
+        self.stage = stage
+        self.dir = state.checkpoint_dir(stage)
+        os.makedirs(self.dir, exist_ok=True)
+
+    @property
+    def done(self):
+        """Items marked finished. The state file is committed but the checkpoint
+        directory is not, so callers must also check the item's files exist."""
+        return set(self.state.stages[self.stage].get('items', []))
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def mark(self, item):
+        with self.state.lock:
+            items = self.state.stages[self.stage].setdefault('items', [])
+            if item not in items:
+                items.append(item)
+                self.state.save()
+
+
+class RunState:
+    def __init__(self, pipeline, fresh=False, force=False, path=None):
+        """fresh=True starts a new run even if the last one did not finish; force=True runs every stage."""
+        self.pipeline = pipeline
+        self.force = force
+        self.path = path or state_path(pipeline)
+        self.lock = threading.RLock()
+        # Partial results of unfinished stages (data/cache/checkpoints/<pipeline>/<stage>/)
+        self.checkpoint_root = os.path.join(os.path.dirname(self.path), 'checkpoints', pipeline)
+        payload = self._load()
+        self.stages = payload.get('stages', {})
+
+        started = payload.get('started_at')
+        age = _now() - datetime.fromisoformat(started) if started else None
+        if (not fresh and payload.get('status') == 'running'
+                and age is not None and age < timedelta(hours=RUN_RESUME_HOURS)):
+            self.run_id, self.started_at = payload['run_id'], started
+            done = [s for s, rec in self.stages.items()
+                    if rec.get('run_id') == self.run_id and rec.get('status') == 'complete']
+            print(f"Resuming run {self.run_id} (started {started}); completed stages: {', '.join(done) or 'none'}")
+        else:
+            self.started_at = _now().isoformat(timespec='seconds')
+            self.run_id = _now().strftime('%Y%m%dT%H%M%S.%f')
+            shutil.rmtree(self.checkpoint_root, ignore_errors=True)
+        self.status = 'running'
+        self.save()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"  Ignoring unreadable run state {self.path}: {e}")
+            return {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.lock:
+            payload = {
+                'pipeline': self.pipeline,
+                'run_id': self.run_id,
+                'status': self.status,
+                'started_at': self.started_at,
+                'finished_at': _now().isoformat(timespec='seconds') if self.status == 'complete' else None,
+                'stages': self.stages,
+            }
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+
+    def skip_reason(self, stage, params, inputs, outputs, always):
+        rec = self.stages.get(stage)
+        if self.force or not rec or rec.get('status') != 'complete':
+            return None
+        if hash_files(outputs) != rec.get('outputs'):
+            return None  # outputs were changed or deleted since
+        if rec.get('run_id') == self.run_id:
+            return "already completed in this run"
+        if not always and rec.get('params') == params and rec.get('inputs') == inputs:
+            return "inputs unchanged"
+        return None
+
+    def checkpoint_dir(self, stage):
+        return os.path.join(self.checkpoint_root, stage)
+
+    def checkpoint(self, stage):
+        return StageCheckpoint(self, stage)
+
+    def run(self, stage, fn, params=None, inputs=(), outputs=(), always=False, checkpoint=False):
+        """
+        Runs fn(**params) unless it can be skipped; records its inputs, outputs
+        and timing. Returns True if the stage ran, False if it was skipped.
+        """
+        params = dict(params or {})
+        module_file = getattr(sys.modules.get(fn.__module__), '__file__', None)
+        input_hashes = hash_files(list(inputs) + ([module_file] if module_file else []))
+        reason = self.skip_reason(stage, params, input_hashes, outputs, always)
+        if reason:
+            print(f"[run_state] Skipping {stage}: {reason}.")
+            return False
+
+        rec = self.stages.get(stage, {})
+        resumable = (rec.get('run_id') == self.run_id and rec.get('status') != 'complete'
+                     and rec.get('params') == params)
+        items = rec.get('items', []) if resumable else []
+        if not resumable:
+            shutil.rmtree(self.checkpoint_dir(stage), ignore_errors=True)
+        with self.lock:
+            self.stages[stage] = {
+                'status': 'running', 'run_id': self.run_id, 'params': params,
+                'inputs': input_hashes, 'items': items,
+            }
+            self.save()
+
+        kwargs = dict(params)
+        if checkpoint:
+            kwargs['checkpoint'] = self.checkpoint(stage)
+            if items:
+                print(f"[run_state] Resuming {stage}: {len(items)} item(s) already done.")
+        started = time.perf_counter()
+        try:
+            fn(**kwargs)
+        except BaseException as e:
+            with self.lock:
+                self.stages[stage].update(status='failed', error=f"{type(e).__name__}: {e}",
+                                          seconds=round(time.perf_counter() - started, 2))
+                self.save()
+            raise
+        output_hashes = hash_files(outputs)
+        with self.lock:
+            self.stages[stage] = {
+                'status': 'complete', 'run_id': self.run_id, 'params': params,
+                'inputs': input_hashes, 'outputs': output_hashes,
+                'seconds': round(time.perf_counter() - started, 2),
+                'finished_at': _now().isoformat(timespec='seconds'),
+            }
+            self.save()
+        shutil.rmtree(self.checkpoint_dir(stage), ignore_errors=True)
+        return True
+
+    def finish(self):
+        self.status = 'complete'
+        self.save()
+        shutil.rmtree(self.checkpoint_root, ignore_errors=True)
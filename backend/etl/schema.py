@@ -0,0 +1,106 @@
+# backend/etl/schema.py
+# Author: Hoang Son Lai
+#
+# Compact in-memory dtypes for the ETL frames. Every reader of the cleaned
+# layer goes through here (storage.read_table for CSV and Parquet), and so
+# does the raw price file in clean_data:
+#
+#   ticker, sector, industry, period, ...  -> category (an int8/int16 code per
+#                                             row instead of a Python str)
+#   date, report_date                      -> datetime64[s] (the coarsest unit
+#                                             pandas supports; there is no [D])
+#   volume                                 -> Int64 (nullable: missing bars stay
+#                                             <NA> instead of turning the column
+#                                             into float64)
+#   open / high / low / close / adj_close  -> float32, only when a reader asks
+#                                             for it and every value of the
+#                                             column survives at the schema's
+#                                             DECIMAL(15,4) scale
+#
+# float32 is opt-in because it is not lossless: a float32 price rounds back
+# to the same 4-decimal value, but anything derived from it (returns, LTTB
+# point selection) can differ in the last digits. Frames whose values are
+# written out again (cleaned CSVs, dashboard artifacts, database loads)
+# keep float64 and stay byte-identical; generate_insights, which only turns
+# prices into rounded indicators for the prompts, uses float32.
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'adj_close']
+PRICE_SCALE = 4  # DECIMAL(15, 4) in schema.sql
+
+# Per table: categorical columns, date columns, nullable integer columns and
+# the columns that may be downcast to float32 (with their decimal scale)
+TABLES = {
+    'companies': {
+        'categories': ['sector', 'industry', 'country', 'currency'],
+        'dates': [],
+        'ints': [],
+        'float32': {},
+    },
+    'stock_prices': {
+        'categories': ['ticker'],
+        'dates': ['date'],
+        'ints': ['volume'],
+        'float32': {c: PRICE_SCALE for c in PRICE_COLUMNS},
+    },
+    'stock_prices_resampled': {
+        'categories': ['ticker', 'resolution'],
+        'dates': ['date'],
+        'ints': ['volume'],
+        'float32': {c: PRICE_SCALE for c in PRICE_COLUMNS},
+    },
+    'financial_statements': {
+        'categories': ['ticker', 'period'],
+        'dates': ['report_date'],
+        'ints': [],
+        'float32': {},
+    },
+    # data/raw/raw_prices.csv (yfinance column names, tz-aware date strings)
+    'raw_prices': {
+        'categories': ['Ticker', 'ticker'],
+        'dates': [],
+        'ints': [],
+        'float32': {},
+    },
+}
+
+
+def csv_dtypes(name, columns=None):
+    """dtype= argument for pd.read_csv: categorical columns are parsed straight into codes."""
+    spec = TABLES[name]
+    return {c: 'category' for c in spec['categories'] if columns is None or c in columns}
+
+
+def fits_float32(values, scale):
+    """True if every value of the float64 array rounds to the same `scale` decimals as float32."""
+    values = np.asarray(values, dtype=np.float64)
+    narrowed = values.astype(np.float32).astype(np.float64)
+    with np.errstate(invalid='ignore'):
+        same = np.round(narrowed, scale) == np.round(values, scale)
+    return bool(np.all(same | np.isnan(values)))
+
+
+def compact(df, name, float32=False):
+    """Converts the columns of a `name` frame to the compact dtypes above (in place); returns df."""
+    spec = TABLES[name]
+    for col in spec['categories']:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    for col in spec['dates']:
+        if col in df.columns and df[col].dtype != 'datetime64[s]':
+            df[col] = pd.to_datetime(df[col], errors='coerce').astype('datetime64[s]')
+    for col in spec['ints']:
+        if col in df.columns and df[col].dtype != 'Int64':
+            df[col] = pd.to_numeric(df[col], errors='coerce').round().astype('Int64')
+    if float32:
+        for col, scale in spec['float32'].items():
+            if col in df.columns and df[col].dtype == np.float64 and fits_float32(df[col].to_numpy(), scale):
+                df[col] = df[col].astype(np.float32)
+    return df
+
+
+def bytes_per_row(df):
+    """Deep memory footprint of the frame (index included) divided by its row count."""
+    return df.memory_usage(deep=True).sum() / max(len(df), 1)
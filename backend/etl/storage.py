@@ -0,0 +1,276 @@
+# backend/etl/storage.py
+# Author: Hoang Son Lai
+#
+# Storage layer for the cleaned datasets under DATA_CLEANED_DIR.
+#
+#   CsvStore      -> data/cleaned/<table>.csv (what the static dashboards fetch)
+#   ParquetStore  -> data/cleaned/parquet/<table>/ticker=XXX/part-0.parquet
+#
+# The CSV export is always written. When STORAGE_FORMAT=parquet the cleaned
+# tables are also written as a ticker-partitioned Parquet dataset with typed
+# columns (date32 dates, DECIMAL money/price columns matching schema.sql),
+# and readers (generate_insights, loaders) read from it, pulling only the
+# columns and tickers they ask for. pyarrow is only imported when Parquet
+# is actually used. Both stores return frames with the compact in-memory
+# dtypes of schema.py (categorical tickers, datetime64[s] dates, ...).
+
+import os
+import shutil
+import pandas as pd
+from config import DATA_CLEANED_DIR, STORAGE_FORMAT
+import instrument
+import schema
+
+PARQUET_DIR = os.path.join(DATA_CLEANED_DIR, 'parquet')
+
+# Column types per table, mirroring backend/sql/schema.sql. Ratios are kept
+# as float64: they are derived, unbounded and can overflow DECIMAL(10,4).
+_PRICE_DECIMALS = {c: (15, 4) for c in ['open', 'high', 'low', 'close', 'adj_close']}
+_AMOUNT_DECIMALS = {c: (20, 2) for c in [
+    'revenue', 'cogs', 'gross_profit', 'opex', 'operating_income_ebit',
+    'ebt', 'net_income', 'ebitda',
+    'total_assets', 'current_assets', 'cash_and_equivalents', 'accounts_receivable',
+    'inventory', 'non_current_assets', 'total_liabilities', 'current_liabilities',
+    'accounts_payable', 'short_term_debt', 'long_term_debt', 'total_equity',
+    'common_stock', 'retained_earnings',
+]}
+_EPS_DECIMALS = {c: (10, 4) for c in ['basic_eps', 'diluted_eps']}
+
+TABLES = {
+    'companies': {
+        'partition': None,
+        'dates': [],
+        'decimals': {},
+        'ints': [],
+    },
+    'stock_prices': {
+        'partition': 'ticker',
+        'dates': ['date'],
+        'decimals': _PRICE_DECIMALS,
+        'ints': ['volume'],
+    },
+    # Weekly / monthly OHLCV bars derived from stock_prices (downsample.py)
+    'stock_prices_resampled': {
+        'partition': 'ticker',
+        'dates': ['date'],
+        'decimals': _PRICE_DECIMALS,
+        'ints': ['volume'],
+    },
+    'financial_statements': {
+        'partition': 'ticker',
+        'dates': ['report_date'],
+        'decimals': {**_AMOUNT_DECIMALS, **_EPS_DECIMALS},
+        'ints': [],
+    },
+}
+
+
+class CsvStore:
+    """Flat CSV files, one per table (the original layout)."""
+
+    fmt = 'csv'
+
+    def __init__(self, root=DATA_CLEANED_DIR):
+        self.root = root
+
+    def path(self, name):
+        return os.path.join(self.root, f'{name}.csv')
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+    def write(self, name, df):
+        df.to_csv(self.path(name), index=False)
+
+    def read(self, name, columns=None, tickers=None, float32=False):
+        usecols = None
+        if columns is not None:
+            usecols = list(dict.fromkeys((['ticker'] if tickers else []) + list(columns)))
+        df = pd.read_csv(self.path(name), usecols=usecols, dtype=schema.csv_dtypes(name, usecols))
+        if tickers:
+            df = df[df['ticker'].isin(tickers)].reset_index(drop=True)
+            df['ticker'] = df['ticker'].cat.remove_unused_categories()
+        if columns is not None:
+            df = df[list(columns)]
+        return schema.compact(df, name, float32=float32)
+
+
+class ParquetStore:
+    """Ticker-partitioned Parquet datasets with schema.sql column types."""
+
+    fmt = 'parquet'
+
+    def __init__(self, root=PARQUET_DIR):
+        self.root = root
+
+    def path(self, name):
+        if TABLES[name]['partition']:
+            return os.path.join(self.root, name)
+        return os.path.join(self.root, f'{name}.parquet')
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+    def _to_table(self, name, df):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        spec = TABLES[name]
+        arrays, fields = [], []
+        for col in df.columns:
+            series = df[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype(object)  # plain strings, not dictionary-encoded columns
+            arr = pa.Array.from_pandas(series)
+            if col in spec['dates']:
+                arr = pa.Array.from_pandas(pd.to_datetime(df[col])).cast(pa.date32(), safe=False)
+            elif col in spec['decimals']:
+                precision, scale = spec['decimals'][col]
+                arr = pc.round(arr.cast(pa.float64()), scale).cast(pa.decimal128(precision, scale))
+            elif col in spec['ints']:
+                arr = arr.cast(pa.int64())
+            arrays.append(arr)
+            fields.append(pa.field(col, arr.type))
+        return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+    def _write_partitions(self, name, table):
+        import pyarrow.dataset as ds
+
+        ds.write_dataset(
+            table,
+            self.path(name),
+            format='parquet',
+            partitioning=[TABLES[name]['partition']],
+            partitioning_flavor='hive',
+            basename_template='part-{i}.parquet',
+            existing_data_behavior='delete_matching',
+        )
+
+    def write(self, name, df):
+        import pyarrow.parquet as pq
+
+        path = self.path(name)
+        table = self._to_table(name, df)
+        if TABLES[name]['partition']:
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            self._write_partitions(name, table)
+        else:
+            os.makedirs(self.root, exist_ok=True)
+            pq.write_table(table, path)
+
+    def upsert(self, name, df, keys):
+        """Replace only the partitions of the tickers in `df`, merging with their stored rows on `keys`."""
+        if df.empty:
+            return
+        tickers = df['ticker'].unique().tolist()
+        existing = self.read(name, tickers=tickers) if self.exists(name) else df.iloc[0:0]
+        merged = pd.concat([existing, df], ignore_index=True)
+        for col in TABLES[name]['dates']:
+            merged[col] = pd.to_datetime(merged[col])
+        merged = (
+            merged.drop_duplicates(subset=['ticker'] + keys, keep='last')
+            .sort_values(['ticker'] + keys)
+            .reset_index(drop=True)
+        )
+        self._write_partitions(name, self._to_table(name, merged))
+
+    def replace(self, name, df, tickers):
+        """Replace the partitions of `tickers` with their rows in `df` (tickers absent from df are dropped)."""
+        for ticker in set(tickers) - set(df['ticker'].unique()):
+            shutil.rmtree(os.path.join(self.path(name), f"ticker={ticker}"), ignore_errors=True)
+        if not df.empty:
+            self._write_partitions(name, self._to_table(name, df))
+
+    def read(self, name, columns=None, tickers=None, float32=False):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        spec = TABLES[name]
+        partition = spec['partition']
+        if partition:
+            dataset = ds.dataset(
+                self.path(name),
+                format='parquet',
+                partitioning=ds.partitioning(pa.schema([(partition, pa.string())]), flavor='hive'),
+            )
+        else:
+            dataset = ds.dataset(self.path(name), format='parquet')
+
+        flt = ds.field('ticker').isin(list(tickers)) if tickers else None
+        table = dataset.to_table(columns=list(columns) if columns is not None else None, filter=flt)
+
+        # DECIMAL -> float64, then round back to the column scale: the cast alone
+        # can be one ulp off the exact value that the CSV path would parse.
+        scales = {}
+        for i, field in enumerate(table.schema):
+            if pa.types.is_decimal(field.type):
+                scales[field.name] = field.type.scale
+                table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+
+        df = table.to_pandas()
+        for col, scale in scales.items():
+            df[col] = df[col].round(scale)
+        if partition and columns is None:
+            # Put the partition column back in its original (first) position
+            df = df[[partition] + [c for c in df.columns if c != partition]]
+        return schema.compact(df, name, float32=float32)
+
+
+def get_store(fmt=None):
+    fmt = (fmt or STORAGE_FORMAT).lower()
+    if fmt == 'parquet':
+        return ParquetStore()
+    if fmt == 'csv':
+        return CsvStore()
+    raise ValueError(f"Unknown STORAGE_FORMAT: {fmt!r} (expected 'csv' or 'parquet')")
+
+
+def save_table(name, df):
+    """Write the CSV export (always, for the static dashboards) plus the columnar copy if enabled."""
+    instrument.count(f'rows_written.{name}', len(df))
+    CsvStore().write(name, df)
+    store = get_store()
+    if store.fmt != 'csv':
+        store.write(name, df)
+
+
+def upsert_table(name, df, keys):
+    """Mirror rows already merged into the CSV export into the columnar store (no-op for CSV)."""
+    instrument.count(f'rows_upserted.{name}', len(df))
+    store = get_store()
+    if store.fmt == 'csv':
+        return
+    if not store.exists(name):
+        # Columnar store enabled after the CSV already had history: seed it once
+        store.write(name, CsvStore().read(name))
+    store.upsert(name, df, keys)
+
+
+def mirror_table(name, df, tickers=None):
+    """
+    Mirror a table whose CSV export the caller already wrote (clean_state.py)
+    into the columnar store (no-op for CSV); with `tickers`, only their
+    partitions are replaced.
+    """
+    store = get_store()
+    if store.fmt == 'csv':
+        return
+    if tickers is None or not store.exists(name):
+        store.write(name, CsvStore().read(name) if tickers is not None else df)
+    else:
+        store.replace(name, df, tickers)
+
+
+def read_table(name, columns=None, tickers=None, float32=False):
+    """
+    Read a cleaned table from the configured store, falling back to the CSV
+    export, with schema.py's compact dtypes (float32=True: float32 prices
+    where the DECIMAL scale allows, for readers that do not write them back).
+    """
+    store = get_store()
+    if not store.exists(name):
+        store = CsvStore()
+    df = store.read(name, columns=columns, tickers=tickers, float32=float32)
+    instrument.count(f'rows_read.{name}', len(df))
+    return df
@@ -0,0 +1,102 @@
+# backend/etl/test_downsample.py
+# Author: Hoang Son Lai
+#
+# Deterministic checks for downsample.py on small synthetic series:
+# LTTB keeps a known spike and stays under a visual-error bound, and the
+# weekly / monthly OHLCV bars aggregate one known week and month correctly.
+#
+#   python -m pytest backend/etl/test_downsample.py -q
+
+import numpy as np
+import pandas as pd
+from downsample import lttb_indices, resample_ohlcv, visual_error
+
+SPIKE_AT = 437
+# Same bounds as bench_downsample.py --max-error / --max-mean-error
+MAX_ERROR = 0.15
+MAX_MEAN_ERROR = 0.02
+
+
+def spiky_series(n=1000):
+    """A smooth sine (period 200 bars) with one spike of +5 at SPIKE_AT."""
+    x = np.arange(n, dtype=float)
+    y = np.sin(x * 2 * np.pi / 200)
+    y[SPIKE_AT] += 5.0
+    return x, y
+
+
+def daily_bars(start, end):
+    """One ticker's weekday bars with open/high/low/close/volume derived from the bar number."""
+    dates = pd.bdate_range(start, end)
+    i = np.arange(len(dates), dtype=float)
+    return pd.DataFrame({
+        'ticker': 'AAPL',
+        'date': dates,
+        'open': 100 + i,
+        'high': 110 + i,
+        'low': 90 - i,
+        'close': 105 + i,
+        'adj_close': 104 + i,
+        'volume': 1000 * (i + 1),
+    })
+
+
+def test_lttb_keeps_spike():
+    x, y = spiky_series()
+    kept = lttb_indices(x, y, 100)
+    assert len(kept) == 100
+    assert kept[0] == 0 and kept[-1] == len(x) - 1
+    assert np.all(np.diff(kept) > 0)
+    assert SPIKE_AT in kept
+
+
+def test_lttb_visual_error_bound():
+    x, y = spiky_series()
+    kept = lttb_indices(x, y, 100)
+    # The spike's neighbours are dropped, so its flanks are drawn off by up to
+    # the spike height: only the mean is bounded on the spiky series
+    assert visual_error(x, y, x[kept], y[kept])[1] < MAX_MEAN_ERROR
+
+    smooth = np.sin(x * 2 * np.pi / 200)
+    kept = lttb_indices(x, smooth, 100)
+    max_err, mean_err = visual_error(x, smooth, x[kept], smooth[kept])
+    assert max_err < MAX_ERROR
+    assert mean_err < MAX_MEAN_ERROR
+
+
+def test_lttb_returns_everything_when_short():
+    x = np.arange(10, dtype=float)
+    assert list(lttb_indices(x, np.sin(x), 50)) == list(range(10))
+
+
+def test_resample_weekly():
+    prices = daily_bars('2024-01-01', '2024-01-31')
+    bars = resample_ohlcv(prices, 'weekly')
+    week = prices[(prices['date'] >= '2024-01-08') & (prices['date'] <= '2024-01-12')]
+    bar = bars[bars['date'] == pd.Timestamp('2024-01-08')].iloc[0]
+    assert bar['open'] == week['open'].iloc[0]
+    assert bar['high'] == week['high'].max()
+    assert bar['low'] == week['low'].min()
+    assert bar['close'] == week['close'].iloc[-1]
+    assert bar['adj_close'] == week['adj_close'].iloc[-1]
+    assert bar['volume'] == week['volume'].sum()
+    # Mon 2024-01-01 .. Wed 2024-01-31: five weeks, each dated by its Monday
+    assert list(bars['date'].dt.dayofweek.unique()) == [0]
+    assert len(bars) == 5
+
+
+def test_resample_monthly():
+    prices = daily_bars('2024-01-15', '2024-03-15')
+    bars = resample_ohlcv(prices, 'monthly')
+    month = prices[prices['date'].dt.month == 2]
+    bar = bars[bars['date'] == pd.Timestamp('2024-02-01')].iloc[0]
+    assert bar['open'] == month['open'].iloc[0]
+    assert bar['high'] == month['high'].max()
+    assert bar['low'] == month['low'].min()
+    assert bar['close'] == month['close'].iloc[-1]
+    assert bar['volume'] == month['volume'].sum()
+    assert list(bars['date']) == [pd.Timestamp(d) for d in ('2024-01-01', '2024-02-01', '2024-03-01')]
+
+    # label='last' dates the bar by its last trading day (Thu 2024-02-29)
+    last = resample_ohlcv(prices, 'monthly', label='last')
+    assert pd.Timestamp('2024-02-29') in set(last['date'])
@@ -0,0 +1,151 @@
+# backend/loadtest.py
+# Author: Hoang Son Lai
+#
+# Small HTTP load test for the Flask API: N requests spread over C concurrent
+# clients (one keep-alive session each), cycling through the data endpoints
+# for the given tickers. Prints p50/p90/p99 latency and requests/sec per
+# endpoint and overall. Save a run with --save and compare a later run
+# against it with --baseline, e.g. before/after an API change:
+#
+#   python backend/app.py &
+#   python backend/loadtest.py --requests 2000 --concurrency 16 --save before.json
+#   ... change, restart ...
+#   python backend/loadtest.py --requests 2000 --concurrency 16 --baseline before.json
+#
+# --accept application/x-ndjson (or text/csv) exercises the streamed formats.
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+DEFAULT_TICKERS = ['AAPL', 'MSFT', 'NVDA', 'JPM', 'TSLA']
+
+
+def endpoints_for(tickers):
+    paths = ['/api/companies']
+    for t in tickers:
+        paths += [f'/api/stock_prices/{t}', f'/api/financials/{t}']
+    return paths
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return float('nan')
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(latencies, elapsed, errors):
+    values = sorted(latencies)
+    return {
+        'requests': len(values) + errors,
+        'errors': errors,
+        'rps': len(values) / elapsed if elapsed else 0.0,
+        'mean_ms': statistics.fmean(values) * 1000 if values else float('nan'),
+        'p50_ms': percentile(values, 50) * 1000,
+        'p90_ms': percentile(values, 90) * 1000,
+        'p99_ms': percentile(values, 99) * 1000,
+    }
+
+
+def run(base_url, paths, total, concurrency, timeout, accept=None):
+    local = threading.local()
+    lock = threading.Lock()
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+
+    def one(i):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+            if accept:
+                session.headers['Accept'] = accept
+        path = paths[i % len(paths)]
+        started = time.perf_counter()
+        try:
+            resp = session.get(base_url + path, timeout=timeout)
+            ok = resp.status_code in (200, 304)
+        except requests.RequestException:
+            ok = False
+        took = time.perf_counter() - started
+        with lock:
+            if ok:
+                latencies[path].append(took)
+            else:
+                errors[path] += 1
+
+    # Warm-up pass so connection setup / first-query costs are not in the numbers
+    for i in range(len(paths)):
+        one(i)
+    latencies.clear()
+    errors.clear()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    per_endpoint = {}
+    for path in paths:
+        # Group per route (companies / stock_prices / financials), not per ticker
+        route = '/'.join(path.split('/')[:3])
+        per_endpoint.setdefault(route, ([], 0))
+        lat, err = per_endpoint[route]
+        per_endpoint[route] = (lat + latencies[path], err + errors[path])
+
+    all_lat = [x for v in latencies.values() for x in v]
+    return {
+        'overall': summarize(all_lat, elapsed, sum(errors.values())),
+        'endpoints': {r: summarize(lat, elapsed, err) for r, (lat, err) in per_endpoint.items()},
+        'config': {'base_url': base_url, 'requests': total, 'concurrency': concurrency, 'accept': accept},
+    }
+
+
+def print_report(result, baseline=None):
+    header = f"{'endpoint':<20} {'reqs':>6} {'err':>4} {'rps':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}"
+    print(header)
+    print('-' * len(header))
+    rows = list(result['endpoints'].items()) + [('overall', result['overall'])]
+    for name, r in rows:
+        print(f"{name:<20} {r['requests']:>6} {r['errors']:>4} {r['rps']:>9.1f} "
+              f"{r['p50_ms']:>9.2f} {r['p90_ms']:>9.2f} {r['p99_ms']:>9.2f}")
+        if baseline:
+            b = baseline['overall'] if name == 'overall' else baseline['endpoints'].get(name)
+            if b:
+                print(f"{'  vs baseline':<20} {'':>6} {'':>4} {r['rps'] / b['rps'] if b['rps'] else float('nan'):>8.2f}x "
+                      f"{r['p50_ms'] - b['p50_ms']:>+9.2f} {r['p90_ms'] - b['p90_ms']:>+9.2f} "
+                      f"{r['p99_ms'] - b['p99_ms']:>+9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Flask data API.")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--tickers', nargs='+', default=DEFAULT_TICKERS)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--accept', help="Accept header to send, e.g. application/x-ndjson or text/csv")
+    parser.add_argument('--save', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="Compare against results saved with --save")
+    args = parser.parse_args()
+
+    result = run(args.url.rstrip('/'), endpoints_for(args.tickers), args.requests, args.concurrency,
+                 args.timeout, args.accept)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+# backend/response_cache.py
+# Author: Hoang Son Lai
+#
+# In-process cache for the Flask JSON endpoints.
+#
+# Bodies are cached already serialized, keyed by path + query string, with a
+# TTL and an LRU bound on both entry count and total bytes. Every entry
+# carries an ETag (hash of the body), a Last-Modified time and any extra
+# headers the view set (e.g. pagination links), so clients
+# that send If-None-Match / If-Modified-Since get an empty 304.
+#
+# The data only changes when the daily ETL loads the database, so the cache
+# is tied to a "generation": the latest etl_load_log id. The generation is
+# re-read at most every `generation_check` seconds; when it changes, the
+# whole cache is dropped.
+
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    def __init__(self, ttl_seconds, max_entries, max_bytes, generation_check=30.0, generation_fn=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.generation_check = generation_check
+        self.generation_fn = generation_fn  # () -> (generation, loaded_at) or None
+
+        self._entries = OrderedDict()  # key -> (body, etag, last_modified, headers, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._generation = None
+        self._loaded_at = None
+        self._checked_at = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # ------------------------------------------------------------------
+    # Generation
+    # ------------------------------------------------------------------
+    def refresh_generation(self, force=False):
+        """Re-reads the ETL generation (rate-limited) and clears the cache when it moved."""
+        now = time.monotonic()
+        if self.generation_fn is None or (not force and now - self._checked_at < self.generation_check):
+            return
+        self._checked_at = now
+        current = self.generation_fn()
+        generation, loaded_at = current if current else (None, None)
+        with self._lock:
+            if generation != self._generation:
+                if self._generation is not None or self._entries:
+                    self.invalidations += 1
+                self._clear()
+                self._generation = generation
+                self._loaded_at = loaded_at
+
+    @property
+    def generation(self):
+        return self._generation
+
+    @property
+    def loaded_at(self):
+        return self._loaded_at
+
+    # ------------------------------------------------------------------
+    # Entries
+    # ------------------------------------------------------------------
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[4] < now:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[:4]
+
+    def put(self, key, body, last_modified, generation=None, headers=None):
+        """Stores a serialized body; returns (body, etag, last_modified, headers).
+
+        `generation` is the generation the body was built under; it is not
+        stored if the cache moved to a newer one in the meantime.
+        """
+        etag = hashlib.sha1(body).hexdigest()[:20]
+        headers = dict(headers or {})
+        result = (body, etag, last_modified, headers)
+        if len(body) > self.max_bytes:
+            return result
+        with self._lock:
+            if generation != self._generation:
+                return result
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = result + (time.monotonic() + self.ttl_seconds,)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def _drop(self, key):
+        body = self._entries.pop(key)[0]
+        self._bytes -= len(body)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            overhead = sys.getsizeof(self._entries) + sum(sys.getsizeof(k) for k in self._entries)
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'body_bytes': self._bytes,
+                'approx_bytes': self._bytes + overhead,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'generation': self._generation,
+                'loaded_at': self._loaded_at.isoformat() if self._loaded_at else None,
+                'ttl_seconds': self.ttl_seconds,
+            }
@@ -1,5 +1,7 @@
 -- Author: Hoang Son Lai
 -- Description: Analytical SQL queries for financial data analysis
+-- The latest-report and moving-average queries read the materialized tables
+-- latest_financials and price_metrics (schema.sql), refreshed by backend/etl/materialize.py.
 
 USE financial_analytics;
 
@@ -8,53 +10,32 @@ USE financial_analytics;
 -- =======================================================
 
 -- 1. Top 10 Companies by Revenue (Most Recent Year)
-WITH LatestFinancials AS (
-    SELECT 
-        f1.*,
-        ROW_NUMBER() OVER (PARTITION BY f1.ticker ORDER BY f1.report_date DESC) as rn
-    FROM financial_statements f1
-    WHERE f1.revenue IS NOT NULL AND f1.revenue > 0 AND f1.period = 'FY'
-)
 SELECT 
     c.name, 
     c.sector, 
     f.report_date, 
     FORMAT(f.revenue, 0) as revenue, 
     FORMAT(f.net_income, 0) as net_income
-FROM LatestFinancials f
+FROM latest_financials f
 JOIN companies c ON f.ticker = c.ticker
-WHERE f.rn = 1
+WHERE f.basis = 'revenue'
 ORDER BY f.revenue DESC
 LIMIT 10;
 
 -- 2. Profitability Leaders: Highest Net Profit Margin (Most Recent Year)
-WITH LatestFinancials AS (
-    SELECT 
-        f1.*,
-        ROW_NUMBER() OVER (PARTITION BY f1.ticker ORDER BY f1.report_date DESC) as rn
-    FROM financial_statements f1
-    WHERE f1.revenue > 0 AND f1.period = 'FY'
-)
 SELECT 
     c.ticker, 
     c.name, 
     f.report_date,
     ROUND(f.net_margin * 100, 2) as net_margin_percent,
     ROUND(f.gross_margin * 100, 2) as gross_margin_percent
-FROM LatestFinancials f
+FROM latest_financials f
 JOIN companies c ON f.ticker = c.ticker
-WHERE f.rn = 1
+WHERE f.basis = 'revenue'
 ORDER BY f.net_margin DESC
 LIMIT 10;
 
 -- 3. Financial Health: Companies with High Debt Risk (Most Recent Year)
-WITH LatestFinancials AS (
-    SELECT 
-        f1.*,
-        ROW_NUMBER() OVER (PARTITION BY f1.ticker ORDER BY f1.report_date DESC) as rn
-    FROM financial_statements f1
-    WHERE f1.debt_to_equity IS NOT NULL AND f1.period = 'FY'
-)
 SELECT 
     c.name, 
     c.industry, 
@@ -62,28 +43,21 @@ SELECT
     f.current_ratio,
     f.interest_coverage_ratio,
     f.report_date
-FROM LatestFinancials f
+FROM latest_financials f
 JOIN companies c ON f.ticker = c.ticker
-WHERE f.rn = 1 AND f.debt_to_equity > 2
+WHERE f.basis = 'debt_to_equity' AND f.debt_to_equity > 2
 ORDER BY f.debt_to_equity DESC;
 
 -- 4. Efficient Operations: Best Return on Equity (ROE) & ROA (Most Recent Year)
-WITH LatestFinancials AS (
-    SELECT 
-        f1.*,
-        ROW_NUMBER() OVER (PARTITION BY f1.ticker ORDER BY f1.report_date DESC) as rn
-    FROM financial_statements f1
-    WHERE f1.roe IS NOT NULL AND f1.period = 'FY'
-)
 SELECT 
     c.ticker,
     c.name,
     f.report_date,
     ROUND(f.roe * 100, 2) as roe_percent,
     ROUND(f.roa * 100, 2) as roa_percent
-FROM LatestFinancials f
+FROM latest_financials f
 JOIN companies c ON f.ticker = c.ticker
-WHERE f.rn = 1
+WHERE f.basis = 'roe'
 ORDER BY f.roe DESC
 LIMIT 10;
 
@@ -92,32 +66,16 @@ LIMIT 10;
 -- =======================================================
 
 -- 5. Average Profit Margin by Sector (Most Recent Year)
-WITH LatestFinancials AS (
-    SELECT 
-        f1.*,
-        ROW_NUMBER() OVER (PARTITION BY f1.ticker ORDER BY f1.report_date DESC) as rn
-    FROM financial_statements f1
-    WHERE f1.revenue > 0 AND f1.period = 'FY'
-),
-LatestCompanyData AS (
-    SELECT 
-        c.sector,
-        f.ticker,
-        f.net_margin,
-        f.roe,
-        f.report_date
-    FROM LatestFinancials f
-    JOIN companies c ON f.ticker = c.ticker
-    WHERE f.rn = 1
-)
 SELECT 
-    sector,
-    COUNT(DISTINCT ticker) as company_count,
-    ROUND(AVG(net_margin) * 100, 2) as avg_net_margin_percent,
-    ROUND(AVG(roe) * 100, 2) as avg_roe_percent,
-    MAX(report_date) as latest_report_date
-FROM LatestCompanyData
-GROUP BY sector
+    c.sector,
+    COUNT(DISTINCT f.ticker) as company_count,
+    ROUND(AVG(f.net_margin) * 100, 2) as avg_net_margin_percent,
+    ROUND(AVG(f.roe) * 100, 2) as avg_roe_percent,
+    MAX(f.report_date) as latest_report_date
+FROM latest_financials f
+JOIN companies c ON f.ticker = c.ticker
+WHERE f.basis = 'revenue'
+GROUP BY c.sector
 ORDER BY avg_net_margin_percent DESC;
 
 -- =======================================================
@@ -130,18 +88,6 @@ WITH LatestPrice AS (
     SELECT ticker, close as latest_price, date
     FROM stock_prices
     WHERE date = (SELECT MAX(date) FROM stock_prices)
-),
-LatestEPS AS (
-    -- Get the most recent EPS (ONLY FY)
-    SELECT f1.ticker, f1.basic_eps, f1.report_date
-    FROM financial_statements f1
-    INNER JOIN (
-        SELECT ticker, MAX(report_date) as max_date 
-        FROM financial_statements 
-        WHERE period = 'FY'
-        GROUP BY ticker
-    ) f2 ON f1.ticker = f2.ticker AND f1.report_date = f2.max_date
-    WHERE f1.period = 'FY'
 )
 SELECT 
     lp.ticker,
@@ -149,7 +95,8 @@ SELECT
     le.basic_eps,
     ROUND(lp.latest_price / NULLIF(le.basic_eps, 0), 2) as PE_Ratio
 FROM LatestPrice lp
-JOIN LatestEPS le ON lp.ticker = le.ticker
+-- Most recent EPS (ONLY FY)
+JOIN latest_financials le ON lp.ticker = le.ticker AND le.basis = 'fy'
 ORDER BY PE_Ratio ASC; 
 
 -- 7. Stock Volatility 
@@ -164,17 +111,13 @@ FROM stock_prices
 GROUP BY ticker
 ORDER BY price_volatility DESC;
 
--- 8. Moving Average for Apple (Calculating 30-Day Moving Average)
+-- 8. Moving Average for Apple (30-Day Moving Average, precomputed in price_metrics)
 SELECT 
     ticker,
     date,
     close,
-    AVG(close) OVER (
-        PARTITION BY ticker 
-        ORDER BY date 
-        ROWS BETWEEN 29 PRECEDING AND CURRENT ROW
-    ) as MA_30
-FROM stock_prices
+    ma_30 as MA_30
+FROM price_metrics
 WHERE ticker = 'AAPL' 
 ORDER BY date DESC
 LIMIT 100;
\ No newline at end of file
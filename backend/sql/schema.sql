@@ -33,6 +33,23 @@ CREATE TABLE IF NOT EXISTS stock_prices (
     UNIQUE KEY unique_stock (ticker, date)
 );
 
+-- 2b. Table: Weekly / Monthly OHLCV bars (backend/etl/downsample.py), keyed by
+--     period start. Also created on demand by backend/etl/loader.py.
+CREATE TABLE IF NOT EXISTS stock_prices_resampled (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    ticker VARCHAR(10),
+    resolution VARCHAR(10),
+    date DATE,
+    open DECIMAL(15, 4),
+    high DECIMAL(15, 4),
+    low DECIMAL(15, 4),
+    close DECIMAL(15, 4),
+    adj_close DECIMAL(15, 4),
+    volume BIGINT,
+    FOREIGN KEY (ticker) REFERENCES companies(ticker) ON DELETE CASCADE,
+    UNIQUE KEY unique_stock_resampled (ticker, resolution, date)
+);
+
 -- 3. Table: Financial Statements (Yearly/Quarterly) & Calculated Ratios
 CREATE TABLE IF NOT EXISTS financial_statements (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -85,4 +102,43 @@ CREATE TABLE IF NOT EXISTS financial_statements (
 
     FOREIGN KEY (ticker) REFERENCES companies(ticker) ON DELETE CASCADE,
     UNIQUE KEY unique_financial (ticker, report_date, period)
-);
\ No newline at end of file
+);
+
+-- 4. Table: ETL load log (one row per load that changed data; the API uses
+--    the latest id as its response-cache generation). Also created on demand
+--    by backend/etl/loader.py.
+CREATE TABLE IF NOT EXISTS etl_load_log (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    rows_sent INT
+);
+
+-- 5. Materialized tables behind the analysis queries, refreshed incrementally by
+--    backend/etl/materialize.py after each load (also created on demand there).
+--    Latest FY statement per ticker and basis: 'revenue' (revenue > 0),
+--    'debt_to_equity' / 'roe' (IS NOT NULL) and 'fy' (any FY row).
+CREATE TABLE IF NOT EXISTS latest_financials (
+    ticker VARCHAR(10),
+    basis VARCHAR(20),
+    report_date DATE,
+    revenue DECIMAL(20, 2),
+    net_income DECIMAL(20, 2),
+    basic_eps DECIMAL(10, 4),
+    gross_margin DECIMAL(10, 4),
+    net_margin DECIMAL(10, 4),
+    debt_to_equity DECIMAL(10, 4),
+    current_ratio DECIMAL(10, 4),
+    interest_coverage_ratio DECIMAL(10, 4),
+    roe DECIMAL(10, 4),
+    roa DECIMAL(10, 4),
+    PRIMARY KEY (ticker, basis)
+);
+
+-- 6. Close and 30-bar moving average of close per ticker and date
+CREATE TABLE IF NOT EXISTS price_metrics (
+    ticker VARCHAR(10),
+    date DATE,
+    close DECIMAL(15, 4),
+    ma_30 DECIMAL(19, 8),
+    PRIMARY KEY (ticker, date)
+);
@@ -0,0 +1,149 @@
+-- backend/sql/supabase_views.sql
+-- Project: Global Market Insight 360
+-- Author: Hoang Son Lai
+-- Description: Supabase (PostgreSQL) views exported by backend/etl/export_queries.py
+--              to data/query_data/result<i>.csv, read from the materialized tables
+--              that backend/etl/materialize.py refreshes after each load:
+--                latest_financials  latest FY statement per (ticker, basis)
+--                price_metrics      close + 30-bar moving average per (ticker, date)
+--              The tables are created here too (same DDL as materialize.py), so the
+--              views can be applied before the first load; the next load fills them.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS latest_financials (
+    ticker VARCHAR(10),
+    basis VARCHAR(20),  -- 'revenue' (revenue > 0), 'debt_to_equity', 'roe' (IS NOT NULL), 'fy' (any)
+    report_date DATE,
+    revenue NUMERIC(20, 2),
+    net_income NUMERIC(20, 2),
+    basic_eps NUMERIC(10, 4),
+    gross_margin NUMERIC(10, 4),
+    net_margin NUMERIC(10, 4),
+    debt_to_equity NUMERIC(10, 4),
+    current_ratio NUMERIC(10, 4),
+    interest_coverage_ratio NUMERIC(10, 4),
+    roe NUMERIC(10, 4),
+    roa NUMERIC(10, 4),
+    PRIMARY KEY (ticker, basis)
+);
+
+CREATE TABLE IF NOT EXISTS price_metrics (
+    ticker VARCHAR(10),
+    date DATE,
+    close NUMERIC(15, 4),
+    ma_30 NUMERIC,
+    PRIMARY KEY (ticker, date)
+);
+
+-- Dropped and recreated in one transaction: the exports never see a missing view
+DROP VIEW IF EXISTS view_query1, view_query2, view_query3, view_query4,
+                    view_query5, view_query6, view_query7, view_query8;
+
+-- 1. Top 10 Companies by Revenue (Most Recent Year)
+CREATE VIEW view_query1 AS
+SELECT
+    c.name,
+    c.sector,
+    f.report_date,
+    TO_CHAR(f.revenue, 'FM999,999,999,999,990') AS revenue,
+    TO_CHAR(f.net_income, 'FM999,999,999,999,990') AS net_income
+FROM latest_financials f
+JOIN companies c ON f.ticker = c.ticker
+WHERE f.basis = 'revenue'
+ORDER BY f.revenue DESC
+LIMIT 10;
+
+-- 2. Profitability Leaders: Highest Net Profit Margin (Most Recent Year)
+CREATE VIEW view_query2 AS
+SELECT
+    c.ticker,
+    c.name,
+    f.report_date,
+    ROUND(f.net_margin * 100, 2) AS net_margin_percent,
+    ROUND(f.gross_margin * 100, 2) AS gross_margin_percent
+FROM latest_financials f
+JOIN companies c ON f.ticker = c.ticker
+WHERE f.basis = 'revenue'
+ORDER BY f.net_margin DESC
+LIMIT 10;
+
+-- 3. Financial Health: Companies with High Debt Risk (Most Recent Year)
+CREATE VIEW view_query3 AS
+SELECT
+    c.name,
+    c.industry,
+    f.debt_to_equity,
+    f.current_ratio,
+    f.interest_coverage_ratio,
+    f.report_date
+FROM latest_financials f
+JOIN companies c ON f.ticker = c.ticker
+WHERE f.basis = 'debt_to_equity' AND f.debt_to_equity > 2
+ORDER BY f.debt_to_equity DESC;
+
+-- 4. Efficient Operations: Best Return on Equity (ROE) & ROA (Most Recent Year)
+CREATE VIEW view_query4 AS
+SELECT
+    c.ticker,
+    c.name,
+    f.report_date,
+    ROUND(f.roe * 100, 2) AS roe_percent,
+    ROUND(f.roa * 100, 2) AS roa_percent
+FROM latest_financials f
+JOIN companies c ON f.ticker = c.ticker
+WHERE f.basis = 'roe'
+ORDER BY f.roe DESC
+LIMIT 10;
+
+-- 5. Average Profit Margin by Sector (Most Recent Year)
+CREATE VIEW view_query5 AS
+SELECT
+    c.sector,
+    COUNT(DISTINCT f.ticker) AS company_count,
+    ROUND(AVG(f.net_margin) * 100, 2) AS avg_net_margin_percent,
+    ROUND(AVG(f.roe) * 100, 2) AS avg_roe_percent,
+    MAX(f.report_date) AS latest_report_date
+FROM latest_financials f
+JOIN companies c ON f.ticker = c.ticker
+WHERE f.basis = 'revenue'
+GROUP BY c.sector
+ORDER BY avg_net_margin_percent DESC;
+
+-- 6. P/E Ratio: latest close over the most recent FY EPS
+CREATE VIEW view_query6 AS
+WITH LatestPrice AS (
+    SELECT ticker, close AS latest_price, date
+    FROM stock_prices
+    WHERE date = (SELECT MAX(date) FROM stock_prices)
+)
+SELECT
+    lp.ticker,
+    lp.latest_price,
+    le.basic_eps,
+    ROUND(lp.latest_price / NULLIF(le.basic_eps, 0), 2) AS pe_ratio
+FROM LatestPrice lp
+JOIN latest_financials le ON lp.ticker = le.ticker AND le.basis = 'fy'
+ORDER BY pe_ratio ASC;
+
+-- 7. Stock Volatility (Standard Deviation of close price)
+CREATE VIEW view_query7 AS
+SELECT
+    ticker,
+    ROUND(AVG(close), 2) AS avg_price,
+    ROUND(STDDEV(close), 2) AS price_volatility,
+    MIN(close) AS min_price_period,
+    MAX(close) AS max_price_period
+FROM stock_prices
+GROUP BY ticker
+ORDER BY price_volatility DESC;
+
+-- 8. 30-Day Moving Average for Apple (last 100 sessions)
+CREATE VIEW view_query8 AS
+SELECT ticker, date, close, ma_30
+FROM price_metrics
+WHERE ticker = 'AAPL'
+ORDER BY date DESC
+LIMIT 100;
+
+COMMIT;